@@ -1,36 +1,60 @@
 # Imports built-in
+import time
+STARTUP_T0 = time.perf_counter()  # Início do processo, para medir o cold start
 import os
 import io
 import json
 import random
 import threading
 import traceback
+import uuid
+import atexit
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-import time
 
 # Imports de terceiros
+# google.generativeai (~1 s), gTTS, pydub e speech_recognition são importados sob
+# demanda dentro das funções que os usam, para o servidor subir rápido.
 import requests
 import base64
 import pytz
-from gtts import gTTS
-from flask import Flask, request, jsonify, render_template, make_response, send_from_directory
+from flask import Flask, request, jsonify, render_template, make_response, send_from_directory, send_file, Response, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai
 import psycopg2
 from psycopg2 import pool
-from pydub import AudioSegment
-import speech_recognition as sr
+
+from tts_cache import TTSCache
+from tts_pipeline import SpeechPipeline
+from hedging import LatencyTracker, hedged_call
+from log_writer import LogWriter
+from session_store import SessionStore, MemoryBackend, SQLiteBackend, PostgresBackend
+from history_compaction import HistoryCompactor
+from rolling_summary import RollingSummarizer
+from knowledge_base import KnowledgeBase, tokenize
+from knowledge_compiler import InstructionCompiler
+from static_assets import StaticAssets, ENTRY_FILES
+from semantic_cache import SemanticAnswerCache
+from intent_router import IntentRouter
+from event_info import EVENT_INFO, TTS_MODEL, TTS_VOICE, TTS_PROMPT
+from audio_worker import AudioWorker
+from audio_store import AudioStore, pcm_to_wav, PCM_SAMPLE_RATE, PCM_CHANNELS
+from preset_registry import PresetRegistry
+from suggestion_pool import SuggestionPool, parse_suggestions
+from cache_warmer import CacheWarmer
+from audio_turn import (
+    AUDIO_TURN_PROMPT, AUDIO_TURN_GENERATION_CONFIG, TRANSCRIBE_PROMPT, TRANSCRIBE_GENERATION_CONFIG,
+    parse_audio_turn,
+)
+from key_scheduler import KeyScheduler, KeyRequestError, NoAvailableKeyError, QUOTA_STATUS_CODES, error_status_code
 
 
 # ============================================================
 # 🔧 CONFIGURAÇÕES INICIAIS
 # ============================================================
 
-active_conversations = {}
-convo_lock = threading.Lock() # Para segurança em threads
-
-
 # Carrega as variáveis do arquivo .env
 load_dotenv()
 
@@ -40,23 +64,55 @@ API_KEYS = [key.strip() for key in os.getenv("GEMINI_API_KEYS", "").split(",") i
 if not API_KEYS:
     raise ValueError("A variável GEMINI_API_KEYS não foi configurada no arquivo .env.")
 
+# FAST_START=1 (padrão): validação das chaves e do banco roda em segundo plano,
+# depois que o servidor já está aceitando conexões. FAST_START=0 valida no import.
+FAST_START = os.getenv("FAST_START", "1") == "1"
+
+# Estado da inicialização, exposto em /healthz. "checks_done": as validações
+# terminaram; "ready": terminaram e passaram (o /healthz responde 503 até lá)
+startup_state = {
+    "ready": False,
+    "checks_done": False,
+    "gemini": "pending",
+    "database": "pending",
+    "timings_ms": {},
+    "errors": {},
+}
+
+# Agendador compartilhado pelo chat e pelo TTS: orçamento por chave, cooldown
+# depois de erros de cota e escolha da chave menos carregada
+# Com vários workers do gunicorn cada processo tem o seu agendador: o orçamento
+# por chave é dividido entre eles para o total não passar da cota.
+# O padrão (2) é o mesmo do Procfile: sem a variável, cada worker fica com metade.
+WEB_CONCURRENCY = max(1, int(os.getenv("WEB_CONCURRENCY", "2")))
+
+key_scheduler = KeyScheduler(
+    API_KEYS,
+    requests_per_minute=max(1, int(os.getenv("GEMINI_KEY_RPM", "10")) // WEB_CONCURRENCY),
+    cooldown_seconds=float(os.getenv("GEMINI_KEY_COOLDOWN", "60")),
+)
+
 # Testa todas as chaves e configura a primeira válida
 def configure_genai_with_available_key():
-    for key in API_KEYS:
+    import google.generativeai as genai
+
+    tried = set()
+    while True:
         try:
-            genai.configure(api_key=key)
-            # Teste rápido para ver se a chave funciona
-            test_model = genai.GenerativeModel("gemini-2.0-flash")
-            test_model.generate_content("teste")
+            with key_scheduler.lease(exclude=tried, model="gemini-2.0-flash") as key:
+                tried.add(key)
+                genai.configure(api_key=key)
+                # Teste rápido para ver se a chave funciona
+                test_model = genai.GenerativeModel("gemini-2.0-flash")
+                test_model.generate_content("teste")
             print(f"✅ Chave válida configurada: {key[:8]}...")
             return True
+        except NoAvailableKeyError:
+            break
         except Exception as e:
             print(f"❌ Chave {key[:8]} inválida ou com limite: {e}")
     raise RuntimeError("🚫 Nenhuma chave Gemini válida disponível.")
 
-# Chama a função antes de criar o modelo LIA
-configure_genai_with_available_key()
-
 
 # ============================================================
 # 🔗 CONEXÃO COM O BANCO DE DADOS
@@ -66,127 +122,154 @@ configure_genai_with_available_key()
 DATABASE_URL = os.getenv("DATABASE_URL") 
 
 db_pool = None
+db_init_done = threading.Event()
 
-if DATABASE_URL:
-    try:
-        db_pool = psycopg2.pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=10,
-            dsn=DATABASE_URL,
-            sslmode='require'
-        )
-        # Teste rápido
-        conn = db_pool.getconn()
-        cursor = conn.cursor()
-        cursor.execute("SELECT version();")
-        print(f"✅ Conexão com pool estabelecida! PostgreSQL: {cursor.fetchone()[0]}")
-        cursor.close()
-        db_pool.putconn(conn)
-    except Exception as e:
-        print(f"❌ Erro ao criar pool de conexões: {e}")
-        db_pool = None
-else:
-    print("⚠️ DATABASE_URL não encontrada. O aplicativo não terá acesso ao banco de dados.")
+LOG_SCHEMA_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS chat_log (
+        id SERIAL PRIMARY KEY,
+        sender VARCHAR(10) NOT NULL,
+        message TEXT NOT NULL,
+        user_name VARCHAR(100),
+        role VARCHAR(50),
+        interest_area VARCHAR(100),
+        objective VARCHAR(100),
+        created_at TIMESTAMP WITH TIME ZONE,
+        created_at_sp_str VARCHAR(25)
+    );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chat_interactions (
+        id SERIAL PRIMARY KEY,
+        user_message TEXT,
+        bot_reply TEXT,
+        user_name VARCHAR(100),
+        role VARCHAR(50),
+        interest_area VARCHAR(100),
+        objective VARCHAR(100),
+        created_at TIMESTAMP WITH TIME ZONE,
+        created_at_sp_str VARCHAR(25)
+    );
+    """,
+    # Id gerado pela aplicação, devolvido ao cliente antes de a linha ser gravada
+    "ALTER TABLE chat_interactions ADD COLUMN IF NOT EXISTS log_id VARCHAR(36);",
+    # Hash das instruções compiladas com que a resposta foi gerada (pré-aquecimento)
+    "ALTER TABLE chat_interactions ADD COLUMN IF NOT EXISTS instruction_hash VARCHAR(16);",
+    # Respostas geradas pelo pré-aquecimento, compartilhadas entre os processos
+    """
+    CREATE TABLE IF NOT EXISTS warm_answers (
+        instruction_hash VARCHAR(16) NOT NULL,
+        normalized TEXT NOT NULL,
+        reply TEXT NOT NULL,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+        PRIMARY KEY (instruction_hash, normalized)
+    );
+    """,
+]
 
 
-def log_message(sender, message_text, profile_data={}):
-    """Insere uma mensagem no banco usando pool de conexões."""
-    if not db_pool:
-        print("⚠️ Banco de dados não disponível. Mensagem não foi salva.")
-        return
+def init_db_pool():
+    """Cria o pool de conexões e testa a conexão. Retorna True se o banco ficou disponível."""
+    global db_pool
 
-    conn = db_pool.getconn()
     try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS chat_log (
-                    id SERIAL PRIMARY KEY,
-                    sender VARCHAR(10) NOT NULL,
-                    message TEXT NOT NULL,
-                    user_name VARCHAR(100),
-                    role VARCHAR(50),
-                    interest_area VARCHAR(100),
-                    objective VARCHAR(100),
-                    created_at TIMESTAMP WITH TIME ZONE,
-                    created_at_sp_str VARCHAR(25)
-                );
-            """)
-            sp_tz = pytz.timezone("America/Sao_Paulo")
-            timestamp_sp = datetime.now(sp_tz)
-            timestamp_sp_str = timestamp_sp.strftime("%Y-%m-%d %H:%M:%S")
-
-            cursor.execute("""
-                INSERT INTO chat_log 
-                    (sender, message, user_name, role, interest_area, objective, created_at, created_at_sp_str) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
-            """, (
-                sender,
-                message_text,
-                profile_data.get('name', ''),
-                profile_data.get('role', ''),
-                profile_data.get('interestArea', ''),
-                profile_data.get('objective', ''),
-                timestamp_sp,
-                timestamp_sp_str
-            ))
+        if not DATABASE_URL:
+            print("⚠️ DATABASE_URL não encontrada. O aplicativo não terá acesso ao banco de dados.")
+            return False
+        try:
+            db_pool = psycopg2.pool.ThreadedConnectionPool(
+                minconn=1,
+                maxconn=10,
+                dsn=DATABASE_URL,
+                sslmode='require'
+            )
+            # Teste rápido
+            conn = db_pool.getconn()
+            cursor = conn.cursor()
+            cursor.execute("SELECT version();")
+            print(f"✅ Conexão com pool estabelecida! PostgreSQL: {cursor.fetchone()[0]}")
+            # Schema criado uma única vez aqui, e não a cada INSERT
+            for statement in LOG_SCHEMA_SQL:
+                cursor.execute(statement)
+            conn.commit()
+            cursor.close()
+            db_pool.putconn(conn)
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao criar pool de conexões: {e}")
+            db_pool = None
+            return False
+    finally:
+        db_init_done.set()
 
-        conn.commit()
-        print(f"💾 Mensagem de {sender} salva no BD com timestamp SP como string!")
 
-    except Exception as e:
-        print(f"❌ Erro ao salvar mensagem: {e}")
-        conn.rollback()
-    finally:
-        db_pool.putconn(conn)
+def wait_for_db(timeout=5):
+    """No fast start o pool é criado em segundo plano; espera um pouco se ainda estiver subindo."""
+    if not db_init_done.is_set():
+        db_init_done.wait(timeout)
+    return db_pool
 
 
-def log_interaction(user_message, bot_reply, profile_data={}):
-    """Salva a interação completa usando pool de conexões."""
-    if not db_pool:
-        print("⚠️ Banco de dados não disponível. Interação não foi salva.")
-        return
+def log_message(sender, message_text, profile_data={}):
+    """Agenda a gravação de uma mensagem no banco (assíncrona, em lote)."""
+    sp_tz = pytz.timezone("America/Sao_Paulo")
+    timestamp_sp = datetime.now(sp_tz)
+    timestamp_sp_str = timestamp_sp.strftime("%Y-%m-%d %H:%M:%S")
+
+    log_writer.enqueue(
+        "chat_log",
+        ("sender", "message", "user_name", "role", "interest_area", "objective", "created_at", "created_at_sp_str"),
+        (
+            sender,
+            message_text,
+            profile_data.get('name', ''),
+            profile_data.get('role', ''),
+            profile_data.get('interestArea', ''),
+            profile_data.get('objective', ''),
+            timestamp_sp,
+            timestamp_sp_str
+        )
+    )
 
-    conn = db_pool.getconn()
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS chat_interactions (
-                    id SERIAL PRIMARY KEY,
-                    user_message TEXT,
-                    bot_reply TEXT,
-                    user_name VARCHAR(100),
-                    role VARCHAR(50),
-                    interest_area VARCHAR(100),
-                    objective VARCHAR(100),
-                    created_at TIMESTAMP WITH TIME ZONE,
-                    created_at_sp_str VARCHAR(25)
-                );
-            """)
-            sp_tz = pytz.timezone("America/Sao_Paulo")
-            timestamp_sp = datetime.now(sp_tz)
-            timestamp_sp_str = timestamp_sp.strftime("%Y-%m-%d %H:%M:%S")
-
-            cursor.execute("""
-                INSERT INTO chat_interactions 
-                    (user_message, bot_reply, user_name, role, interest_area, objective, created_at, created_at_sp_str)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
-            """, (
-                user_message,
-                bot_reply,
-                profile_data.get('name', ''),
-                profile_data.get('role', ''),
-                profile_data.get('interestArea', ''),
-                profile_data.get('objective', ''),
-                timestamp_sp,
-                timestamp_sp_str
-            ))
-        conn.commit()
-        print("💾 Interação (usuário + bot) salva com sucesso!")
-    except Exception as e:
-        print(f"❌ Erro ao salvar interação: {e}")
-        conn.rollback()
-    finally:
-        db_pool.putconn(conn)
+
+def log_interaction(user_message, bot_reply, profile_data={}, log_id=None):
+    """
+    Agenda a gravação da interação completa (assíncrona, em lote).
+    Retorna o log_id (UUID gerado aqui, já que a linha só é inserida depois).
+    """
+    log_id = log_id or str(uuid.uuid4())
+    sp_tz = pytz.timezone("America/Sao_Paulo")
+    timestamp_sp = datetime.now(sp_tz)
+    timestamp_sp_str = timestamp_sp.strftime("%Y-%m-%d %H:%M:%S")
+
+    log_writer.enqueue(
+        "chat_interactions",
+        ("log_id", "user_message", "bot_reply", "user_name", "role", "interest_area", "objective", "created_at",
+         "created_at_sp_str", "instruction_hash"),
+        (
+            log_id,
+            user_message,
+            bot_reply,
+            profile_data.get('name', ''),
+            profile_data.get('role', ''),
+            profile_data.get('interestArea', ''),
+            profile_data.get('objective', ''),
+            timestamp_sp,
+            timestamp_sp_str,
+            instruction_compiler.text_hash
+        )
+    )
+    return log_id
+
+
+# Fila + thread que grava os logs em lote, fora do caminho das requisições
+log_writer = LogWriter(
+    get_pool=lambda: wait_for_db(timeout=30),
+    max_queue=int(os.getenv("LOG_QUEUE_SIZE", "1000")),
+    batch_size=int(os.getenv("LOG_BATCH_SIZE", "50")),
+    flush_interval=float(os.getenv("LOG_FLUSH_INTERVAL", "2")),
+)
+atexit.register(log_writer.shutdown)
 
 
 # ============================================================
@@ -194,41 +277,50 @@ def log_interaction(user_message, bot_reply, profile_data={}):
 # ============================================================
 
 BASE_DIR = os.path.dirname(__file__)
+# Banco das sessões, caches e artefatos gerados: fora da raiz servida pelo Flask
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
+os.makedirs(DATA_DIR, exist_ok=True)
 file_path = os.path.join(BASE_DIR, "system_instruction.txt")
 
-with open(file_path, "r", encoding="utf-8") as f:
-    SYSTEM_INSTRUCTION = f.read()
+# Instruções compiladas (system_instruction.txt + planilha opcional, compactados).
+# Uma thread recompila quando as fontes mudam e troca as instruções sem reiniciar
+# (ver apply_instruction mais abaixo).
+instruction_compiler = InstructionCompiler(
+    file_path,
+    xlsx_path=os.getenv("KNOWLEDGE_BASE_XLSX") or None,
+    output_path=os.path.join(DATA_DIR, "system_instruction.compiled.txt"),
+    poll_interval=float(os.getenv("INSTRUCTION_POLL_INTERVAL", "5")),
+)
+instruction_compiler.refresh()
+SYSTEM_INSTRUCTION = instruction_compiler.text
+
+# Base de conhecimento: cada turno de texto leva só o núcleo das instruções e os
+# trechos relevantes para a pergunta (KNOWLEDGE_BASE_TOP_K=0 volta ao texto inteiro)
+KNOWLEDGE_BASE_TOP_K = int(os.getenv("KNOWLEDGE_BASE_TOP_K", "12"))
+knowledge_base = KnowledgeBase(SYSTEM_INSTRUCTION, top_k=KNOWLEDGE_BASE_TOP_K or 12)
+
+# Cache semântico: perguntas parecidas com uma já respondida não chamam o Gemini.
+# É esvaziado quando as instruções mudam (apply_instruction).
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.8")),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "500")),
+)
 
 # ============================================================
 # 📚 RESPOSTAS PRÉ-PROGRAMADAS
 # ============================================================
 
-EVENT_INFO = {
-    "Onde posso ver os projetos de Ciência de Dados para Negócios?": {
-        "text": "Os projetos de Ciência de Dados para Negócios estão no 3º andar, sala 307! 💡 Lá, os alunos mostram soluções inovadoras e é onde você encontra a LIA — eu! 🤖",
-        "audio_path": "respostas_pre_gravadas/projetos_cdn.mp3"
-    },
-    "E os trabalhos de Marketing, onde estão?": {
-        "text": "Os projetos de Marketing estão no 2º andar, nas salas 202, 203, 206, 208, 209, 210 e também na área do ping pong. 🎯 Uma mostra cheia de criatividade e estratégia!",
-        "audio_path": "respostas_pre_gravadas/projetos_mkt.mp3"
-    },
-    "Onde encontro os projetos de GNI?": {
-        "text": "Os projetos de Gestão de Negócios e Inovação (GNI) estão espalhados pelo térreo, 2º e 3º andares. 💼 No térreo há a Feira de Empreendedores, e nos outros andares, os projetos acadêmicos e especiais!",
-        "audio_path": "respostas_pre_gravadas/projetos_gni.mp3"
-    },
-    "Onde encontro comidas e doces?": {
-        "text": "A área de alimentação fica no térreo! 🍔🍰 Você encontra Tati Nasi Confeitaria, Bolindos, Nabru Doces, ZAP Burger, Sorveteria Cris Bom e Cantina das Bentas. Delícias feitas por empreendedores da feira!",
-        "audio_path": "respostas_pre_gravadas/empresas_alimentacao.mp3"
-    },
-    "Quais empresas estão no evento?": {
-        "text": "No térreo estão várias empresas e parceiros incríveis! 🌟 Como Tati Nasi, Bolindos, Nabru Doces, ZAP Burger, Sorveteria Cris Bom, Cantina das Bentas, Dans Brechó, Anainá Moda Sustentável e muitas outras!",
-        "audio_path": "respostas_pre_gravadas/empresas_expondo.mp3"
-    },
-    "O que é a LIA?": {
-        "text": "Sou eu! 😄 Fui criada pelos alunos do 2º semestre de Ciência de Dados para Negócios — Felipe Tavares, Thiago Teles, Paulo Futagawa, Thais Nakazone e Riquelme Nichiyama — com orientação dos profs. Rômulo Maia e Nathane de Castro. Minha missão é ajudar você no Meta Day! 💙🤖",
-        "audio_path": "respostas_pre_gravadas/o_que_e_lia.mp3"
-    }
-}
+# O catálogo (EVENT_INFO) fica em event_info.py, compartilhado com o create_audio.py
+
+# Casa perguntas livres (digitadas ou transcritas) com os presets
+intent_router = IntentRouter(
+    EVENT_INFO,
+    min_score=float(os.getenv("INTENT_MIN_SCORE", "0.85")),
+    min_margin=float(os.getenv("INTENT_MIN_MARGIN", "0.15")),
+)
+
+# Transcreve o áudio antes da chamada completa para responder presets falados na hora
+AUDIO_ROUTE_PRESETS = os.getenv("AUDIO_ROUTE_PRESETS", "1") == "1"
 
 
 
@@ -243,8 +335,8 @@ GEMINI_MODELS = [
 selected_model = random.choice(GEMINI_MODELS)
 print(f"🤖 Modelo selecionado para esta sessão: {selected_model}")
 
-# Cria o modelo Gemini configurado com as instruções da LIA
-model = genai.GenerativeModel(
+# Configuração do modelo Gemini com as instruções da LIA
+MODEL_CONFIG = dict(
     model_name=selected_model,
     system_instruction=SYSTEM_INSTRUCTION,
     generation_config={
@@ -261,19 +353,192 @@ model = genai.GenerativeModel(
     ],
 )
 
-# Inicia o histórico de conversa
-convo = model.start_chat(history=[])
+# Modelo barato e sem as instruções da LIA, para tarefas internas (resumo do histórico)
+SUMMARY_MODEL_CONFIG = dict(
+    model_name=os.getenv("HISTORY_SUMMARY_MODEL", "gemini-2.0-flash-lite"),
+    generation_config={"temperature": 0.2, "max_output_tokens": 512},
+)
+
+MODEL_CONFIGS = {"chat": MODEL_CONFIG, "summary": SUMMARY_MODEL_CONFIG}
+
+# Um modelo por chave, para o agendador poder trocar a chave a cada requisição
+models_by_key = {}
+models_by_key_lock = threading.Lock()
+
+
+def get_model_for_key(key, kind="chat", system_instruction=None):
+    """
+    Retorna (criando uma única vez) o modelo do tipo pedido ligado a uma chave específica.
+    Com system_instruction, devolve uma cópia leve com essas instruções (mesmo cliente/chave).
+    """
+    import google.generativeai as genai
+    from google.ai import generativelanguage as glm
+
+    with models_by_key_lock:
+        if (key, kind) not in models_by_key:
+            key_model = genai.GenerativeModel(**MODEL_CONFIGS[kind])
+            # O SDK só expõe um cliente global; cada modelo ganha um cliente próprio com a sua chave
+            key_model._client = glm.GenerativeServiceClient(client_options={"api_key": key})
+            models_by_key[(key, kind)] = key_model
+        key_model = models_by_key[(key, kind)]
+    if system_instruction is None:
+        return key_model
+    turn_model = genai.GenerativeModel(**{**MODEL_CONFIGS[kind], "system_instruction": system_instruction})
+    turn_model._client = key_model._client
+    return turn_model
+
+
+def apply_instruction(text):
+    """
+    Troca as instruções da LIA a quente: os próximos modelos já nascem com o texto
+    novo (as requisições em andamento terminam com o antigo), o índice da base é
+    refeito e o cache de respostas, que dependia do texto antigo, é esvaziado.
+    """
+    global SYSTEM_INSTRUCTION
+    SYSTEM_INSTRUCTION = text
+    with models_by_key_lock:
+        MODEL_CONFIG["system_instruction"] = text
+        for cache_key in [cache_key for cache_key in models_by_key if cache_key[1] == "chat"]:
+            del models_by_key[cache_key]
+    knowledge_base.load(text)
+    answer_cache.invalidate()
+
+
+instruction_compiler.add_listener(apply_instruction)
+
+
+def call_with_scheduled_key(fn, kind="chat", system_instruction=None, stream=False):
+    """
+    Executa fn(modelo) com a chave escolhida pelo agendador (orçamento do modelo do
+    tipo pedido). Em erro de cota, tenta imediatamente outra chave (sem backoff); as
+    chaves em cooldown nem são tentadas. Com stream=True a chave fica reservada até
+    a resposta ser consumida inteira (ou interrompida).
+    """
+    model_name = MODEL_CONFIGS[kind]["model_name"]
+    tried = set()
+    while True:
+        key = key_scheduler.acquire(exclude=tried, model=model_name)
+        if key is None:
+            raise NoAvailableKeyError("Nenhuma chave Gemini disponível no momento (cooldown ou sem orçamento).")
+        tried.add(key)
+        try:
+            result = fn(get_model_for_key(key, kind, system_instruction))
+        except Exception as e:
+            status_code = error_status_code(e)
+            key_scheduler.release(key, success=False, status_code=status_code, model=model_name)
+            if status_code not in QUOTA_STATUS_CODES:
+                raise
+            print(f"⚠️ Chave {key[:8]}... sem cota no chat. Tentando outra chave...")
+            continue
+        if stream:
+            return release_after_stream(result, key, model_name)
+        key_scheduler.release(key, success=True, model=model_name)
+        return result
+
+
+def release_after_stream(response, key, model_name):
+    """Repassa os trechos da resposta em streaming e só então devolve a chave ao agendador."""
+    success, status_code = False, None
+    try:
+        for chunk in response:
+            yield chunk
+        success = True
+    except GeneratorExit:
+        # O cliente desconectou: não é falha da chave
+        success = True
+        raise
+    except Exception as e:
+        status_code = error_status_code(e)
+        raise
+    finally:
+        key_scheduler.release(key, success=success, status_code=status_code, model=model_name)
+
+
+def send_chat_message(convo, content, stream=False, generation_config=None, system_instruction=None):
+    """
+    Envia uma mensagem na conversa usando a chave escolhida pelo agendador.
+    system_instruction troca as instruções só neste turno (trechos da base de conhecimento).
+    """
+    def send(key_model):
+        convo.model = key_model
+        return convo.send_message(content, stream=stream, generation_config=generation_config)
+    return call_with_scheduled_key(send, system_instruction=system_instruction, stream=stream)
+
+
+def generate_content(prompt, kind="chat", generation_config=None):
+    """generate_content avulso (sugestões, resumos) usando a chave escolhida pelo agendador."""
+    return call_with_scheduled_key(
+        lambda key_model: key_model.generate_content(prompt, generation_config=generation_config), kind
+    )
+
+
+# ============================================================
+# 💬 SESSÕES DE CONVERSA
+# ============================================================
+
+def create_session_backend():
+    """
+    Escolhe onde o estado das sessões fica guardado (SESSION_BACKEND):
+    'memory' (um worker só), 'sqlite' (vários workers na mesma máquina) ou
+    'postgres' (vários workers/instâncias). Padrão: postgres se houver DATABASE_URL, senão sqlite.
+    """
+    backend = os.getenv("SESSION_BACKEND", "postgres" if DATABASE_URL else "sqlite").lower()
+    if backend == "memory":
+        return MemoryBackend()
+    if backend == "postgres":
+        return PostgresBackend(get_pool=wait_for_db)
+    return SQLiteBackend(os.getenv("SESSION_SQLITE_PATH", os.path.join(DATA_DIR, "sessions.sqlite3")))
+
+
+# Compactação do histórico: os últimos turnos ficam literais e os antigos viram
+# um resumo, gerado em segundo plano pelo modelo barato (ou extrativo, se falhar)
+history_compaction_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-compaction")
+history_compactor = HistoryCompactor(
+    summarize=lambda prompt: generate_content(prompt, kind="summary").text,
+    executor=history_compaction_executor,
+    keep_turns=int(os.getenv("HISTORY_KEEP_TURNS", "6")),
+    batch_turns=int(os.getenv("HISTORY_COMPACT_BATCH_TURNS", "4")),
+    max_summary_chars=int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "1500")),
+)
+
+# Resumo pedido pelo visitante em /summarize, atualizado só com os turnos novos
+rolling_summarizer = RollingSummarizer(
+    summarize=lambda prompt: generate_content(prompt, kind="summary").text,
+    max_chars=int(os.getenv("HISTORY_SUMMARY_MAX_CHARS", "1500")),
+)
+
+# Conversas por sessionId, com TTL ocioso, limite de sessões e de histórico.
+# A ChatSession é reconstruída do histórico salvo a cada requisição; o modelo
+# (chave) é trocado pelo agendador a cada mensagem em send_chat_message.
+active_conversations = SessionStore(
+    backend=create_session_backend(),
+    chat_factory=lambda history: get_model_for_key(API_KEYS[0]).start_chat(history=history),
+    idle_ttl=int(os.getenv("SESSION_IDLE_TTL", "900")),
+    max_sessions=int(os.getenv("SESSION_MAX", "500")),
+    max_history_messages=int(os.getenv("SESSION_MAX_HISTORY", "40")),
+    compactor=history_compactor,
+)
+print(f"💬 Sessões guardadas em: {type(active_conversations.backend).__name__}")
 
 # ============================================================
 # 🔊 FUNÇÕES DE CONVERSÃO DE TEXTO EM ÁUDIO (TTS) COM RETRY
 # ============================================================
 
-# Variáveis globais para o rodízio de chaves de forma segura
-current_key_index = 0
-key_lock = threading.Lock()
+# TTS "hedged": sem sleeps entre tentativas, com prazo total e timeout por tentativa
+TTS_MAX_ATTEMPTS = int(os.getenv("TTS_MAX_ATTEMPTS", "4"))
+TTS_ATTEMPT_TIMEOUT = float(os.getenv("TTS_ATTEMPT_TIMEOUT", "25"))
+TTS_DEADLINE_SECONDS = float(os.getenv("TTS_DEADLINE_SECONDS", "30"))
+tts_latency = LatencyTracker(percentile=float(os.getenv("TTS_HEDGE_PERCENTILE", "0.9")))
+tts_hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tts-hedge")
 
-MAX_RETRIES = 3  # Tentativas por chave
-BACKOFF_BASE = 2  # Segundos base para backoff exponencial
+
+# Cache de áudio TTS (memória + disco), chaveado por texto normalizado + voz + modelo
+tts_cache = TTSCache(
+    cache_dir=os.getenv("TTS_CACHE_DIR", os.path.join(DATA_DIR, "cache_tts")),
+    max_memory_bytes=int(os.getenv("TTS_CACHE_MEMORY_MB", "32")) * 1024 * 1024,
+    max_disk_bytes=int(os.getenv("TTS_CACHE_DISK_MB", "512")) * 1024 * 1024,
+)
+atexit.register(tts_cache.save_stats)
 
 
 # def get_gemini_tts_audio_data(text_to_speak):
@@ -406,99 +671,99 @@ BACKOFF_BASE = 2  # Segundos base para backoff exponencial
 #     print(f"⚠️ As {num_to_sample} chaves aleatórias falharam. Usando fallback gTTS...")
 #     return get_gtts_audio_data(text_to_speak)
 
-def get_gemini_tts_audio_data(text_to_speak):
+def request_gemini_tts(key, payload, cancel_event, timeout):
     """
-    Gera áudio com a API Gemini usando até N chaves (aleatórias), retry por chave.
-    Retorna: base64 string (quando bem sucedido).
-    Lança Exception quando todas as chaves falharem (para que o caller possa usar fallback).
+    Uma tentativa de TTS na Gemini com uma chave. Retorna o áudio em base64
+    ou lança exceção (para o hedge seguir para a próxima chave).
     """
-    payload = {
-        "contents": [{"parts": [{"text": f"Fale de forma natural e clara: {text_to_speak}"}]}],
-        "generationConfig": {
-            "responseModalities": ["AUDIO"],
-            "speechConfig": {"voiceConfig": {"prebuiltVoiceConfig": {"voiceName": "Aoede"}}}
-        },
-        "model": "gemini-2.5-flash-tts"
-    }
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{TTS_MODEL}:generateContent?key={key}"
     headers = {'Content-Type': 'application/json'}
+    response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=min(TTS_ATTEMPT_TIMEOUT, timeout))
 
-    num_keys_to_try = 3
-    num_to_sample = min(num_keys_to_try, len(API_KEYS))
-    if num_to_sample == 0:
-        raise RuntimeError("Nenhuma chave Gemini disponível para tentar.")
+    if not response.ok:
+        # Debug útil quando a cobrança/exaustão do crédito ocorre
+        print(f"⚠️ Gemini returned HTTP {response.status_code} with body: {response.text[:500]}")
+        raise KeyRequestError(f"HTTP {response.status_code} com a chave {key[:8]}", response.status_code)
 
-    keys_to_try = random.sample(API_KEYS, num_to_sample)
+    # tenta parse do JSON com segurança
+    try:
+        result = response.json()
+    except ValueError:
+        raise RuntimeError("Resposta da Gemini não é JSON válido.")
 
-    for key in keys_to_try:
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-tts:generateContent?key={key}"
-                response = requests.post(url, headers=headers, data=json.dumps(payload), timeout=25)
-
-                # Debug útil quando a cobrança/exaustão do crédito ocorre
-                if not response.ok:
-                    print(f"⚠️ Gemini returned HTTP {response.status_code} with body: {response.text[:500]}")
-                    # Tratamento explícito para códigos de billing/rate-limit:
-                    if response.status_code in (402, 403, 429):
-                        # passar para a próxima chave (ou próxima tentativa)
-                        break
-                    else:
-                        # para outros erros, tentar novamente com backoff
-                        pass
-
-                # tenta parse do JSON com segurança
-                try:
-                    result = response.json()
-                except ValueError:
-                    print("⚠️ Resposta da Gemini não é JSON válido.")
-                    result = {}
-
-                # Se houver erro explícito no JSON (ex.: {'error': {...}}), trate como falha
-                if 'error' in result:
-                    print(f"⚠️ Gemini returned error in body for key {key[:8]}: {result['error']}")
-                    # Se for erro de quota/billing, não insista nesta chave
-                    break
-
-                # Navega a estrutura segura para extrair o áudio (se existir)
-                candidates = result.get('candidates') or []
-                if candidates:
-                    part = candidates[0].get('content', {}).get('parts', [{}])[0]
-                    audio_data = part.get('inlineData', {}).get('data')
-                else:
-                    audio_data = None
+    # Se houver erro explícito no JSON (ex.: {'error': {...}}), trate como falha
+    if 'error' in result:
+        status_code = result['error'].get('code') if isinstance(result['error'], dict) else None
+        raise KeyRequestError(f"Gemini returned error in body for key {key[:8]}: {result['error']}", status_code)
 
-                # Se não tem audio, considere isso uma falha nesta chave
-                if audio_data and isinstance(audio_data, str) and len(audio_data) > 0:
-                    print(f"✅ Áudio gerado via Gemini (chave {key[:8]}...) [tentativa {attempt}]")
-                    return audio_data  # já base64 (assumindo comportamento atual da API)
-                else:
-                    print(f"⚠️ Nenhum áudio retornado pela Gemini com a chave {key[:8]} (tentativa {attempt}). Resposta parcial: {str(result)[:300]}")
+    # Navega a estrutura segura para extrair o áudio (se existir)
+    candidates = result.get('candidates') or []
+    audio_data = None
+    if candidates:
+        part = candidates[0].get('content', {}).get('parts', [{}])[0]
+        audio_data = part.get('inlineData', {}).get('data')
 
-            except requests.exceptions.RequestException as req_err:
-                print(f"⚠️ Erro de requisição com chave {key[:8]} (tentativa {attempt}): {req_err}")
-            except Exception as e:
-                print(f"⚠️ Erro inesperado ao chamar Gemini com chave {key[:8]} (tentativa {attempt}): {e}")
+    if not (audio_data and isinstance(audio_data, str)):
+        raise RuntimeError(f"Nenhum áudio retornado pela Gemini com a chave {key[:8]}. Resposta parcial: {str(result)[:300]}")
 
-            # Backoff exponencial com jitter
-            sleep_time = BACKOFF_BASE ** attempt + random.uniform(0, 1)
-            print(f"⏱ Esperando {sleep_time:.1f}s antes da próxima tentativa nesta chave...")
-            time.sleep(sleep_time)
+    if cancel_event.is_set():
+        print(f"🗑️ Áudio da chave {key[:8]}... descartado (outra tentativa venceu).")
+    return audio_data
 
-        # fim tentativas desta chave -> passa para próxima chave
-        print(f"🔁 Mudando de chave (próxima chave).")
 
-    # Se todas as chaves testadas falharem, lançar exceção para o caller decidir fallback
-    raise RuntimeError("Todas as chaves Gemini falharam ou retornaram sem áudio.")
+def get_gemini_tts_audio_data(text_to_speak):
+    """
+    Gera áudio com a API Gemini com tentativas "hedged": dispara numa chave e, se
+    a resposta passar do percentil de latência recente, dispara em outra chave em
+    paralelo. A primeira que responder vence, dentro de um prazo total fixo.
+    As chaves vêm do agendador, que pula as que estão em cooldown ou sem orçamento.
+    Retorna: base64 string (quando bem sucedido).
+    Lança Exception quando todas as tentativas falharem (para que o caller possa usar fallback).
+    """
+    payload = {
+        "contents": [{"parts": [{"text": f"{TTS_PROMPT}{text_to_speak}"}]}],
+        "generationConfig": {
+            "responseModalities": ["AUDIO"],
+            "speechConfig": {"voiceConfig": {"prebuiltVoiceConfig": {"voiceName": TTS_VOICE}}}
+        },
+        "model": TTS_MODEL
+    }
+
+    tried = set()
+    tried_lock = threading.Lock()
+
+    def attempt(attempt_number, cancel_event, timeout):
+        if cancel_event.is_set():
+            raise RuntimeError("Tentativa cancelada: outra chave já respondeu.")
+        with tried_lock:
+            exclude = set(tried)
+        with key_scheduler.lease(exclude=exclude, model=TTS_MODEL) as key:
+            with tried_lock:
+                tried.add(key)
+            audio_data = request_gemini_tts(key, payload, cancel_event, timeout)
+        print(f"✅ Áudio gerado via Gemini (chave {key[:8]}...) [tentativa {attempt_number}]")
+        return audio_data
+
+    audio_data, _ = hedged_call(
+        attempt,
+        range(1, TTS_MAX_ATTEMPTS + 1),
+        tts_hedge_executor,
+        tts_latency,
+        TTS_DEADLINE_SECONDS,
+    )
+    return audio_data
 
 
 def get_gtts_audio_data(text_to_speak):
     """Fallback local usando gTTS."""
     try:
+        from gtts import gTTS
+
         print("Usando gTTS como alternativa...")
         tts = gTTS(text=text_to_speak, lang="pt-br")
         buffer = io.BytesIO()
         tts.write_to_fp(buffer)
-        return base64.b64encode(buffer.getvalue()).decode("utf-8")
+        return buffer.getvalue()
     except Exception as e:
         print(f"ERRO ao gerar TTS com gTTS: {e}")
         return None
@@ -512,40 +777,146 @@ def get_gtts_audio_data(text_to_speak):
 #         print(f"Erro inesperado no Gemini TTS: {e}")
 #         return get_gtts_audio_data(text_to_speak)
 
-def get_tts_audio_data(text_to_speak):
+# Codec do áudio enviado ao cliente: o PCM cru da Gemini (~48 KB/s) é comprimido
+# no pool de processos; em MP3 a 32 kbps fica ~12x menor e toca em qualquer navegador.
+# "opus" é um pouco melhor no mesmo tamanho, mas o Safari antigo (iOS < 17) não toca
+# Ogg/Opus e o áudio sumiria. "wav" desliga a compressão.
+TTS_AUDIO_FORMAT = os.getenv("TTS_AUDIO_FORMAT", "mp3").lower()
+TTS_AUDIO_BITRATE = os.getenv("TTS_AUDIO_BITRATE", "32k")
+TTS_ENCODED_VARIANT = f"{TTS_MODEL}|{TTS_AUDIO_FORMAT}@{TTS_AUDIO_BITRATE}"
+# Quanto a requisição espera pela compressão antes de mandar o WAV (segundos)
+TTS_ENCODE_WAIT = float(os.getenv("TTS_ENCODE_WAIT", "0.5"))
+
+
+audio_encoding = {"available": TTS_AUDIO_FORMAT != "wav"}
+
+
+def encode_pcm(pcm, wait=None, on_late=None):
     """
-    Função principal: tenta Gemini (que levanta exceção se falhar), e em caso de erro chama gTTS.
-    Sempre retorna base64 string (ou None se ambos falharem).
+    Codifica o PCM s16le 24 kHz no formato configurado. Retorna (bytes, extensão);
+    se a codificação falhar (sem ffmpeg, fila cheia, timeout), devolve WAV.
+    Com wait, espera no máximo wait segundos; o que ficar pronto depois vai para on_late(bytes).
     """
-    try:
-        return get_gemini_tts_audio_data(text_to_speak)
-    except Exception as e:
-        print(f"Erro no Gemini TTS: {e}. Tentando fallback gTTS...")
+    if audio_encoding["available"]:
         try:
-            return get_gtts_audio_data(text_to_speak)
-        except Exception as e2:
-            print(f"ERRO ao gerar TTS com gTTS também: {e2}")
-            return None
+            encoded = audio_worker.transcode(
+                pcm, TTS_AUDIO_FORMAT, timeout=wait, on_late=on_late, input_format="s16le",
+                sample_rate=PCM_SAMPLE_RATE, channels=PCM_CHANNELS, bitrate=TTS_AUDIO_BITRATE
+            )
+            return encoded, TTS_AUDIO_FORMAT
+        except FileNotFoundError:
+            # Sem ffmpeg no servidor: não adianta tentar de novo a cada áudio
+            audio_encoding["available"] = False
+            print("⚠️ ffmpeg não encontrado. Áudio será enviado em WAV, sem compressão.")
+        except Exception as e:
+            print(f"⚠️ Falha ao codificar o áudio em {TTS_AUDIO_FORMAT}: {str(e).strip()[:200]}. Enviando WAV.")
+    return pcm_to_wav(pcm), "wav"
+
+
+def get_tts_audio(text_to_speak):
+    """
+    Função principal: consulta o cache, tenta Gemini (que levanta exceção se falhar), e em caso de erro chama gTTS.
+    Retorna (bytes, extensão): o áudio da Gemini já comprimido (ou WAV), MP3 para o gTTS
+    (ou None se ambos falharem).
+    """
+    # Uma única consulta (conta um acerto ou um erro): primeiro o áudio já comprimido, depois o PCM
+    variant, cached = tts_cache.lookup(text_to_speak, TTS_VOICE, [TTS_ENCODED_VARIANT, TTS_MODEL])
+    if variant == TTS_ENCODED_VARIANT:
+        print("⚡ Áudio (já comprimido) servido pelo cache TTS.")
+        return cached, TTS_AUDIO_FORMAT
+
+    pcm = cached
+    if pcm:
+        print("⚡ Áudio servido pelo cache TTS.")
+    else:
+        try:
+            pcm = base64.b64decode(get_gemini_tts_audio_data(text_to_speak))
+            # Só o áudio da Gemini vai para o cache; o fallback gTTS não deve ficar "preso" nele
+            tts_cache.put(text_to_speak, TTS_VOICE, TTS_MODEL, pcm)
+        except Exception as e:
+            print(f"Erro no Gemini TTS: {e}. Tentando fallback gTTS...")
+            try:
+                mp3 = get_gtts_audio_data(text_to_speak)
+                return (mp3, "mp3") if mp3 else None
+            except Exception as e2:
+                print(f"ERRO ao gerar TTS com gTTS também: {e2}")
+                return None
+
+    # A requisição não fica presa na compressão: passando de TTS_ENCODE_WAIT vai o WAV,
+    # e a versão comprimida entra no cache quando o pool terminar
+    def store_encoded(data):
+        tts_cache.put(text_to_speak, TTS_VOICE, TTS_ENCODED_VARIANT, data)
+
+    data, extension = encode_pcm(pcm, wait=TTS_ENCODE_WAIT, on_late=store_encoded)
+    if extension != "wav":
+        # Guarda também a versão comprimida, para não recodificar a cada acerto do cache
+        store_encoded(data)
+    return data, extension
+
+
+# Áudios servidos em /audio/<id> (em disco, compartilhados entre os workers)
+audio_store = AudioStore(
+    os.getenv("AUDIO_STORE_DIR", os.path.join(DATA_DIR, "cache_audio")),
+    max_bytes=int(os.getenv("AUDIO_STORE_MAX_MB", "256")) * 1024 * 1024,
+)
+
+
+def audio_url(data, extension):
+    """Grava o áudio no audio_store e retorna a URL dele."""
+    return f"/audio/{audio_store.put(data, extension)}"
+
+
+def audio_format_for(url):
+    """Content-Type do áudio de uma URL /audio/<id>, para o cliente saber o que vai receber."""
+    return AudioStore.mimetype_for(url.rsplit("/", 1)[1]) if url else None
+
+
+def get_tts_audio_url(text_to_speak):
+    """Sintetiza (ou pega do cache) o áudio do texto e retorna a URL dele (ou None)."""
+    audio = get_tts_audio(text_to_speak)
+    return audio_url(*audio) if audio else None
+
+
+# Áudios pré-gravados já codificados em memória (carregados na inicialização)
+preset_registry = PresetRegistry(
+    EVENT_INFO,
+    BASE_DIR,
+    encode=encode_pcm,
+    synthesize_pcm=lambda text: base64.b64decode(get_gemini_tts_audio_data(text)),
+    poll_interval=float(os.getenv("PRESET_POLL_INTERVAL", "5")),
+)
+
+
+# Pool limitado para a síntese em paralelo dos trechos (frases) de uma resposta
+tts_pipeline_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TTS_PIPELINE_WORKERS", "3")),
+    thread_name_prefix="tts-pipeline"
+)
 
    
-def transcrever_audio_base64(audio_base64):
+# Decodificação/conversão de áudio (pydub + ffmpeg) num pool de processos limitado
+audio_worker = AudioWorker(
+    max_workers=int(os.getenv("AUDIO_WORKERS", "2")),
+    max_queue=int(os.getenv("AUDIO_QUEUE_SIZE", "8")),
+    timeout=float(os.getenv("AUDIO_JOB_TIMEOUT", "20")),
+)
+atexit.register(audio_worker.shutdown)
+
+
+def transcrever_audio(audio_bytes):
     try:
+        import speech_recognition as sr
+
         # Verifica se veio algo
-        if not audio_base64:
+        if not audio_bytes:
             raise ValueError("O áudio recebido está vazio.")
 
-        # Decodifica o base64 em bytes
-        audio_bytes = base64.b64decode(audio_base64)
-
-        # Converte o áudio para WAV (SpeechRecognition entende melhor WAV)
-        audio = AudioSegment.from_file(io.BytesIO(audio_bytes))
-        wav_io = io.BytesIO()
-        audio.export(wav_io, format="wav")
-        wav_io.seek(0)
+        # Converte para WAV mono 16 kHz no pool de processos (SpeechRecognition entende melhor WAV)
+        wav_bytes = audio_worker.transcode(audio_bytes, "wav", sample_rate=16000, channels=1)
 
         # Usa SpeechRecognition para transcrever
         recognizer = sr.Recognizer()
-        with sr.AudioFile(wav_io) as source:
+        with sr.AudioFile(io.BytesIO(wav_bytes)) as source:
             audio_data = recognizer.record(source)
             texto = recognizer.recognize_google(audio_data, language="pt-BR")
         
@@ -556,6 +927,18 @@ def transcrever_audio_base64(audio_base64):
         return "[Falha na transcrição]"
 
 
+# Transcrição de reserva (só quando o modelo não devolve a transcrição), fora da requisição
+stt_fallback_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-fallback")
+
+
+def log_audio_interaction_later(audio_bytes, bot_reply_text, profile, log_id):
+    """Transcreve o áudio em segundo plano e só então grava a interação com esse log_id."""
+    def transcribe_and_log():
+        texto = transcrever_audio(audio_bytes)
+        log_interaction(f"[ÁUDIO ENVIADO]: {texto}", bot_reply_text, profile, log_id=log_id)
+    stt_fallback_executor.submit(transcribe_and_log)
+
+
 # ============================================================
 # 🌐 APLICAÇÃO FLASK
 # ============================================================
@@ -564,13 +947,183 @@ app = Flask(__name__)
 CORS(app)
 
 
+def get_or_create_conversation(session_id):
+    """Carrega a sessão (ChatSession reconstruída do histórico salvo) ou cria uma nova."""
+    return active_conversations.get_or_create(session_id)
+
+
+def record_turn(session, question, reply, replace_last=False):
+    """
+    Registra no histórico da sessão um turno respondido sem chamar o modelo
+    (ou, com replace_last, reescreve o último turno em texto simples).
+    """
+    history = session.convo.history
+    if replace_last:
+        history = history[:-2]
+    session.convo.history = [
+        *history,
+        {"role": "user", "parts": [{"text": question}]},
+        {"role": "model", "parts": [{"text": reply}]},
+    ]
+    active_conversations.save(session)
+
+
+def preset_reply(question, tts_is_enabled):
+    """Texto e URL do áudio pré-gravado de um preset de EVENT_INFO."""
+    info = EVENT_INFO[question]
+    url = None
+    if tts_is_enabled:
+        entry = preset_registry.get(question)
+        # Sem entrada: registro ainda carregando ou áudio sendo sintetizado
+        url = entry["url"] if entry else get_tts_audio_url(info["text"])
+    return info["text"], url
+
+
+def transcribe_audio(audio_part):
+    """
+    Transcrição curta do áudio com o modelo leve (sem a base de conhecimento),
+    só para o roteamento de presets. None em erro: o turno segue normalmente.
+    """
+    try:
+        response = generate_content(
+            [TRANSCRIBE_PROMPT, audio_part], kind="summary", generation_config=TRANSCRIBE_GENERATION_CONFIG
+        )
+        return (response.text or "").strip() or None
+    except Exception as e:
+        print(f"⚠️ Falha na transcrição prévia do áudio: {e}")
+        return None
+
+
+def route_to_preset(text):
+    """Chave do preset que responde o texto com confiança alta (ou None), com a decisão no log."""
+    key, score, reason = intent_router.route(text)
+    if key:
+        print(f"🧭 Roteado para preset: \"{text}\" → \"{key}\" ({score:.2f}, {reason})")
+    else:
+        print(f"🧭 Sem preset para \"{text}\" ({score:.2f}, {reason}). Segue para o modelo.")
+    return key
+
+
+def turn_instruction(session, question):
+    """
+    Instruções do turno: núcleo + trechos da base relevantes para a pergunta. Perguntas
+    curtas ("e onde fica?") usam também a anterior. None = arquivo inteiro.
+    """
+    if not KNOWLEDGE_BASE_TOP_K:
+        return None
+    query = question
+    if len(tokenize(question)) <= 2:
+        previous = next((message["parts"][0].get("text", "") for message in reversed(session.state.get("history", []))
+                         if message["role"] == "user" and message["parts"]), "")
+        query = f"{question} {previous}"
+    return knowledge_base.build_instruction(query)
+
+
+def is_first_turn(session):
+    """
+    A sessão ainda não tem conversa? Só o primeiro turno usa o cache de respostas:
+    depois dele a mesma pergunta pode depender do que já foi dito.
+    """
+    return not session.state.get("history") and not session.state.get("summary")
+
+
+def answer_from_cache(session, question):
+    """
+    Resposta do cache semântico para a pergunta (ou None). Num acerto, o turno
+    entra no histórico da sessão como se o modelo tivesse respondido.
+    """
+    if not is_first_turn(session):
+        return None
+    entry, score = answer_cache.lookup(question)
+    if entry is None:
+        return None
+    print(f"🎯 Cache semântico: \"{question}\" ≈ \"{entry['question']}\" ({score:.2f})")
+    record_turn(session, question, entry["reply"])
+    return entry["reply"]
+
+
+def wants_event_stream():
+    """O cliente pediu a resposta em streaming (Server-Sent Events)?"""
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+
+def sse_event(event, data):
+    """Formata um evento SSE com payload JSON."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def audio_segment_event(segment):
+    """Evento SSE de um segmento de áudio, com o formato (Content-Type) dele."""
+    return sse_event("audio", {**segment, "audioFormat": audio_format_for(segment["audioUrl"])})
+
+
+def stream_chat_reply(session, user_message, user_message_to_log, profile, tts_is_enabled):
+    """
+    Envia a mensagem com streaming e devolve os trechos de texto como eventos SSE
+    ('delta'), os segmentos de áudio por frase em ordem ('audio', se TTS ativo)
+    e um evento final 'done'. A síntese de cada frase começa assim que ela fecha,
+    enquanto o LLM ainda escreve o resto.
+    """
+    cacheable = is_first_turn(session)
+
+    def generate():
+        speech = SpeechPipeline(get_tts_audio_url, tts_pipeline_executor) if tts_is_enabled else None
+        try:
+            response = send_chat_message(session.convo, user_message, stream=True,
+                                         system_instruction=turn_instruction(session, user_message))
+            reply_parts = []
+            for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunk sem texto (ex.: apenas metadados de segurança)
+                    continue
+                if text:
+                    reply_parts.append(text)
+                    yield sse_event("delta", {"text": text})
+                    if speech:
+                        speech.feed(text)
+                        for segment in speech.ready_segments():
+                            yield audio_segment_event(segment)
+            # Só salva o turno depois do streaming completo: se ele for interrompido
+            # (erro ou cliente desconectou), o histórico salvo continua consistente.
+            active_conversations.save(session)
+            bot_reply_text = "".join(reply_parts)
+            if cacheable:
+                answer_cache.store(user_message, bot_reply_text)
+
+            log_id = log_interaction(user_message_to_log, bot_reply_text, profile)
+
+            if speech:
+                speech.finish()
+                for segment in speech.remaining_segments():
+                    yield audio_segment_event(segment)
+
+            yield sse_event("done", {
+                "reply": bot_reply_text,
+                "logId": log_id,
+                "presetQuestions": list(EVENT_INFO.keys())
+            })
+        except Exception as e:
+            print(f"Erro no /chat (streaming): {e}")
+            traceback.print_exc()
+            yield sse_event("error", {"error": "Erro interno no servidor."})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @app.route('/chat', methods=['POST'])
 def chat():
     bot_reply_text = ""
-    audio_base64 = None
+    reply_audio_url = None
     tts_is_enabled = False
     user_message_to_log = None
+    user_message = None
+    log_id = None
     profile = {}
     session_id = None
 
@@ -589,22 +1142,39 @@ def chat():
                 return jsonify({"error": "Nenhum ID de sessão fornecido."}), 400
 
             # Buscar ou criar conversa ativa
-            with convo_lock:
-                if session_id not in active_conversations:
-                    active_conversations[session_id] = model.start_chat(history=[])
-                convo = active_conversations[session_id]
-
-            # Processa áudio
-            audio_parts = [{"mime_type": audio_file.mimetype, "data": audio_file.read()}]
-            response = convo.send_message(["Responda ao que foi dito neste áudio.", audio_parts[0]])
-            audio_bytes = audio_parts[0]["data"]
-            audio_base64_transcript = base64.b64encode(audio_bytes).decode("utf-8")
-            texto = transcrever_audio_base64(audio_base64_transcript)
-
-            user_message_to_log = f"[ÁUDIO ENVIADO]: {texto}"
-            bot_reply_text = response.text
+            session = get_or_create_conversation(session_id)
+
+            audio_part = {"mime_type": audio_file.mimetype, "data": audio_file.read()}
             tts_is_enabled = True
 
+            # Pergunta falada que equivale a um preset: usa o texto e o áudio pré-gravados,
+            # sem a chamada completa ao modelo
+            transcript = transcribe_audio(audio_part) if AUDIO_ROUTE_PRESETS else None
+            preset_key = route_to_preset(transcript) if transcript else None
+            if preset_key:
+                bot_reply_text, reply_audio_url = preset_reply(preset_key, tts_is_enabled)
+                user_message_to_log = f"[ÁUDIO ENVIADO → PRESET]: {transcript}"
+                record_turn(session, transcript, bot_reply_text)
+            else:
+                # Processa áudio: uma única chamada devolve a transcrição e a resposta (JSON)
+                response = send_chat_message(
+                    session.convo, [AUDIO_TURN_PROMPT, audio_part],
+                    generation_config=AUDIO_TURN_GENERATION_CONFIG
+                )
+                texto, bot_reply_text = parse_audio_turn(response.text)
+                texto = texto or transcript
+
+                if texto:
+                    user_message_to_log = f"[ÁUDIO ENVIADO]: {texto}"
+                    # No histórico, o áudio e o JSON viram texto simples (sessão bem menor)
+                    record_turn(session, texto, bot_reply_text, replace_last=True)
+                else:
+                    # Sem transcrição estruturada: STT de reserva em segundo plano, só para o log
+                    print("⚠️ Modelo não devolveu a transcrição. Transcrevendo em segundo plano.")
+                    record_turn(session, "[Áudio enviado pelo visitante]", bot_reply_text, replace_last=True)
+                    log_id = str(uuid.uuid4())
+                    log_audio_interaction_later(audio_part["data"], bot_reply_text, profile, log_id)
+
         elif request.is_json:
             data = request.json
             tts_is_enabled = data.get('tts_enabled', False)
@@ -614,44 +1184,52 @@ def chat():
             if not session_id:
                 return jsonify({"error": "Nenhum ID de sessão fornecido."}), 400
 
-            with convo_lock:
-                if session_id not in active_conversations:
-                    active_conversations[session_id] = model.start_chat(history=[])
-                convo = active_conversations[session_id]
+            session = get_or_create_conversation(session_id)
 
             if 'preset_question' in data:
                 question = data['preset_question']
                 user_message_to_log = f"[PRESET]: {question}"
-                info = EVENT_INFO.get(question)
-                if info:
-                    bot_reply_text = info["text"]
-                    if tts_is_enabled:
-                        try:
-                            with open(info["audio_path"], "rb") as f:
-                                audio_base64 = base64.b64encode(f.read()).decode('utf-8')
-                        except FileNotFoundError:
-                            audio_base64 = get_tts_audio_data(bot_reply_text)
+                if question in EVENT_INFO:
+                    bot_reply_text, reply_audio_url = preset_reply(question, tts_is_enabled)
                 else:
-                    convo.send_message(question)
-                    bot_reply_text = convo.last.text
+                    user_message = question
 
             elif 'message' in data:
                 user_message = data['message']
                 user_message_to_log = user_message
-                convo.send_message(user_message)
-                bot_reply_text = convo.last.text
+
+            preset_key = route_to_preset(user_message) if user_message else None
+            if preset_key:
+                user_message_to_log = f"[PRESET ROTEADO]: {user_message}"
+                bot_reply_text, reply_audio_url = preset_reply(preset_key, tts_is_enabled)
+                record_turn(session, user_message, bot_reply_text)
+            elif user_message:
+                # O áudio de uma resposta em cache sai do cache TTS (mesmo texto)
+                bot_reply_text = answer_from_cache(session, user_message)
+                if bot_reply_text is None:
+                    if wants_event_stream():
+                        return stream_chat_reply(session, user_message, user_message_to_log, profile, tts_is_enabled)
+                    cacheable = is_first_turn(session)
+                    bot_reply_text = send_chat_message(
+                        session.convo, user_message, system_instruction=turn_instruction(session, user_message)
+                    ).text
+                    active_conversations.save(session)
+                    if cacheable:
+                        answer_cache.store(user_message, bot_reply_text)
 
         # Lógica de log (assumindo log_interaction)
         if user_message_to_log:
-            log_interaction(user_message_to_log, bot_reply_text, profile)
+            log_id = log_interaction(user_message_to_log, bot_reply_text, profile)
 
         # Gera TTS se necessário
-        if audio_base64 is None and tts_is_enabled and bot_reply_text:
-            audio_base64 = get_tts_audio_data(bot_reply_text)
+        if reply_audio_url is None and tts_is_enabled and bot_reply_text:
+            reply_audio_url = get_tts_audio_url(bot_reply_text)
 
         return jsonify({
             "reply": bot_reply_text,
-            "audioData": audio_base64,
+            "audioUrl": reply_audio_url,
+            "audioFormat": audio_format_for(reply_audio_url),
+            "logId": log_id,
             "presetQuestions": list(EVENT_INFO.keys())
         })
 
@@ -660,12 +1238,36 @@ def chat():
         traceback.print_exc()
         return jsonify({"error": "Erro interno no servidor."}), 500
 
+SUGGESTION_BATCH_SIZE = int(os.getenv("SUGGESTION_BATCH_SIZE", "8"))
+
+
+def generate_topic_batch():
+    """Gera um lote de sugestões numa única chamada (o modelo já tem as instruções da LIA)."""
+    response = generate_content(
+        f"Sugira {SUGGESTION_BATCH_SIZE} perguntas breves, variadas e divertidas que pareçam vindas do "
+        "próprio visitante, para começar a conversar sobre o evento Metaday. "
+        "Devolva apenas uma lista JSON de strings.",
+        generation_config={"response_mime_type": "application/json", "temperature": 1.0},
+    )
+    return parse_suggestions(response.text)
+
+
+suggestion_pool = SuggestionPool(
+    generate_topic_batch,
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix="suggestion-pool"),
+    low_water=int(os.getenv("SUGGESTION_LOW_WATER", "5")),
+    max_size=int(os.getenv("SUGGESTION_POOL_SIZE", "30")),
+)
+
+
 @app.route('/suggest-topic', methods=['GET'])
 def suggest_topic():
-    """Sugere um tópico curto para iniciar uma conversa."""
+    """Sugere um tópico curto para iniciar uma conversa (servido da reserva em memória)."""
     try:
-        response = model.generate_content(f"Sugira uma pergunta breve e divertida que pareça vinda do próprio usuário, para começar a conversar sobre o evento Metaday. Leve em consideração o prompt do sustem completo com info {SYSTEM_INSTRUCTION}")
-        return jsonify({"topic": response.text.strip()})
+        topic = suggestion_pool.get()
+        if not topic:
+            return jsonify({"error": "Nenhuma sugestão disponível no momento."}), 503
+        return jsonify({"topic": topic})
     except Exception as e:
         return jsonify({"error": f"Erro ao sugerir tópico: {e}"}), 500
 
@@ -682,24 +1284,20 @@ def summarize():
             return jsonify({"error": "Nenhum ID de sessão fornecido."}), 400
 
         # 2. Encontrar a conversa correta
-        convo = None
-        with convo_lock:
-            if session_id in active_conversations:
-                convo = active_conversations[session_id]
+        session = active_conversations.load(session_id)
+        history = session.state.get("history") if session else None
 
-        # 3. Usar a 'convo' específica da sessão
-        if not convo or not convo.history:
+        if not history:
             return jsonify({"summary": "Ainda não há histórico de conversa."})
-        
-        # O resto da sua lógica original, mas usando a 'convo' correta
-        formatted = "\n".join(
-            f"{'Usuário' if m.role == 'user' else 'Assistente'}: {m.parts[0].text}"
-            for m in convo.history if m.parts and hasattr(m.parts[0], 'text')
+
+        # 3. Resumo incremental: só os turnos novos vão ao modelo (ou nenhum, se nada mudou)
+        summary, rolling = rolling_summarizer.update(
+            history, session.state.get("rolling_summary"), session.state.get("summary")
         )
-        prompt = f"Resuma a conversa em português, de forma breve e objetiva:\n\n{formatted}"
-        response = model.generate_content(prompt)
-        return jsonify({"summary": response.text})
-        
+        if rolling is not None:
+            active_conversations.update_state(session_id, "rolling_summary", rolling)
+        return jsonify({"summary": summary})
+
     except Exception as e:
         return jsonify({"error": f"Erro ao resumir: {e}"}), 500
 
@@ -715,10 +1313,8 @@ def restart():
             return jsonify({"error": "Nenhum ID de sessão fornecido."}), 400
 
         # Limpa a sessão específica de forma thread-safe
-        with convo_lock:
-            if session_id in active_conversations:
-                del active_conversations[session_id]
-                print(f"Sessão {session_id} reiniciada.")
+        if active_conversations.pop(session_id):
+            print(f"Sessão {session_id} reiniciada.")
 
         return jsonify({"status": "success", "message": f"Conversa da sessão {session_id} reiniciada."})
 
@@ -738,20 +1334,209 @@ def get_audio():
         if not text_to_speak:
             return jsonify({"error": "Nenhum texto fornecido."}), 400
 
-        # Reutiliza a função TTS existente
-        audio_base64 = get_tts_audio_data(text_to_speak)
-        
-        return jsonify({"audioData": audio_base64})
+        # Reutiliza a função TTS existente; o áudio em si é baixado de /audio/<id>
+        url = get_tts_audio_url(text_to_speak)
+        return jsonify({"audioUrl": url, "audioFormat": audio_format_for(url)})
 
     except Exception as e:
         print(f"Erro no /get-audio: {e}")
         traceback.print_exc()
         return jsonify({"error": "Erro interno no servidor."}), 500
 
+@app.route('/audio/<audio_id>', methods=['GET'])
+def get_audio_object(audio_id):
+    """
+    Bytes do áudio com o Content-Type certo, ETag e suporte a Range. O id é o
+    hash do conteúdo, então a resposta pode ficar em cache no navegador para sempre.
+    """
+    preset = preset_registry.get_by_id(audio_id)
+    if preset:
+        # Áudio pré-gravado: servido direto da memória
+        source = io.BytesIO(preset["data"])
+    else:
+        source = audio_store.path_for(audio_id)
+        if not source:
+            return jsonify({"error": "Áudio não encontrado."}), 404
+    response = send_file(source, mimetype=AudioStore.mimetype_for(audio_id), conditional=True,
+                         etag=audio_id.split(".")[0], max_age=31536000)
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Readiness: 200 só depois que as validações (chaves Gemini e banco) terminaram e
+    passaram; 503 enquanto estão rodando ou se falharam.
+    """
+    if startup_state["ready"]:
+        return jsonify({"status": "ok", **startup_state})
+    status = "starting" if not startup_state["checks_done"] else "unhealthy"
+    return jsonify({"status": status, **startup_state}), 503
+
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Estatísticas dos caches e subsistemas internos."""
+    return jsonify({
+        "tts_cache": tts_cache.get_stats(),
+        "api_keys": key_scheduler.get_stats(),
+        "log_writer": log_writer.get_stats(),
+        "sessions": active_conversations.get_stats(),
+        "answer_cache": answer_cache.get_stats(),
+        "intent_router": intent_router.get_stats(),
+        "audio_worker": audio_worker.get_stats(),
+        "audio_store": audio_store.get_stats(),
+        "presets": preset_registry.get_stats(),
+        "suggestions": suggestion_pool.get_stats(),
+        "summaries": rolling_summarizer.get_stats(),
+        "cache_warmer": cache_warmer.get_stats(),
+        "knowledge_base": knowledge_base.get_stats(),
+        "instruction": instruction_compiler.get_stats(),
+        "static_assets": static_assets.get_stats(),
+    })
+
+# ============================================================
+# 🔥 PRÉ-AQUECIMENTO DOS CACHES
+# ============================================================
+
+def fetch_recent_interactions(days):
+    """Interações dos últimos `days` dias (user_message, bot_reply, created_at), ou None sem banco."""
+    db = wait_for_db(timeout=30)
+    if db is None:
+        return None
+    conn = db.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT user_message, bot_reply, created_at, instruction_hash FROM chat_interactions "
+                "WHERE created_at >= now() - %s * INTERVAL '1 day' AND user_message IS NOT NULL "
+                "ORDER BY created_at DESC LIMIT %s",
+                (days, CACHE_WARM_MAX_ROWS),
+            )
+            return cursor.fetchall()
+    finally:
+        db.putconn(conn)
+
+
+def generate_warm_answer(question):
+    """Resposta de primeiro turno (sem histórico), com os trechos da base para a pergunta."""
+    instruction = knowledge_base.build_instruction(question) if KNOWLEDGE_BASE_TOP_K else None
+    return call_with_scheduled_key(lambda key_model: key_model.generate_content(question).text,
+                                   "chat", instruction)
+
+
+def warm_tts_audio(text):
+    """Sintetiza o áudio da resposta para o cache TTS (False se já estava lá)."""
+    if tts_cache.contains(text, TTS_VOICE, TTS_ENCODED_VARIANT) or tts_cache.contains(text, TTS_VOICE, TTS_MODEL):
+        return False
+    return get_tts_audio(text) is not None
+
+
+@contextmanager
+def cache_warm_turn():
+    """
+    Um processo aquece por vez, entre todos os workers e máquinas: advisory lock do
+    Postgres, sem esperar. Entrega True para quem pegou a vez (e segura uma conexão
+    do pool até o fim da rodada); os outros devolvem a conexão na hora e recebem False.
+    """
+    db = wait_for_db(timeout=30)
+    if db is None:
+        yield False
+        return
+    conn = db.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (CACHE_WARM_LOCK_NAME,))
+            acquired = cursor.fetchone()[0]
+        conn.commit()
+    except Exception:
+        db.putconn(conn)
+        raise
+    if not acquired:
+        db.putconn(conn)
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (CACHE_WARM_LOCK_NAME,))
+            conn.commit()
+        finally:
+            db.putconn(conn)
+
+
+def load_warm_answers(instruction_hash):
+    """Respostas já geradas por algum processo com estas instruções (as de outras são apagadas)."""
+    db = wait_for_db(timeout=30)
+    if db is None or not instruction_hash:
+        return {}
+    conn = db.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM warm_answers WHERE instruction_hash <> %s", (instruction_hash,))
+            cursor.execute("SELECT normalized, reply FROM warm_answers WHERE instruction_hash = %s",
+                           (instruction_hash,))
+            answers = dict(cursor.fetchall())
+        conn.commit()
+        return answers
+    finally:
+        db.putconn(conn)
+
+
+def publish_warm_answer(instruction_hash, normalized, reply):
+    """Publica a resposta gerada para os outros processos copiarem sem chamar o modelo."""
+    db = wait_for_db(timeout=30)
+    if db is None or not instruction_hash:
+        return
+    conn = db.getconn()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO warm_answers (instruction_hash, normalized, reply) VALUES (%s, %s, %s) "
+                "ON CONFLICT (instruction_hash, normalized) DO UPDATE SET reply = EXCLUDED.reply, created_at = now()",
+                (instruction_hash, normalized, reply),
+            )
+        conn.commit()
+    finally:
+        db.putconn(conn)
+
+
+# Lê as perguntas mais frequentes de chat_interactions e aquece o cache semântico
+# e o cache TTS em segundo plano, só quando as chaves não estão atendendo o chat
+CACHE_WARM_TOP_N = int(os.getenv("CACHE_WARM_TOP_N", "30"))
+CACHE_WARM_MAX_ROWS = int(os.getenv("CACHE_WARM_MAX_ROWS", "20000"))
+CACHE_WARM_LOCK_NAME = "lia-cache-warmer"
+cache_warmer = CacheWarmer(
+    fetch_rows=fetch_recent_interactions,
+    answer=generate_warm_answer,
+    store_answer=answer_cache.store,
+    warm_audio=warm_tts_audio,
+    is_preset=lambda question: intent_router.classify(question)[0] is not None,
+    is_busy=lambda: key_scheduler.in_flight() > 0,
+    instruction_hash=lambda: instruction_compiler.text_hash,
+    exclusive=cache_warm_turn,
+    load_answers=load_warm_answers,
+    publish_answer=publish_warm_answer,
+    timezone=pytz.timezone("America/Sao_Paulo"),
+    top_n=CACHE_WARM_TOP_N,
+    window_days=int(os.getenv("CACHE_WARM_WINDOW_DAYS", "7")),
+    item_interval=float(os.getenv("CACHE_WARM_ITEM_INTERVAL", "5")),
+    period_hours=float(os.getenv("CACHE_WARM_PERIOD_HOURS", "0")),
+    threshold=answer_cache.threshold,
+)
+# Instruções novas esvaziam o cache de respostas: aquece de novo com elas
+instruction_compiler.add_listener(lambda text: cache_warmer.trigger())
+
+
 # ============================================================
 # 🚀 EXECUÇÃO
 # ============================================================
 
+# Build dos estáticos (dist/): nomes com hash, variantes gzip/brotli e index.html reescrito
+static_assets = StaticAssets(BASE_DIR, os.getenv("STATIC_DIST_DIR", os.path.join(BASE_DIR, "dist")))
+
 # ROTA CORRIGIDA PARA ATIVOS (ASSETS)
 # REMOVENDO A MANIPULAÇÃO AGRESSIVA DE CACHE HTTP
 @app.route("/assets/<path:filename>")
@@ -760,15 +1545,108 @@ def assets(filename):
     # permite que o "cache busting" do JavaScript funcione corretamente.
     return send_from_directory("assets", filename)
 
-# Serve o index.html da raiz
+# Arquivos do build (nome com hash): imutáveis, na melhor compressão aceita pelo cliente
+@app.route("/dist/<path:filename>")
+def dist_files(filename):
+    resolved = static_assets.resolve(filename, request.headers.get("Accept-Encoding"), request.headers.get("Accept"))
+    if resolved is None:
+        return jsonify({"error": "Arquivo não encontrado."}), 404
+    path, encoding, name = resolved
+    response = send_file(path, mimetype=mimetypes.guess_type(name)[0] or "application/octet-stream",
+                         conditional=True, max_age=31536000)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    # Accept também: imagens WebP podem ser servidas como AVIF
+    response.headers["Vary"] = "Accept, Accept-Encoding"
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+# Serve o index.html: o do build (referências com hash), revalidado por ETag a cada carga
 @app.route('/')
 def serve_index():
+    if static_assets.ready:
+        response = send_file(static_assets.page_path(), mimetype="text/html", conditional=True, max_age=0)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
     return send_from_directory('.', 'index.html')
 
-# Serve qualquer outro arquivo estático da raiz (CSS, JS, imagens, etc)
+# Arquivos do front-end na raiz (CSS, JS, favicon), para quando o build não estiver pronto.
+# Só os da lista: o resto da raiz (código, .env, instruções) não é público.
+PUBLIC_ROOT_FILES = set(ENTRY_FILES) | {"index.html"}
+
+
 @app.route('/<path:filename>')
 def serve_static_files(filename):
+    if filename not in PUBLIC_ROOT_FILES:
+        return jsonify({"error": "Arquivo não encontrado."}), 404
     return send_from_directory('.', filename)
 
+# ============================================================
+# ⚡ INICIALIZAÇÃO (validação de chaves e banco)
+# ============================================================
+
+def run_startup_checks():
+    """
+    Importa o SDK, valida o banco e as chaves, e registra quanto tempo cada etapa levou.
+    Uma etapa que falha fica em startup_state["errors"]; checks_done sempre termina True
+    (senão o /healthz ficaria em "starting" para sempre).
+    """
+    timings = startup_state["timings_ms"]
+    errors = startup_state["errors"]
+
+    def measure(name, fn):
+        """Roda uma etapa cronometrada. Retorna (deu certo?, resultado)."""
+        t = time.perf_counter()
+        try:
+            return True, fn()
+        except Exception as e:
+            errors[name] = str(e).strip()[:300]
+            print(f"❌ Etapa de inicialização \"{name}\" falhou: {e}")
+            return False, None
+        finally:
+            timings[name] = round((time.perf_counter() - t) * 1000, 1)
+
+    try:
+        genai_ok, _ = measure("genai_import", lambda: __import__("google.generativeai"))
+        measure("preset_registry", preset_registry.start)
+        if not measure("static_assets", static_assets.load_or_build)[0]:
+            print("⚠️ Servindo os arquivos estáticos originais.")
+        measure("instruction_compiler", instruction_compiler.start)
+        # Sem DATABASE_URL o banco está desligado de propósito; com ele, falhar é erro
+        _, database_ok = measure("database", init_db_pool)
+        if database_ok:
+            startup_state["database"] = "ok"
+        else:
+            startup_state["database"] = "unavailable" if DATABASE_URL else "disabled"
+        if genai_ok and measure("gemini_key_validation", configure_genai_with_available_key)[0]:
+            startup_state["gemini"] = "ok"
+            # Enche a reserva de sugestões em segundo plano, antes do primeiro clique
+            measure("suggestion_pool", suggestion_pool.maybe_refill)
+            if CACHE_WARM_TOP_N > 0 and startup_state["database"] == "ok":
+                measure("cache_warmer", cache_warmer.start)
+        else:
+            startup_state["gemini"] = "error"
+    finally:
+        timings["total_since_process_start"] = round((time.perf_counter() - STARTUP_T0) * 1000, 1)
+        startup_state["ready"] = startup_state["gemini"] == "ok" and startup_state["database"] != "unavailable"
+        startup_state["checks_done"] = True
+    print(f"⏱️ Inicialização concluída: {timings}")
+    if not startup_state["ready"]:
+        print(f"🚫 Validação falhou (gemini={startup_state['gemini']}, banco={startup_state['database']}): "
+              "o /healthz vai responder 503.")
+
+
+startup_state["timings_ms"]["module_import"] = round((time.perf_counter() - STARTUP_T0) * 1000, 1)
+
+# Com "python app.py", os processos do pool de áudio reimportam este arquivo como
+# "__mp_main__" para montar o contexto: ali não se valida nem se sobe nada.
+if __name__ != "__mp_main__":
+    if FAST_START:
+        threading.Thread(target=run_startup_checks, name="startup-checks", daemon=True).start()
+    else:
+        run_startup_checks()
+        if startup_state["gemini"] != "ok":
+            raise RuntimeError("🚫 Nenhuma chave Gemini válida disponível.")
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
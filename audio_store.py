@@ -0,0 +1,118 @@
+"""
+Objetos de áudio servidos em /audio/<id>.
+
+Em vez de mandar o áudio em base64 dentro do JSON do /chat (33% maior, e o
+cliente ainda decodificava byte a byte), o servidor grava os bytes aqui e
+devolve só a URL. O id é o hash do conteúdo: o mesmo áudio sempre tem a mesma
+URL, então o navegador pode guardar em cache para sempre (imutável).
+
+Os arquivos ficam em disco para que qualquer worker do gunicorn sirva o áudio
+gerado por outro. Passando do limite de espaço, os menos usados são apagados.
+"""
+import io
+import os
+import re
+import wave
+import hashlib
+import tempfile
+import threading
+
+MIMETYPES = {"wav": "audio/wav", "mp3": "audio/mpeg", "ogg": "audio/ogg", "opus": "audio/ogg; codecs=opus"}
+AUDIO_ID = re.compile(r"^[0-9a-f]{32}\.(wav|mp3|ogg|opus)$")
+
+# Formato do áudio cru devolvido pelo Gemini TTS (e dos arquivos pré-gravados)
+PCM_SAMPLE_RATE = 24000
+PCM_SAMPLE_WIDTH = 2
+PCM_CHANNELS = 1
+
+
+def pcm_to_wav(pcm, sample_rate=PCM_SAMPLE_RATE, sample_width=PCM_SAMPLE_WIDTH, channels=PCM_CHANNELS):
+    """Acrescenta o cabeçalho WAV ao PCM s16le (sem recodificar)."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+class AudioStore:
+    """Armazenamento de áudio endereçado por conteúdo, com limite de espaço em disco."""
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.stats = {"puts": 0, "writes": 0, "pruned": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if AUDIO_ID.match(entry.name)
+        )
+
+    def put(self, data, extension):
+        """Grava os bytes (se ainda não existirem) e retorna o id do áudio."""
+        audio_id = f"{hashlib.sha256(data).hexdigest()[:32]}.{extension}"
+        path = os.path.join(self.directory, audio_id)
+        with self._lock:
+            self.stats["puts"] += 1
+        if os.path.exists(path):
+            # Marca como usado recentemente (a limpeza apaga os mais antigos)
+            os.utime(path)
+            return audio_id
+
+        # Escrita atômica: grava num temporário e renomeia
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self.stats["writes"] += 1
+            self._total_bytes += len(data)
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self._prune()
+        return audio_id
+
+    def _prune(self):
+        """Apaga os áudios menos usados até ficar abaixo de 90% do limite."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if AUDIO_ID.match(entry.name)),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        total = sum(entry.stat().st_size for entry in entries)
+        pruned = 0
+        for entry in entries:
+            if total <= self.max_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+            pruned += 1
+        with self._lock:
+            self._total_bytes = total
+            self.stats["pruned"] += pruned
+
+    def path_for(self, audio_id):
+        """Caminho do arquivo do áudio, ou None se o id for inválido/não existir."""
+        if not AUDIO_ID.match(audio_id or ""):
+            return None
+        path = os.path.join(self.directory, audio_id)
+        return path if os.path.exists(path) else None
+
+    @staticmethod
+    def mimetype_for(audio_id):
+        return MIMETYPES[audio_id.rsplit(".", 1)[1]]
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "bytes": self._total_bytes, "max_bytes": self.max_bytes}
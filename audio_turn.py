@@ -0,0 +1,72 @@
+"""
+Turno de áudio em uma única chamada ao Gemini.
+
+O modelo recebe o áudio e devolve, num JSON, a transcrição do que foi dito e a
+resposta. Assim não é preciso uma segunda rodada de reconhecimento de voz
+(pydub/ffmpeg + recognize_google) só para saber o que o visitante falou.
+Se o JSON vier quebrado, o parser tenta recuperar os campos; se não houver
+resposta utilizável, o visitante recebe uma resposta fixa (o JSON cru nunca é
+mostrado nem falado).
+
+Antes dessa chamada, uma transcrição curta (modelo leve, sem a base de
+conhecimento) decide se a pergunta falada é um preset: nesse caso a resposta
+pré-gravada sai na hora, sem a chamada completa.
+"""
+import re
+import json
+
+AUDIO_TURN_PROMPT = (
+    "Transcreva exatamente o que foi dito neste áudio e responda ao visitante. "
+    'Devolva apenas um JSON no formato {"transcricao": "...", "resposta": "..."}.'
+)
+
+AUDIO_TURN_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+TRANSCRIBE_PROMPT = "Transcreva exatamente o que foi dito neste áudio. Devolva só a transcrição."
+
+TRANSCRIBE_GENERATION_CONFIG = {"temperature": 0, "max_output_tokens": 128}
+
+# Resposta segura quando a saída do modelo não traz uma "resposta" utilizável
+AUDIO_TURN_FALLBACK_REPLY = "Desculpe, não consegui entender bem o seu áudio. Pode repetir, por favor?"
+
+FENCE = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def _extract_field(text, name):
+    """Valor de um campo string de um JSON possivelmente malformado/truncado."""
+    match = re.search(rf'"{name}"\s*:\s*"((?:[^"\\]|\\.)*)("?)', text, re.DOTALL)
+    if not match:
+        return None
+    raw = match.group(1)
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        return raw.replace('\\"', '"').replace("\\n", "\n")
+
+
+def parse_audio_turn(text):
+    """
+    Retorna (transcrição ou None, resposta) a partir da saída do modelo.
+    Tenta JSON estrito, depois extração campo a campo. Texto simples (o modelo
+    ignorou o formato) vira a resposta; JSON sem resposta utilizável vira a
+    resposta fixa AUDIO_TURN_FALLBACK_REPLY, com a saída registrada no log.
+    """
+    cleaned = FENCE.sub("", (text or "").strip())
+    try:
+        data = json.loads(cleaned)
+        if isinstance(data, dict) and isinstance(data.get("resposta"), str) and data["resposta"].strip():
+            transcript = data.get("transcricao")
+            transcript = transcript.strip() if isinstance(transcript, str) else ""
+            return transcript or None, data["resposta"].strip()
+    except json.JSONDecodeError:
+        pass
+
+    reply = _extract_field(cleaned, "resposta")
+    if reply and reply.strip():
+        transcript = _extract_field(cleaned, "transcricao")
+        return (transcript or "").strip() or None, reply.strip()
+    if cleaned and not cleaned.startswith(("{", "[")):
+        return None, cleaned
+    print(f"⚠️ Turno de áudio sem resposta utilizável: {cleaned[:200]!r}")
+    transcript = _extract_field(cleaned, "transcricao")
+    return (transcript or "").strip() or None, AUDIO_TURN_FALLBACK_REPLY
@@ -0,0 +1,173 @@
+"""
+Processamento de áudio (decodificar, reamostrar, codificar) fora das threads do Flask.
+
+As conversões com pydub chamam o ffmpeg e ocupam CPU; feitas na thread da
+requisição, poucos turnos de voz simultâneos travavam os 3 threads do
+gunicorn. Aqui elas rodam num pool limitado de processos, com fila limitada
+(quando enche, o job é recusado na hora), timeout por job e interface só de
+bytes em memória. As métricas mostram a profundidade da fila e o tempo de
+CPU de cada job (do processo de trabalho + ffmpeg).
+"""
+import io
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+
+class AudioQueueFullError(RuntimeError):
+    """A fila de jobs de áudio está cheia."""
+
+
+class AudioJobTimeoutError(RuntimeError):
+    """O job de áudio passou do tempo limite."""
+
+
+def _cpu_seconds():
+    try:
+        import resource  # só existe no Unix
+    except ImportError:
+        # Windows: só o tempo do próprio processo (sem o ffmpeg)
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)  # ffmpeg chamado pelo pydub
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def transcode(data, output_format="wav", input_format=None, sample_rate=None, channels=None,
+              sample_width=None, bitrate=None):
+    """
+    Job executado no processo de trabalho: decodifica `data` (bytes), opcionalmente
+    reamostra/converte canais e codifica em `output_format`.
+    Para PCM cru, use input_format="s16le" com sample_rate/channels/sample_width.
+    Retorna (bytes, segundos de CPU).
+    """
+    from pydub import AudioSegment
+
+    started = _cpu_seconds()
+    if input_format == "s16le":
+        audio = AudioSegment(data=data, sample_width=sample_width or 2,
+                             frame_rate=sample_rate or 24000, channels=channels or 1)
+    else:
+        audio = AudioSegment.from_file(io.BytesIO(data), format=input_format)
+        if sample_rate:
+            audio = audio.set_frame_rate(sample_rate)
+        if channels:
+            audio = audio.set_channels(channels)
+        if sample_width:
+            audio = audio.set_sample_width(sample_width)
+
+    output = io.BytesIO()
+    audio.export(output, format=output_format, bitrate=bitrate)
+    return output.getvalue(), _cpu_seconds() - started
+
+
+def _process_context():
+    """
+    "forkserver": os processos de trabalho nascem de um servidor pequeno, sem as
+    threads do gunicorn, que já importou este módulo e o pydub (cada processo novo
+    começa pronto). Onde não existe (Windows), "spawn".
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(["audio_worker", "pydub"])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class AudioWorker:
+    """Pool de processos com fila limitada, timeout e métricas para jobs de áudio."""
+
+    def __init__(self, max_workers=2, max_queue=8, timeout=20.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0,
+                      "rejected": 0, "in_flight": 0, "cpu_seconds_total": 0.0,
+                      "cpu_seconds_last": 0.0, "wall_seconds_last": 0.0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Nada de fork direto: o processo do gunicorn tem threads, e fork com threads é frágil
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=_process_context(),
+                )
+            return self._executor
+
+    def _count(self, **changes):
+        with self._lock:
+            for name, amount in changes.items():
+                self.stats[name] += amount
+
+    def submit(self, fn, *args, **kwargs):
+        """Agenda fn(*args, **kwargs) no pool. Levanta AudioQueueFullError se a fila estiver cheia."""
+        if not self._slots.acquire(blocking=False):
+            self._count(rejected=1)
+            raise AudioQueueFullError("Fila de processamento de áudio cheia.")
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        self._count(submitted=1, in_flight=1)
+        started = time.monotonic()
+
+        def on_done(done):
+            # A vaga só é liberada quando o processo realmente termina o job
+            self._slots.release()
+            self._count(in_flight=-1)
+            if done.cancelled() or done.exception() is not None:
+                self._count(failed=1)
+                return
+            _, cpu_seconds = done.result()
+            with self._lock:
+                self.stats["completed"] += 1
+                self.stats["cpu_seconds_total"] += cpu_seconds
+                self.stats["cpu_seconds_last"] = round(cpu_seconds, 3)
+                self.stats["wall_seconds_last"] = round(time.monotonic() - started, 3)
+
+        future.add_done_callback(on_done)
+        return future
+
+    def run(self, fn, *args, timeout=None, on_late=None, **kwargs):
+        """
+        Executa um job e espera o resultado (bytes). Levanta AudioJobTimeoutError no timeout.
+        Com on_late, o job não é cancelado no timeout: on_late(bytes) recebe o resultado
+        quando ele ficar pronto (quem chamou já seguiu sem ele).
+        """
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            data, _ = future.result(timeout=timeout or self.timeout)
+            return data
+        except FutureTimeoutError:
+            self._count(timeouts=1)
+            if on_late is None:
+                future.cancel()
+            else:
+                future.add_done_callback(
+                    lambda done: None if done.cancelled() or done.exception() else on_late(done.result()[0])
+                )
+            raise AudioJobTimeoutError(f"Job de áudio passou de {timeout or self.timeout:.1f}s.")
+
+    def transcode(self, data, output_format="wav", timeout=None, on_late=None, **options):
+        """Atalho para o job transcode (bytes de entrada → bytes de saída)."""
+        return self.run(transcode, data, output_format, timeout=timeout, on_late=on_late, **options)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = max(0, stats["in_flight"] - self.max_workers)
+        stats["cpu_seconds_total"] = round(stats["cpu_seconds_total"], 3)
+        stats["cpu_seconds_avg"] = round(stats["cpu_seconds_total"] / stats["completed"], 3) if stats["completed"] else 0.0
+        return stats
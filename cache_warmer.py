@@ -0,0 +1,257 @@
+"""
+Pré-aquecimento dos caches com as perguntas mais frequentes do histórico.
+
+A cada deploy os caches de respostas (semântico) e de áudio (TTS) começam
+vazios, e os primeiros visitantes do dia pagam a latência inteira do LLM e do
+TTS justamente nas perguntas mais comuns. Este job lê as interações recentes
+de chat_interactions, agrupa as perguntas normalizadas, pega as N mais
+frequentes e, em segundo plano, guarda a resposta no cache semântico e
+sintetiza o áudio dela.
+
+A resposta registrada no log só é reaproveitada se foi gerada com as mesmas
+instruções compiladas (mesmo hash do texto, não a data dos arquivos: um deploy
+sem mudança de conteúdo não invalida nada); senão ela é gerada de novo.
+Perguntas que hoje caem num preset, ou que só fazem sentido dentro de uma
+conversa, ficam de fora. O job só avança quando não há requisições do chat em
+andamento e espera um intervalo entre um item e outro, para nunca disputar
+cota com o tráfego real.
+
+Com vários workers (e máquinas), um só aquece por vez (exclusive, um lock no
+banco que não espera). Quem não pega a vez tenta de novo mais tarde; as
+respostas geradas pelo primeiro ficam publicadas no banco com o hash das
+instruções, e os outros só as copiam para o próprio cache semântico, sem
+chamar o modelo de novo.
+
+O relatório diz quanto do tráfego do dia anterior o conjunto aquecido cobre
+(pergunta igual ou parecida o bastante para acertar o cache semântico).
+"""
+import re
+import time
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from semantic_cache import SemanticAnswerCache, normalize_question, is_self_contained
+
+# "[PRESET ROTEADO]: onde fica...", "[ÁUDIO ENVIADO]: ..." (marcadores do log_interaction)
+LOG_MARKER = re.compile(r"^\[([^\]]*)\]:\s*")
+
+
+def parse_logged_question(message):
+    """Pergunta registrada sem o marcador do log, e se ela foi respondida por um preset."""
+    message = (message or "").strip()
+    match = LOG_MARKER.match(message)
+    if not match:
+        return message, False
+    return message[match.end():].strip(), "PRESET" in match.group(1)
+
+
+def top_questions(rows, top_n, is_preset=lambda question: False, min_chars=8):
+    """
+    As top_n perguntas mais frequentes de rows [(user_message, bot_reply, created_at,
+    instruction_hash)], sem as de preset e sem as que dependem da conversa. Cada item:
+    question (a forma mais comum), normalized, count, reply, replied_at e reply_hash
+    (a resposta mais recente registrada e o hash das instruções com que foi gerada).
+    """
+    counts = Counter()
+    forms = defaultdict(Counter)
+    latest = {}
+    for user_message, bot_reply, created_at, instruction_hash in rows:
+        question, preset = parse_logged_question(user_message)
+        normalized = normalize_question(question)
+        if preset or len(normalized) < min_chars or not is_self_contained(question):
+            continue
+        counts[normalized] += 1
+        forms[normalized][question] += 1
+        if bot_reply and (normalized not in latest or created_at > latest[normalized][1]):
+            latest[normalized] = (bot_reply, created_at, instruction_hash)
+
+    selected = []
+    for normalized, count in counts.most_common():
+        if len(selected) >= top_n:
+            break
+        question = forms[normalized].most_common(1)[0][0]
+        if is_preset(question):
+            continue
+        reply, replied_at, reply_hash = latest.get(normalized, (None, None, None))
+        selected.append({"question": question, "normalized": normalized, "count": count,
+                         "reply": reply, "replied_at": replied_at, "reply_hash": reply_hash})
+    return selected
+
+
+def traffic_coverage(rows, warm_questions, threshold, is_preset=lambda question: False):
+    """
+    Quanto das perguntas em rows o conjunto aquecido responderia: igual (normalizada),
+    parecida (acerto do cache semântico com o mesmo limiar) ou preset.
+    """
+    index = SemanticAnswerCache(threshold=threshold, max_entries=max(1, len(warm_questions)))
+    for question in warm_questions:
+        index.store(question, "-")
+    warm_normalized = {normalize_question(question) for question in warm_questions}
+
+    total = exact = similar = presets = 0
+    for user_message, *_ in rows:
+        question, preset = parse_logged_question(user_message)
+        normalized = normalize_question(question)
+        if not normalized:
+            continue
+        total += 1
+        if preset or is_preset(question):
+            presets += 1
+        elif normalized in warm_normalized:
+            exact += 1
+        elif index.lookup(question)[0] is not None:
+            similar += 1
+    return {
+        "questions": total,
+        "exact": exact,
+        "similar": similar,
+        "presets": presets,
+        "coverage": round((exact + similar) / total, 3) if total else None,
+        "coverage_with_presets": round((exact + similar + presets) / total, 3) if total else None,
+    }
+
+
+class CacheWarmer:
+    """
+    Funções injetadas pelo app:
+    fetch_rows(dias) -> [(user_message, bot_reply, created_at, instruction_hash)] ou None (sem banco);
+    answer(pergunta) -> resposta nova do modelo; store_answer(pergunta, resposta);
+    warm_audio(resposta) (sintetiza e guarda no cache TTS); is_preset(pergunta);
+    is_busy() (há tráfego real usando as chaves?); instruction_hash() -> hash das
+    instruções atuais (só respostas geradas com ele são reaproveitadas);
+    exclusive() -> context manager que entrega True se este processo pegou a vez (nenhum
+    outro está aquecendo) e False se não; load_answers(hash) -> {normalizada: resposta} e
+    publish_answer(hash, normalizada, resposta): respostas geradas por qualquer processo.
+    """
+
+    def __init__(self, fetch_rows, answer, store_answer, warm_audio, is_preset, is_busy, instruction_hash,
+                 exclusive, load_answers, publish_answer, timezone, top_n=30, window_days=7,
+                 item_interval=5.0, period_hours=0.0, threshold=0.8, retry_interval=120.0):
+        self.fetch_rows = fetch_rows
+        self.answer = answer
+        self.store_answer = store_answer
+        self.warm_audio = warm_audio
+        self.is_preset = is_preset
+        self.is_busy = is_busy
+        self.instruction_hash = instruction_hash
+        self.exclusive = exclusive
+        self.load_answers = load_answers
+        self.publish_answer = publish_answer
+        self.timezone = timezone
+        self.top_n = top_n
+        self.window_days = window_days
+        self.item_interval = item_interval
+        self.period_hours = period_hours
+        self.threshold = threshold
+        self.retry_interval = retry_interval
+        self._trigger = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {"runs": 0, "warmed": 0, "reused_replies": 0, "shared_replies": 0, "generated_replies": 0,
+                      "audio_warmed": 0, "errors": 0, "last_run_at": None, "last_run_seconds": None,
+                      "warm_set": 0, "previous_day": None,
+                      "skipped_not_leader": 0}
+
+    def start(self):
+        """Inicia a thread: uma rodada agora e depois a cada period_hours (0 = só sob demanda)."""
+        with self._lock:
+            if self._thread is None:
+                self._trigger.set()
+                self._thread = threading.Thread(target=self._loop, name="cache-warmer", daemon=True)
+                self._thread.start()
+
+    def trigger(self):
+        """Pede uma nova rodada (ex.: depois que as instruções mudaram e o cache foi esvaziado)."""
+        self._trigger.set()
+
+    def _loop(self):
+        while True:
+            self._trigger.wait(self.period_hours * 3600 if self.period_hours > 0 else None)
+            self._trigger.clear()
+            try:
+                self.run()
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"❌ Erro no pré-aquecimento dos caches: {e}")
+
+    def _previous_day(self, rows):
+        yesterday = (datetime.now(self.timezone) - timedelta(days=1)).date()
+        return [row for row in rows if row[2] and row[2].astimezone(self.timezone).date() == yesterday]
+
+    def _wait_for_idle(self):
+        while self.is_busy():
+            time.sleep(1.0)
+
+    def run(self):
+        """Uma rodada, se nenhum outro processo estiver aquecendo; senão tenta de novo depois."""
+        with self.exclusive() as acquired:
+            if acquired:
+                self._run()
+                return
+        with self._lock:
+            self.stats["skipped_not_leader"] += 1
+        print(f"🔥 Outro processo está pré-aquecendo os caches: nova tentativa em {self.retry_interval:.0f}s.")
+        retry = threading.Timer(self.retry_interval, self.trigger)
+        retry.daemon = True
+        retry.start()
+
+    def _run(self):
+        """Escolhe o conjunto, mede a cobertura de ontem e aquece item a item."""
+        rows = self.fetch_rows(self.window_days)
+        if rows is None:
+            print("⚠️ Pré-aquecimento dos caches pulado: banco de dados indisponível.")
+            return
+        started = time.perf_counter()
+        selected = top_questions(rows, self.top_n, self.is_preset)
+        report = traffic_coverage(self._previous_day(rows), [item["question"] for item in selected],
+                                  self.threshold, self.is_preset)
+        with self._lock:
+            self.stats["warm_set"] = len(selected)
+            self.stats["previous_day"] = report
+        if report["coverage"] is not None:
+            print(f"🔥 Pré-aquecendo {len(selected)} pergunta(s): cobrem {report['coverage']:.0%} das "
+                  f"{report['questions']} pergunta(s) de ontem ({report['coverage_with_presets']:.0%} com os presets).")
+        else:
+            print(f"🔥 Pré-aquecendo {len(selected)} pergunta(s) (sem tráfego ontem para medir a cobertura).")
+
+        instruction_hash = self.instruction_hash()
+        published = self.load_answers(instruction_hash)
+        for item in selected:
+            audio_warmed = False
+            try:
+                # Ordem: publicada por outro processo, registrada no log, gerada agora
+                reply, source = published.get(item["normalized"]), "shared_replies"
+                if not reply and item["reply"] and instruction_hash and item["reply_hash"] == instruction_hash:
+                    reply, source = item["reply"], "reused_replies"
+                if not reply:
+                    self._wait_for_idle()
+                    reply, source = self.answer(item["question"]), "generated_replies"
+                    self.publish_answer(instruction_hash, item["normalized"], reply)
+                self.store_answer(item["question"], reply)
+                self._wait_for_idle()
+                audio_warmed = self.warm_audio(reply)
+                with self._lock:
+                    self.stats["warmed"] += 1
+                    self.stats[source] += 1
+                    self.stats["audio_warmed"] += 1 if audio_warmed else 0
+            except Exception as e:
+                source = None
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"⚠️ Não foi possível pré-aquecer \"{item['question']}\": {e}")
+            if source != "shared_replies" or audio_warmed:
+                # Só espera entre os itens que usaram as chaves
+                time.sleep(self.item_interval)
+
+        seconds = round(time.perf_counter() - started, 1)
+        with self._lock:
+            self.stats["runs"] += 1
+            self.stats["last_run_at"] = datetime.now(self.timezone).isoformat(timespec="seconds")
+            self.stats["last_run_seconds"] = seconds
+        print(f"🔥 Pré-aquecimento concluído em {seconds}s.")
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "top_n": self.top_n, "window_days": self.window_days}
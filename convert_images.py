@@ -1,10 +1,256 @@
-from PIL import Image
+"""
+Otimização em lote das imagens e do vídeo de assets/.
+
+Para cada imagem (png/jpg/webp) gera várias larguras em WebP e AVIF, cada uma
+com a menor qualidade que ainda fica visualmente igual à original (busca
+binária na qualidade até o PSNR ficar acima do alvo). Para cada vídeo gera um
+quadro de capa (poster) e uma versão recodificada menor (ffmpeg). Tudo roda
+num pool de processos e vai para assets/optimized/, com um manifest.json que o
+build dos estáticos (static_assets.py) usa para escolher a variante certa.
+
+Arquivos cujo conteúdo não mudou (mesmo hash no manifest) são pulados.
+
+Uso: python convert_images.py [--workers N] [--widths 320,640,1024] [--force]
+"""
+import io
 import os
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from PIL import Image, features
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSETS_DIR = os.path.join(BASE_DIR, "assets")
+OUTPUT_DIR = os.path.join(ASSETS_DIR, "optimized")
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, "manifest.json")
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp"}
+VIDEO_EXTENSIONS = {".mp4", ".webm", ".mov"}
+DEFAULT_WIDTHS = [320, 640, 1024]
+
+# Alvo de qualidade (PSNR em dB contra a original redimensionada) e faixa da busca
+TARGET_PSNR = {"webp": 40.0, "avif": 38.0}
+QUALITY_RANGE = {"webp": (40, 95), "avif": (30, 90)}
+
+# Recodificação do vídeo: largura máxima e qualidade (CRF do x264, menor = melhor)
+VIDEO_MAX_WIDTH = 720
+VIDEO_CRF = 28
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def avif_supported():
+    try:
+        if features.check("avif"):
+            return True
+    except ValueError:
+        pass
+    try:
+        import pillow_avif  # noqa: F401  (plugin que registra o AVIF em Pillow antigos)
+        return True
+    except ImportError:
+        return False
+
+
+def psnr(reference, candidate):
+    """PSNR (dB) entre duas imagens do mesmo tamanho e modo."""
+    a = np.asarray(reference, dtype=np.float32)
+    b = np.asarray(candidate, dtype=np.float32)
+    mse = float(np.mean((a - b) ** 2))
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def encode(image, image_format, quality):
+    buffer = io.BytesIO()
+    if image_format == "webp":
+        image.save(buffer, "WEBP", quality=quality, method=6)
+    else:
+        image.save(buffer, "AVIF", quality=quality, speed=6)
+    return buffer.getvalue()
+
+
+def search_quality(image, image_format):
+    """Menor qualidade cujo PSNR fica acima do alvo (busca binária). Retorna (bytes, qualidade, psnr)."""
+    low, high = QUALITY_RANGE[image_format]
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        data = encode(image, image_format, quality)
+        with Image.open(io.BytesIO(data)) as decoded:
+            score = psnr(image, decoded.convert(image.mode))
+        if score >= TARGET_PSNR[image_format]:
+            best = (data, quality, score)
+            high = quality - 1
+        else:
+            low = quality + 1
+    if best is None:
+        quality = QUALITY_RANGE[image_format][1]
+        data = encode(image, image_format, quality)
+        with Image.open(io.BytesIO(data)) as decoded:
+            best = (data, quality, psnr(image, decoded.convert(image.mode)))
+    return best
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def optimize_image(path, digest, widths, formats):
+    """Job do pool: todas as larguras/formatos de uma imagem. Retorna a entrada do manifest."""
+    started = time.perf_counter()
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "-")
+    with Image.open(path) as source:
+        source.load()
+        mode = "RGBA" if source.mode in ("RGBA", "LA", "P") else "RGB"
+        image = source.convert(mode)
+    original_width, original_height = image.size
+
+    variants = []
+    for width in sorted({w for w in widths if w < original_width} | {original_width}):
+        height = round(original_height * width / original_width)
+        resized = image if width == original_width else image.resize((width, height), Image.LANCZOS)
+        for image_format in formats:
+            data, quality, score = search_quality(resized, image_format)
+            name = f"{stem}-{width}w.{image_format}"
+            _write_atomic(os.path.join(OUTPUT_DIR, name), data)
+            variants.append({"path": f"assets/optimized/{name}", "format": image_format, "width": width,
+                             "height": height, "bytes": len(data), "quality": quality,
+                             "psnr": round(score, 1)})
+    return {"type": "image", "hash": digest, "width": original_width, "height": original_height,
+            "bytes": os.path.getsize(path), "variants": variants,
+            "seconds": round(time.perf_counter() - started, 2)}
+
+
+def optimize_video(path, digest):
+    """Job do pool: poster (primeiro quadro, WebP) e recodificação H.264 menor, via ffmpeg."""
+    started = time.perf_counter()
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "-")
+    entry = {"type": "video", "hash": digest, "bytes": os.path.getsize(path), "variants": [],
+             "poster": None}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        frame_path = os.path.join(tmp, "poster.png")
+        subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-i", path, "-frames:v", "1", frame_path],
+                       check=True)
+        with Image.open(frame_path) as frame:
+            frame = frame.convert("RGB")
+            data, quality, _ = search_quality(frame, "webp")
+            poster_name = f"{stem}-poster.webp"
+            _write_atomic(os.path.join(OUTPUT_DIR, poster_name), data)
+            entry["poster"] = {"path": f"assets/optimized/{poster_name}", "format": "webp",
+                               "width": frame.width, "height": frame.height, "bytes": len(data),
+                               "quality": quality}
+
+        video_name = f"{stem}-{VIDEO_MAX_WIDTH}p.mp4"
+        encoded_path = os.path.join(tmp, video_name)
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error", "-i", path,
+            "-vf", f"scale='min({VIDEO_MAX_WIDTH},iw)':-2",
+            "-c:v", "libx264", "-preset", "slow", "-crf", str(VIDEO_CRF), "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart", "-c:a", "aac", "-b:a", "64k", encoded_path,
+        ], check=True)
+        size = os.path.getsize(encoded_path)
+        # Só vale a pena se ficou menor que o original
+        if size < entry["bytes"]:
+            shutil.move(encoded_path, os.path.join(OUTPUT_DIR, video_name))
+            entry["variants"].append({"path": f"assets/optimized/{video_name}", "format": "mp4",
+                                      "bytes": size})
+    entry["seconds"] = round(time.perf_counter() - started, 2)
+    return entry
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_current(entry, digest):
+    """A entrada do manifest corresponde a este conteúdo e todos os arquivos gerados existem?"""
+    if not entry or entry.get("hash") != digest:
+        return False
+    outputs = entry["variants"] + ([entry["poster"]] if entry.get("poster") else [])
+    return all(os.path.exists(os.path.join(BASE_DIR, output["path"])) for output in outputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Otimiza as imagens e vídeos de assets/.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--widths", default=",".join(str(w) for w in DEFAULT_WIDTHS))
+    parser.add_argument("--force", action="store_true", help="refaz mesmo os arquivos que não mudaram")
+    args = parser.parse_args()
+    widths = [int(w) for w in args.widths.split(",") if w.strip()]
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    formats = ["webp"] + (["avif"] if avif_supported() else [])
+    if "avif" not in formats:
+        print("⚠️ Pillow sem suporte a AVIF (instale pillow-avif-plugin): gerando só WebP.")
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+    if not has_ffmpeg:
+        print("⚠️ ffmpeg não encontrado: vídeos não serão otimizados.")
+
+    previous = load_manifest()
+    manifest = {}
+    jobs = {}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for entry in sorted(os.scandir(ASSETS_DIR), key=lambda e: e.name):
+            if not entry.is_file():
+                continue
+            logical_path = f"assets/{entry.name}"
+            extension = os.path.splitext(entry.name)[1].lower()
+            if extension not in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS:
+                continue
+            digest = file_hash(entry.path)
+            if not args.force and is_current(previous.get(logical_path), digest):
+                manifest[logical_path] = previous[logical_path]
+                print(f"⏭️  {logical_path}: sem mudanças.")
+                continue
+            if extension in IMAGE_EXTENSIONS:
+                jobs[pool.submit(optimize_image, entry.path, digest, widths, formats)] = logical_path
+            elif has_ffmpeg:
+                jobs[pool.submit(optimize_video, entry.path, digest)] = logical_path
+
+        for future in as_completed(jobs):
+            logical_path = jobs[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"❌ {logical_path}: {e}")
+                continue
+            manifest[logical_path] = result
+            outputs = result["variants"] + ([result["poster"]] if result.get("poster") else [])
+            smallest = min((output["bytes"] for output in outputs), default=result["bytes"])
+            print(f"✅ {logical_path}: {len(outputs)} arquivo(s), {result['bytes'] / 1024:.0f} KB → "
+                  f"a partir de {smallest / 1024:.0f} KB ({result['seconds']}s)")
+
+    _write_atomic(MANIFEST_PATH, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    print(f"📄 Manifest gravado em {MANIFEST_PATH} ({len(jobs)} processado(s), "
+          f"{len(manifest) - len(jobs)} pulado(s), {time.perf_counter() - started:.1f}s).")
 
-# Caminho da imagem original
-input_path = "assets/avatar_fechada.png"
-# Caminho da saída em WebP
-output_path = "assets/avatar_fechada.webp"
 
-with Image.open(input_path) as img:
-    img.save(output_path, "WEBP", quality=90, method=6)
+if __name__ == "__main__":
+    main()
@@ -1,117 +1,149 @@
+"""
+Gerador dos áudios pré-gravados (respostas_pre_gravadas/).
+
+Lê o catálogo do mesmo lugar que o app (event_info.py) e só sintetiza de novo
+as respostas cujo texto mudou: o hash de cada texto (com o prompt, a voz e o
+modelo) fica em respostas_pre_gravadas/manifest.json. Os itens pendentes são
+distribuídos entre todas as chaves de GEMINI_API_KEYS ao mesmo tempo, cada uma
+dentro da sua cota (agendador de chaves do app, com cooldown em erro de cota).
+Cada arquivo é gravado de forma atômica e o manifest é atualizado a cada item,
+então uma execução interrompida não perde o que já foi gerado.
+
+Uso: python create_audio.py [--rpm 2] [--force] [--dry-run]
+"""
 import os
-import requests
 import json
-from dotenv import load_dotenv
-import base64
 import time
+import base64
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from dotenv import load_dotenv
+
+from event_info import EVENT_INFO, TTS_MODEL, TTS_VOICE, TTS_PROMPT
+from key_scheduler import KeyScheduler, KeyRequestError, NoAvailableKeyError
+from preset_registry import text_hash, load_manifest, save_manifest, manifest_entry, write_atomic
 
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
-# --- Configuração do Gemini ---
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEYS")
-
 # Lê todas as chaves de API listadas em GEMINI_API_KEYS (separadas por vírgula)
 API_KEYS = [key.strip() for key in os.getenv("GEMINI_API_KEYS", "").split(",") if key.strip()]
 
-if not API_KEYS:
-    raise ValueError("A variável de ambiente GEMINI_API_KEY não foi configurada. Verifique seu arquivo .env.")
-
-# URL da API de TTS do Gemini
-TTS_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash-preview-tts:generateContent?key={API_KEYS[0]}"
-
-# --- Dicionário de Perguntas e Respostas ---
-# (O mesmo dicionário que você atualizou no app.py)
-EVENT_INFO = {
-    # "Onde posso ver os projetos de Ciência de Dados para Negócios?": {
-    #     "text": "Os projetos de Ciência de Dados para Negócios estão no 3º andar, sala 307! 💡 Lá, os alunos mostram soluções inovadoras e é onde você encontra a LIA — eu! 🤖",
-    #     "audio_path": "respostas_pre_gravadas/projetos_cdn.mp3"
-    # },
-    # "E os trabalhos de Marketing, onde estão?": {
-    #     "text": "Os projetos de Marketing estão no 2º andar, nas salas 202, 203, 206, 208, 209, 210 e também na área do ping pong. 🎯 Uma mostra cheia de criatividade e estratégia!",
-    #     "audio_path": "respostas_pre_gravadas/projetos_mkt.mp3"
-    # },
-    # "Onde encontro os projetos de GNI?": {
-    #     "text": "Os projetos de Gestão de Negócios e Inovação (GNI) estão espalhados pelo térreo, 2º e 3º andares. 💼 No térreo há a Feira de Empreendedores, e nos outros andares, os projetos acadêmicos e especiais!",
-    #     "audio_path": "respostas_pre_gravadas/projetos_gni.mp3"
-    # },
-    # "Onde encontro comidas e doces?": {
-    #     "text": "A área de alimentação fica no térreo! 🍔🍰 Você encontra Tati Nasi Confeitaria, Bolindos, Nabru Doces, ZAP Burger, Sorveteria Cris Bom e Cantina das Bentas. Delícias feitas por empreendedores da feira!",
-    #     "audio_path": "respostas_pre_gravadas/empresas_alimentacao.mp3"
-    # },
-    # "Quais empresas estão no evento?": {
-    #     "text": "No térreo estão várias empresas e parceiros incríveis! 🌟 Como Tati Nasi, Bolindos, Nabru Doces, ZAP Burger, Sorveteria Cris Bom, Cantina das Bentas, Dans Brechó, Anainá Moda Sustentável e muitas outras!",
-    #     "audio_path": "respostas_pre_gravadas/empresas_expondo.mp3"
-    # },
-    "O que é a LIA?": {
-        "text": "Sou eu! 😄 Fui criada pelos alunos do 2º semestre de Ciência de Dados para Negócios — Felipe Tavares, Thiago Teles, Paulo Futagawa, Thais Nakazone e Riquelme Nichiyama — com orientação dos profs. Rômulo Maia e Nathane de Castro. Minha missão é ajudar você no Meta Day! 💙🤖",
-        "audio_path": "respostas_pre_gravadas/o_que_e_lia.mp3"
-    }
-}
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+REQUEST_TIMEOUT = 120
+MAX_ATTEMPTS = 4
 
 
-def generate_and_save_audio(text_to_speak, output_path):
-    """Chama a API de TTS do Gemini e salva o áudio em um arquivo."""
+def request_tts(key, text):
+    """Uma chamada de TTS na Gemini com a chave dada. Retorna os bytes PCM."""
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{TTS_MODEL}:generateContent?key={key}"
     payload = {
-        "contents": [{"parts": [{"text": f"Fale de forma natural e clara, como uma assistente prestativa: {text_to_speak}"}]}],
+        "contents": [{"parts": [{"text": f"{TTS_PROMPT}{text}"}]}],
         "generationConfig": {
             "responseModalities": ["AUDIO"],
-            "speechConfig": {
-                "voiceConfig": {
-                    "prebuiltVoiceConfig": {"voiceName": "Aoede"}
-                }
-            }
+            "speechConfig": {"voiceConfig": {"prebuiltVoiceConfig": {"voiceName": TTS_VOICE}}}
         },
-        "model": "gemini-2.5-flash-preview-tts"
+        "model": TTS_MODEL
     }
-    headers = {'Content-Type': 'application/json'}
-
-    try:
-        print(f"Gerando áudio para: '{output_path}'...")
-        response = requests.post(TTS_API_URL, headers=headers, data=json.dumps(payload))
-        response.raise_for_status()
-
-        result = response.json()
-        part = result.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0]
-        audio_data_base64 = part.get('inlineData', {}).get('data')
+    response = requests.post(url, headers={'Content-Type': 'application/json'}, data=json.dumps(payload),
+                             timeout=REQUEST_TIMEOUT)
+    if not response.ok:
+        raise KeyRequestError(f"HTTP {response.status_code} com a chave {key[:8]}: {response.text[:200]}",
+                              response.status_code)
+    part = response.json().get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0]
+    audio_data_base64 = part.get('inlineData', {}).get('data')
+    if not audio_data_base64:
+        raise ValueError("Nenhum dado de áudio recebido da API.")
+    return base64.b64decode(audio_data_base64)
+
+
+def synthesize(scheduler, text):
+    """
+    Sintetiza com a chave menos carregada que tiver orçamento. Sem chave disponível,
+    espera o orçamento voltar; em erro, tenta de novo (o agendador tira da vez as
+    chaves que estouraram a cota). Retorna (bytes PCM, chave usada, tentativas).
+    """
+    attempts = 0
+    while True:
+        try:
+            with scheduler.lease(model=TTS_MODEL) as key:
+                attempts += 1
+                return request_tts(key, text), key, attempts
+        except NoAvailableKeyError:
+            time.sleep(1)
+        except Exception as e:
+            if attempts >= MAX_ATTEMPTS:
+                raise
+            print(f"⚠️ Tentativa {attempts} falhou ({e}). Tentando de novo...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera os áudios pré-gravados que mudaram.")
+    parser.add_argument("--rpm", type=int, default=int(os.getenv("GEMINI_TTS_KEY_RPM", "2")),
+                        help="requisições por minuto por chave (cota do modelo de TTS)")
+    parser.add_argument("--force", action="store_true", help="gera todos, mesmo os que não mudaram")
+    parser.add_argument("--dry-run", action="store_true", help="só lista o que seria gerado")
+    args = parser.parse_args()
+
+    if not API_KEYS:
+        raise ValueError("A variável GEMINI_API_KEYS não foi configurada no arquivo .env.")
 
-        if not audio_data_base64:
-            raise ValueError("Nenhum dado de áudio recebido da API.")
-
-        # Decodifica o base64 para bytes
-        audio_bytes = base64.b64decode(audio_data_base64)
-
-        # Garante que o diretório de saída exista
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-        # Salva os bytes decodificados no arquivo de áudio
-        with open(output_path, 'wb') as audio_file:
-            audio_file.write(audio_bytes)
-
-        print(f"✅ Áudio salvo com sucesso em '{output_path}'!")
-        return True
-
-    except Exception as e:
-        print(f"❌ ERRO ao gerar áudio para '{output_path}': {e}")
-        return False
-
-# --- Script Principal ---
-if __name__ == "__main__":
     print("--- Iniciando Geração de Áudios Pré-gravados ---")
-    total_files = len(EVENT_INFO)
-    success_count = 0
-
-    # Itera sobre cada item no dicionário EVENT_INFO
+    manifest = load_manifest(BASE_DIR)
+    pending = []
     for question, info in EVENT_INFO.items():
-        text = info["text"]
-        path = info["audio_path"]
-        
-        if generate_and_save_audio(text, path):
-            success_count += 1
-        
-        # Pausa para evitar exceder limites da API (opcional, mas recomendado)
-        time.sleep(35) 
-
+        entry = manifest.get(info["audio_path"])
+        current = (entry and entry.get("hash") == text_hash(info["text"])
+                   and os.path.exists(os.path.join(BASE_DIR, info["audio_path"])))
+        if current and not args.force:
+            print(f"⏭️  {info['audio_path']}: texto sem mudanças.")
+        else:
+            pending.append((question, info))
+    if args.dry_run or not pending:
+        print(f"Resumo: {len(pending)} de {len(EVENT_INFO)} áudio(s) a gerar.")
+        return
+
+    # burst=1: os pedidos de cada chave saem espaçados (60/rpm s), todas as chaves em paralelo
+    scheduler = KeyScheduler(API_KEYS, requests_per_minute=args.rpm, burst=1)
+    manifest_lock = threading.Lock()
+    timings = []
+    started = time.perf_counter()
+
+    def generate(question, info):
+        item_started = time.perf_counter()
+        pcm, key, attempts = synthesize(scheduler, info["text"])
+        write_atomic(os.path.join(BASE_DIR, info["audio_path"]), pcm)
+        seconds = time.perf_counter() - item_started
+        with manifest_lock:
+            manifest[info["audio_path"]] = manifest_entry(question, info["text"], pcm)
+            save_manifest(BASE_DIR, manifest)
+        return key, attempts, seconds, len(pcm)
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=len(API_KEYS)) as executor:
+        futures = {executor.submit(generate, question, info): info["audio_path"] for question, info in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                key, attempts, seconds, size = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"❌ ERRO ao gerar áudio para '{path}': {e}")
+                continue
+            timings.append((path, key, attempts, seconds, size))
+            print(f"✅ Áudio salvo em '{path}' ({size / 1024:.0f} KB, {seconds:.1f}s, chave {key[:8]}...).")
+
+    total = time.perf_counter() - started
     print("\n--- Processo Concluído ---")
-    print(f"Resumo: {success_count} de {total_files} arquivos de áudio gerados com sucesso.")
\ No newline at end of file
+    for path, key, attempts, seconds, size in sorted(timings, key=lambda item: -item[3]):
+        print(f"{seconds:>7.1f}s  {attempts} tentativa(s)  {key[:8]}...  {path}")
+    print(f"Resumo: {len(timings)} gerado(s), {failures} com erro, {len(EVENT_INFO) - len(pending)} sem mudanças "
+          f"em {total:.1f}s ({len(API_KEYS)} chave(s) a {args.rpm} req/min).")
+
+
+if __name__ == "__main__":
+    main()
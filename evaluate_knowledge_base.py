@@ -0,0 +1,114 @@
+"""
+Avaliação offline da base de conhecimento (sem chamar o Gemini).
+
+Para cada pergunta de teste, compara o prompt montado com os trechos
+recuperados contra as instruções compiladas inteiras: quantos dos fatos da
+resposta esperada (números e nomes próprios) continuam presentes no prompt
+(cobertura) e quanto o prompt encolheu. As perguntas vêm dos pares
+pergunta/resposta do próprio arquivo e da lista CASES abaixo.
+
+Uso: python evaluate_knowledge_base.py [--top-k 12] [--xlsx "Base para a IA - MetaDay.xlsx"] [--verbose]
+"""
+import os
+import re
+import argparse
+
+from knowledge_base import KnowledgeBase, split_instruction, BOLD_LABEL
+from knowledge_compiler import compile_instruction
+from semantic_cache import normalize_question
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Perguntas livres com a resposta esperada (trechos que precisam estar no prompt)
+CASES = [
+    ("Onde posso ver os projetos de Ciência de Dados para Negócios?", ["Sala 307", "Nathane de Castro"]),
+    ("E os trabalhos de Marketing, onde estão?",
+     ["Salas 209 e 206", "Sala 202", "Sala 210", "Sala 208", "Sala 203", "Ping Pong"]),
+    ("Onde encontro os projetos de GNI?",
+     ["Sala Multiuso", "Sala 207", "Sala 204", "Sala 310", "Sala 305", "Sala 309", "LAB Sebrae"]),
+    ("Onde compro hambúrguer?", ["ZAP BURGER", "Posição 10"]),
+    ("Onde fica a Kanttum?", ["Kanttum", "Posição 15", "Pendente"]),
+    ("Quem é o diretor da Fatec Sebrae?", ["ROBERTO PADILHA MOIA"]),
+    ("Até quando vão as inscrições do vestibular?", ["7 de novembro"]),
+    ("Tem oficina de relógio de sol?", ["Oficina 1", "Laboratório de Ciências", "10h00"]),
+    ("Onde fica a Fatec Sebrae?", ["Alameda Nothmann, 598"]),
+    ("Quem é o presidente do Centro Paula Souza?", ["Clóvis Dias"]),
+    ("Qual a frequência da Rádio Kiss?", ["92,5 MHz", "Posição 18"]),
+    ("Quem criou a LIA?", ["Felipe Tavares", "Rômulo Maia"]),
+]
+
+FACT = re.compile(r"\d+(?:[.,]\d+)?|[A-ZÀ-Ý][\wÀ-ÿ'-]+(?:\s+(?:d[aeo]s?\s+)?[A-ZÀ-Ý][\wÀ-ÿ'-]+)*")
+
+
+def qa_cases(text):
+    """Pares (pergunta, resposta) em negrito na seção de perguntas e respostas."""
+    _, chunks = split_instruction(text)
+    cases = []
+    for chunk in chunks:
+        lines = chunk["text"].split("\n")
+        match = BOLD_LABEL.match(lines[0])
+        if match and match.group(1).strip().endswith("?") and len(lines) > 1:
+            cases.append((match.group(1).strip(), " ".join(lines[1:])))
+    return cases
+
+
+def facts(answer, full_text):
+    """
+    Fatos verificáveis da resposta esperada que existem no arquivo inteiro: a lista
+    dada (CASES) ou, para respostas em texto, os números e nomes próprios dela.
+    """
+    normalized_full = normalize_question(full_text)
+    candidates = answer if isinstance(answer, list) else FACT.findall(answer)
+    found = []
+    for candidate in candidates:
+        key = normalize_question(candidate)
+        if key and key in normalized_full and key not in found:
+            found.append(key)
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top-k", type=int, default=12)
+    parser.add_argument("--xlsx", default=None)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    source_path = os.path.join(BASE_DIR, "system_instruction.txt")
+    with open(source_path, "r", encoding="utf-8") as f:
+        source_text = f.read()
+    full_text, _ = compile_instruction(source_path, args.xlsx)
+    knowledge_base = KnowledgeBase(full_text, top_k=args.top_k)
+
+    rows = []
+    for question, answer in qa_cases(source_text) + CASES:
+        expected = facts(answer, full_text)
+        if not expected:
+            continue
+        instruction = knowledge_base.build_instruction(question)
+        normalized = normalize_question(instruction)
+        missing = [fact for fact in expected if fact not in normalized]
+        coverage = 1 - len(missing) / len(expected)
+        rows.append((question, coverage, len(instruction), missing))
+
+    print(f"{'cobertura':>9}  {'chars':>6}  pergunta")
+    for question, coverage, chars, missing in rows:
+        print(f"{coverage:>9.0%}  {chars:>6}  {question}")
+        if args.verbose and missing:
+            print(f"{'':>19}faltando: {', '.join(missing)}")
+
+    full_chars = len(full_text)
+    average_chars = sum(row[2] for row in rows) / len(rows)
+    average_coverage = sum(row[1] for row in rows) / len(rows)
+    complete = sum(1 for row in rows if row[1] == 1)
+    print()
+    print(f"Perguntas avaliadas:      {len(rows)}")
+    print(f"Cobertura média:          {average_coverage:.1%} (arquivo inteiro: 100%)")
+    print(f"Cobertura completa:       {complete}/{len(rows)}")
+    print(f"Prompt médio:             {average_chars:.0f} caracteres (~{average_chars / 4:.0f} tokens)")
+    print(f"Arquivo inteiro:          {full_chars} caracteres (~{full_chars / 4:.0f} tokens)")
+    print(f"Redução do prompt:        {1 - average_chars / full_chars:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Catálogo das respostas pré-gravadas do evento (EVENT_INFO).
+
+Fica num módulo próprio para o app e o create_audio.py (que gera os áudios)
+usarem a mesma lista: antes cada um tinha a sua cópia e elas divergiam. Pelo
+mesmo motivo o modelo, a voz e o prompt do TTS também ficam aqui.
+"""
+
+# TTS das respostas geradas na hora (app) e dos áudios pré-gravados (create_audio.py)
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+TTS_VOICE = "Aoede"
+TTS_PROMPT = "Fale de forma natural e clara: "
+
+# "keywords": grupos de sinônimos usados pelo roteador de intenções para
+# reconhecer perguntas livres (digitadas ou faladas) que equivalem ao preset.
+# Cada grupo precisa de palavras específicas: as genéricas ("onde", "ver", "sala")
+# ficam no FILLER do roteador e sozinhas não podem fazer um grupo casar.
+
+EVENT_INFO = {
+    "Onde posso ver os projetos de Ciência de Dados para Negócios?": {
+        "text": "Os projetos de Ciência de Dados para Negócios estão no 3º andar, sala 307! 💡 Lá, os alunos mostram soluções inovadoras e é onde você encontra a LIA — eu! 🤖",
+        "audio_path": "respostas_pre_gravadas/projetos_cdn.mp3",
+        "keywords": [["ciencia de dados", "cdn", "dados"], ["projeto", "projetos", "trabalho", "trabalhos"]]
+    },
+    "E os trabalhos de Marketing, onde estão?": {
+        "text": "Os projetos de Marketing estão no 2º andar, nas salas 202, 203, 206, 208, 209, 210 e também na área do ping pong. 🎯 Uma mostra cheia de criatividade e estratégia!",
+        "audio_path": "respostas_pre_gravadas/projetos_mkt.mp3",
+        "keywords": [["marketing", "mkt"], ["projeto", "projetos", "trabalho", "trabalhos"]]
+    },
+    "Onde encontro os projetos de GNI?": {
+        "text": "Os projetos de Gestão de Negócios e Inovação (GNI) estão espalhados pelo térreo, 2º e 3º andares. 💼 No térreo há a Feira de Empreendedores, e nos outros andares, os projetos acadêmicos e especiais!",
+        "audio_path": "respostas_pre_gravadas/projetos_gni.mp3",
+        "keywords": [["gni", "gestao de negocios", "negocios e inovacao"], ["projeto", "projetos", "trabalho", "trabalhos"]]
+    },
+    "Onde encontro comidas e doces?": {
+        "text": "A área de alimentação fica no térreo! 🍔🍰 Você encontra Tati Nasi Confeitaria, Bolindos, Nabru Doces, ZAP Burger, Sorveteria Cris Bom e Cantina das Bentas. Delícias feitas por empreendedores da feira!",
+        "audio_path": "respostas_pre_gravadas/empresas_alimentacao.mp3",
+        "keywords": [["comida", "comidas", "comer", "doce", "doces", "lanche", "lanches", "alimentacao", "fome", "sorvete", "hamburguer", "cantina"]]
+    },
+    "Quais empresas estão no evento?": {
+        "text": "No térreo estão várias empresas e parceiros incríveis! 🌟 Como Tati Nasi, Bolindos, Nabru Doces, ZAP Burger, Sorveteria Cris Bom, Cantina das Bentas, Dans Brechó, Anainá Moda Sustentável e muitas outras!",
+        "audio_path": "respostas_pre_gravadas/empresas_expondo.mp3",
+        "keywords": [["empresa", "empresas", "expositores", "expondo", "parceiros", "marcas", "lojas"]]
+    },
+    "O que é a LIA?": {
+        "text": "Sou eu! 😄 Fui criada pelos alunos do 2º semestre de Ciência de Dados para Negócios — Felipe Tavares, Thiago Teles, Paulo Futagawa, Thais Nakazone e Riquelme Nichiyama — com orientação dos profs. Rômulo Maia e Nathane de Castro. Minha missão é ajudar você no Meta Day! 💙🤖",
+        "audio_path": "respostas_pre_gravadas/o_que_e_lia.mp3",
+        "keywords": [["lia"], ["o que e", "quem e", "criou", "criada", "criaram", "fez", "apresente"]]
+    }
+}
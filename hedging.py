@@ -0,0 +1,97 @@
+"""
+Requisições "hedged": dispara a primeira tentativa e, se a resposta demorar mais
+que um percentil da latência recente, dispara outra em paralelo (em outra chave).
+A primeira que der certo vence; as demais são canceladas ou descartadas, tudo
+dentro de um prazo total fixo.
+"""
+import time
+import threading
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+
+class LatencyTracker:
+    """Janela deslizante de latências bem-sucedidas para calcular o atraso do hedge."""
+
+    def __init__(self, window=50, percentile=0.9, default=4.0, minimum=1.0, maximum=15.0):
+        self.percentile = percentile
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def hedge_delay(self):
+        """Percentil configurado das latências recentes, limitado a [minimum, maximum]."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return self.default
+        index = min(len(samples) - 1, int(self.percentile * len(samples)))
+        return max(self.minimum, min(self.maximum, samples[index]))
+
+
+class HedgedRequestError(RuntimeError):
+    """Nenhuma tentativa teve sucesso dentro do prazo."""
+
+
+def hedged_call(attempt, candidates, executor, tracker, deadline_seconds):
+    """
+    Executa attempt(candidate, cancel_event, timeout) para os candidatos em ordem,
+    com hedge. Uma falha dispara imediatamente o próximo candidato (sem sleep);
+    a demora além do atraso do hedge dispara o próximo em paralelo.
+
+    Retorna (resultado, candidato) da primeira tentativa bem-sucedida.
+    """
+    deadline = time.monotonic() + deadline_seconds
+    cancel_event = threading.Event()
+    queue = list(candidates)
+    pending = {}
+    errors = []
+
+    def launch():
+        candidate = queue.pop(0)
+        timeout = max(0.1, deadline - time.monotonic())
+        started = time.monotonic()
+        future = executor.submit(attempt, candidate, cancel_event, timeout)
+        pending[future] = (candidate, started)
+
+    try:
+        launch()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wait_for = min(remaining, tracker.hedge_delay()) if queue else remaining
+            done, _ = wait(list(pending), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Nenhuma resposta dentro do percentil: dispara uma tentativa paralela
+                if queue:
+                    launch()
+                continue
+
+            for future in done:
+                candidate, started = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    if queue:
+                        launch()
+                    continue
+                tracker.record(time.monotonic() - started)
+                return result, candidate
+    finally:
+        # Vencedor definido (ou prazo esgotado): as perdedoras não iniciadas são
+        # canceladas e as que estão em voo descartam o resultado ao terminar.
+        cancel_event.set()
+        for future in pending:
+            future.cancel()
+
+    detail = f" Último erro: {errors[-1]}" if errors else ""
+    raise HedgedRequestError(f"Nenhuma tentativa bem-sucedida em {deadline_seconds:.0f}s.{detail}")
@@ -0,0 +1,145 @@
+"""
+Compactação do histórico das conversas longas.
+
+Os últimos N turnos ficam literais; os mais antigos são dobrados num resumo
+corrido, que volta para o modelo como um par de mensagens no início do
+histórico. O resumo é gerado fora do caminho da requisição (numa thread), com
+um modelo barato ou, se ele falhar, com um resumo extrativo. Assim o tamanho
+do prompt por turno fica limitado e a latência não cresce com a conversa.
+"""
+import re
+import threading
+
+SUMMARY_HEADER = "Resumo da conversa até aqui (turnos anteriores, compactados):"
+SUMMARY_ACK = "Entendido, vou continuar a conversa levando esse resumo em conta."
+
+FIRST_SENTENCE = re.compile(r"^(.+?[.!?…])(?:\s|$)", re.DOTALL)
+
+
+def _message_text(message):
+    """Texto de uma mensagem serializada (partes de áudio viram um marcador)."""
+    pieces = []
+    for part in message["parts"]:
+        if "text" in part:
+            pieces.append(part["text"])
+        elif "inline_data" in part:
+            pieces.append("[áudio]")
+    return " ".join(pieces).strip()
+
+
+def format_transcript(messages):
+    return "\n".join(
+        f"{'Usuário' if m['role'] == 'user' else 'Assistente'}: {_message_text(m)}"
+        for m in messages
+    )
+
+
+def build_summary_prompt(previous_summary, messages, max_chars):
+    previous = f"Resumo anterior:\n{previous_summary}\n\n" if previous_summary else ""
+    return (
+        "Atualize o resumo de uma conversa entre um visitante e a LIA, assistente do evento. "
+        "Mantenha em português, em tópicos curtos, só o que importa para continuar a conversa: "
+        "o que o visitante perguntou, o que já foi respondido e preferências que ele mencionou. "
+        f"No máximo {max_chars} caracteres.\n\n"
+        f"{previous}Novos turnos:\n{format_transcript(messages)}"
+    )
+
+
+def extractive_summary(previous_summary, messages, max_chars):
+    """Resumo sem modelo: a primeira frase de cada mensagem, cortando as mais antigas."""
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        text = " ".join(_message_text(message).split())
+        match = FIRST_SENTENCE.match(text)
+        sentence = (match.group(1) if match else text)[:200]
+        if sentence:
+            lines.append(f"- {'Usuário' if message['role'] == 'user' else 'Assistente'}: {sentence}")
+    summary = "\n".join(lines)
+    return summary[-max_chars:] if len(summary) > max_chars else summary
+
+
+def summary_messages(summary):
+    """Par de mensagens (serializadas) que leva o resumo para o início do histórico."""
+    if not summary:
+        return []
+    return [
+        {"role": "user", "parts": [{"text": f"{SUMMARY_HEADER}\n{summary}"}]},
+        {"role": "model", "parts": [{"text": SUMMARY_ACK}]},
+    ]
+
+
+class HistoryCompactor:
+    """
+    Decide quando compactar (a cada batch_turns turnos além dos keep_turns literais)
+    e gera o novo resumo em segundo plano, no executor.
+    """
+
+    def __init__(self, summarize, executor, keep_turns=6, batch_turns=4, max_summary_chars=1500):
+        self.summarize = summarize
+        self.executor = executor
+        self.keep_turns = keep_turns
+        self.batch_turns = batch_turns
+        self.max_summary_chars = max_summary_chars
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self.stats = {"compactions": 0, "model_summaries": 0, "extractive_fallbacks": 0,
+                      "folded_messages": 0, "conflicts": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def split_point(self, history):
+        """Quantas mensagens do início devem ser dobradas no resumo (0 = ainda não)."""
+        if len(history) <= 2 * (self.keep_turns + self.batch_turns):
+            return 0
+        cut = len(history) - 2 * self.keep_turns
+        # A parte literal precisa começar num turno do usuário
+        while cut < len(history) and history[cut]["role"] != "user":
+            cut += 1
+        return cut if cut < len(history) else 0
+
+    def maybe_schedule(self, session_id, history, summary, apply):
+        """
+        Se o histórico passou do limite, gera o resumo em segundo plano e chama
+        apply(session_id, mensagens_dobradas, novo_resumo) quando ele ficar pronto.
+        """
+        cut = self.split_point(history)
+        if not cut:
+            return False
+        with self._lock:
+            if session_id in self._in_flight:
+                return False
+            self._in_flight.add(session_id)
+        folded = history[:cut]
+        self.executor.submit(self._compact, session_id, folded, summary, apply)
+        return True
+
+    def _compact(self, session_id, folded, previous_summary, apply):
+        try:
+            try:
+                prompt = build_summary_prompt(previous_summary, folded, self.max_summary_chars)
+                summary = (self.summarize(prompt) or "").strip()[:self.max_summary_chars]
+                if not summary:
+                    raise ValueError("resumo vazio")
+                self._count("model_summaries")
+            except Exception as e:
+                print(f"⚠️ Resumo do histórico pelo modelo falhou ({e}). Usando resumo extrativo.")
+                summary = extractive_summary(previous_summary, folded, self.max_summary_chars)
+                self._count("extractive_fallbacks")
+
+            if apply(session_id, folded, summary):
+                self._count("compactions")
+                self._count("folded_messages", len(folded))
+                print(f"🗜️ Sessão {session_id}: {len(folded)} mensagem(ns) antiga(s) compactada(s) no resumo.")
+            else:
+                self._count("conflicts")
+        except Exception as e:
+            print(f"❌ Erro ao compactar o histórico da sessão {session_id}: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(session_id)
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "in_flight": len(self._in_flight)}
@@ -0,0 +1,144 @@
+"""
+Roteador de intenções para as respostas pré-gravadas (EVENT_INFO).
+
+Perguntas digitadas ou faladas que querem dizer o mesmo que um dos presets
+("onde estão os projetos de marketing?") recebem o texto e o áudio pré-gravado
+na hora, sem chamar o Gemini nem o TTS.
+
+Cada preset tem grupos de palavras-chave (sinônimos): a pontuação é a média,
+entre os grupos, da melhor correspondência encontrada na pergunta (1.0 exata,
+ou a similaridade difflib para erros de digitação/transcrição). Qualquer
+palavra da pergunta que o preset não explica zera a pontuação ("tem comida
+vegana?" e "onde fica a Cantina das Bentas?" pedem mais do que o preset
+responde), e perguntas com negação ("não quero comida") nunca são roteadas.
+Só roteia com confiança alta e com folga sobre o segundo colocado; o resto
+segue para o modelo.
+"""
+import difflib
+import threading
+
+from semantic_cache import normalize_question, NEGATIONS
+
+# Palavras que não ajudam a distinguir as intenções
+STOPWORDS = {
+    "a", "o", "as", "os", "e", "de", "da", "do", "das", "dos", "em", "no", "na",
+    "nos", "nas", "um", "uma", "para", "pra", "por", "que", "me", "eu", "voce",
+    "vc", "se", "tem", "ha", "sobre", "qual", "quais", "la", "aqui", "ai",
+}
+
+# Palavras comuns nas perguntas de localização que não mudam a intenção
+FILLER = {
+    "onde", "fica", "ficam", "esta", "estao", "encontro", "encontrar", "acho",
+    "posso", "consigo", "ver", "quero", "saber", "quem", "lia", "oi", "ola", "favor", "sala", "salas",
+    "evento", "metaday", "meta", "day",
+}
+
+
+def content_tokens(normalized):
+    return [t for t in normalized.split() if t not in STOPWORDS]
+
+
+class IntentRouter:
+    """Casa perguntas livres com as chaves de EVENT_INFO usando os grupos de palavras-chave."""
+
+    def __init__(self, intents, min_score=0.85, min_margin=0.15, max_tokens=12, fuzzy_cutoff=0.8,
+                 max_extra_words=0):
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.max_tokens = max_tokens
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self.max_extra_words = max_extra_words
+        self._lock = threading.Lock()
+        self.stats = {"routed": 0, "not_routed": 0, "by_intent": {}}
+        self._exact = {normalize_question(key): key for key in intents}
+        self._intents = {
+            key: [[normalize_question(word) for word in group] for group in info.get("keywords", [])]
+            for key, info in intents.items()
+            if info.get("keywords")
+        }
+
+    def _group_score(self, group, normalized, tokens):
+        """Melhor correspondência do grupo no texto e as palavras que ela explica."""
+        explained = set()
+        for synonym in group:
+            if " " in synonym:
+                # Expressão de várias palavras: precisa aparecer inteira
+                if f" {synonym} " in f" {normalized} ":
+                    explained |= set(synonym.split())
+            elif synonym in tokens:
+                explained.add(synonym)
+        if explained:
+            # Todos os sinônimos presentes contam como explicados ("empresas expondo")
+            return 1.0, explained
+
+        best = 0.0
+        for synonym in group:
+            if " " in synonym:
+                continue
+            close = difflib.get_close_matches(synonym, tokens, n=1, cutoff=self.fuzzy_cutoff)
+            if close:
+                ratio = difflib.SequenceMatcher(None, synonym, close[0]).ratio()
+                if ratio > best:
+                    best, explained = ratio, {close[0]}
+        return best, explained
+
+    def _intent_score(self, groups, normalized, tokens):
+        total, explained = 0.0, set()
+        for group in groups:
+            score, words = self._group_score(group, normalized, tokens)
+            total += score
+            explained |= words
+        extra = [t for t in tokens if t not in explained and t not in FILLER]
+        if len(extra) > self.max_extra_words:
+            return 0.0
+        return total / len(groups)
+
+    def score(self, text):
+        """Pontuação de cada intenção para o texto, da maior para a menor."""
+        normalized = normalize_question(text)
+        tokens = content_tokens(normalized)
+        scores = [
+            (self._intent_score(groups, normalized, tokens), key)
+            for key, groups in self._intents.items()
+        ]
+        return sorted(scores, reverse=True)
+
+    def classify(self, text):
+        """
+        Retorna (chave do preset, pontuação, motivo), sem contar nas estatísticas
+        (para consultas internas, como o pré-aquecimento). A chave é None quando a
+        pergunta não casa com confiança com nenhum preset.
+        """
+        normalized = normalize_question(text)
+        if normalized in self._exact:
+            return self._exact[normalized], 1.0, "exata"
+        if not normalized or len(content_tokens(normalized)) > self.max_tokens:
+            return None, 0.0, "pergunta longa/vazia"
+        if any(word in NEGATIONS for word in normalized.split()):
+            return None, 0.0, "negação"
+
+        ranked = self.score(text)
+        if not ranked:
+            return None, 0.0, "sem intenções"
+        best_score, best_key = ranked[0]
+        runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+        if best_score < self.min_score:
+            return None, best_score, f"baixa confiança ({best_key})"
+        if best_score - runner_up < self.min_margin:
+            return None, best_score, f"ambígua ({best_key} x {ranked[1][1]})"
+        return best_key, best_score, "palavras-chave"
+
+    def route(self, text):
+        """classify() de uma pergunta de verdade: conta o resultado nas estatísticas."""
+        key, score, reason = self.classify(text)
+        with self._lock:
+            if key:
+                self.stats["routed"] += 1
+                self.stats["by_intent"][key] = self.stats["by_intent"].get(key, 0) + 1
+            else:
+                self.stats["not_routed"] += 1
+        return key, score, reason
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "by_intent": dict(self.stats["by_intent"])}
@@ -0,0 +1,195 @@
+"""
+Agendador central das chaves da API Gemini.
+
+Usado tanto pelo modelo de chat quanto pelas chamadas REST de TTS. Para cada par
+(chave, modelo) mantém um balde de tokens (orçamento de requisições por minuto),
+um disjuntor (circuit breaker) que tira o par de circulação depois de erros de
+cota (402/403/429) e o devolve com uma única requisição de teste (half-open), e
+o número de requisições em andamento, para escolher sempre a chave menos
+carregada. As cotas da Gemini são por modelo: um 429 no modelo de TTS não tira
+a chave do chat.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+QUOTA_STATUS_CODES = (402, 403, 429)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class NoAvailableKeyError(RuntimeError):
+    """Todas as chaves estão em cooldown, sem orçamento ou já foram tentadas."""
+
+
+class KeyRequestError(RuntimeError):
+    """Falha de uma requisição feita com uma chave, com o status HTTP (se houver)."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def error_status_code(exc):
+    """Extrai o status HTTP de uma exceção (nossa, do requests ou do google.api_core)."""
+    for attr in ("status_code", "code"):
+        value = getattr(exc, attr, None)
+        try:
+            if value is not None:
+                return int(value)
+        except (TypeError, ValueError):
+            continue
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+class _KeyState:
+    def __init__(self, key, model, capacity):
+        self.key = key
+        self.model = model
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.in_flight = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.quota_errors = 0
+
+
+class KeyScheduler:
+    """
+    Escolhe a chave menos carregada entre as saudáveis e aprende com cada resultado.
+    Orçamento e disjuntor são separados por modelo (model=None: um único grupo).
+    """
+
+    def __init__(self, keys, requests_per_minute=10, burst=None, cooldown_seconds=60,
+                 max_cooldown_seconds=900, failure_threshold=3):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = burst or requests_per_minute
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.failure_threshold = failure_threshold
+        self._keys = list(keys)
+        self._states = {}  # (chave, modelo) -> _KeyState, criado no primeiro uso
+        self._lock = threading.Lock()
+
+    def _state(self, key, model):
+        state = self._states.get((key, model))
+        if state is None:
+            state = self._states[(key, model)] = _KeyState(key, model, self.capacity)
+        return state
+
+    def _refill(self, state, now):
+        elapsed = now - state.last_refill
+        state.tokens = min(self.capacity, state.tokens + elapsed * self.rate)
+        state.last_refill = now
+
+    def acquire(self, exclude=(), model=None):
+        """Reserva a melhor chave disponível para o modelo (ou retorna None)."""
+        now = time.monotonic()
+        with self._lock:
+            best = None
+            for key in self._keys:
+                if key in exclude:
+                    continue
+                state = self._state(key, model)
+                self._refill(state, now)
+                if state.state == OPEN:
+                    if now < state.open_until:
+                        continue
+                    # Cooldown vencido: a chave volta como half-open para uma requisição de teste
+                    state.state = HALF_OPEN
+                if state.state == HALF_OPEN and state.probe_in_flight:
+                    continue
+                if state.tokens < 1:
+                    continue
+                if best is None or (state.in_flight, -state.tokens) < (best.in_flight, -best.tokens):
+                    best = state
+
+            if best is None:
+                return None
+            best.tokens -= 1
+            best.in_flight += 1
+            if best.state == HALF_OPEN:
+                best.probe_in_flight = True
+            return best.key
+
+    def release(self, key, success, status_code=None, model=None):
+        """Registra o resultado de uma requisição feita com a chave (no modelo dado)."""
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get((key, model))
+            if state is None:
+                return
+            state.in_flight = max(0, state.in_flight - 1)
+            was_probe = state.state == HALF_OPEN and state.probe_in_flight
+            state.probe_in_flight = False
+
+            if success:
+                state.successes += 1
+                state.consecutive_failures = 0
+                state.cooldown = 0.0
+                state.state = CLOSED
+                return
+
+            state.failures += 1
+            state.consecutive_failures += 1
+            is_quota = status_code in QUOTA_STATUS_CODES
+            if is_quota:
+                state.quota_errors += 1
+
+            if is_quota or was_probe or state.consecutive_failures >= self.failure_threshold:
+                # Cooldown exponencial a cada reabertura seguida do disjuntor
+                state.cooldown = min(self.max_cooldown_seconds,
+                                     state.cooldown * 2 if state.cooldown else self.cooldown_seconds)
+                state.state = OPEN
+                state.open_until = now + state.cooldown
+                where = f" no modelo {model}" if model else ""
+                print(f"🚫 Chave {key[:8]}... em cooldown por {state.cooldown:.0f}s{where} (status {status_code}).")
+
+    @contextmanager
+    def lease(self, exclude=(), model=None):
+        """
+        Reserva uma chave durante o bloco e registra o resultado automaticamente:
+        sucesso se o bloco terminar normalmente, falha (com status) se lançar exceção.
+        """
+        key = self.acquire(exclude, model)
+        if key is None:
+            raise NoAvailableKeyError("Nenhuma chave Gemini disponível no momento (cooldown ou sem orçamento).")
+        try:
+            yield key
+        except Exception as e:
+            self.release(key, success=False, status_code=error_status_code(e), model=model)
+            raise
+        else:
+            self.release(key, success=True, model=model)
+
+    def in_flight(self):
+        """Total de requisições em andamento, somando todas as chaves e modelos."""
+        with self._lock:
+            return sum(state.in_flight for state in self._states.values())
+
+    def get_stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = []
+            for state in self._states.values():
+                self._refill(state, now)
+                stats.append({
+                    "key": f"{state.key[:8]}...",
+                    "model": state.model,
+                    "state": state.state,
+                    "tokens": round(state.tokens, 2),
+                    "in_flight": state.in_flight,
+                    "cooldown_remaining": round(max(0.0, state.open_until - now), 1) if state.state == OPEN else 0.0,
+                    "successes": state.successes,
+                    "failures": state.failures,
+                    "quota_errors": state.quota_errors,
+                })
+            return stats
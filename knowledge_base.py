@@ -0,0 +1,259 @@
+"""
+Base de conhecimento do evento com busca lexical (BM25).
+
+O system_instruction.txt inteiro (~12 KB de tabelas por andar, empresas,
+horários e regras) ia em toda chamada ao Gemini. Aqui ele é dividido em
+trechos: os títulos ##/###, cada item de lista, cada linha de tabela (com o
+cabeçalho) e cada par pergunta/resposta. Cada turno recebe só o núcleo fixo
+(persona, regras gerais e as regras específicas da LIA) mais os k trechos mais
+relevantes para a pergunta.
+
+O texto indexado é o que o knowledge_compiler produz (instruções + planilha,
+já compactados); quando ele troca as instruções a quente, o índice é refeito
+com load().
+"""
+import re
+import math
+import threading
+from collections import Counter
+
+from semantic_cache import normalize_question
+from intent_router import STOPWORDS
+
+CONTEXT_MARKER = "--- INFORMAÇÕES DE CONTEXTO ---"
+SEPARATOR = re.compile(r"^-{3}(?:.*-{3})?$")
+BULLET = re.compile(r"^\s*(?:[*-]|\d+\.)\s+")
+BOLD_LABEL = re.compile(r"^\*\*(.+?)\*\*\s*$")
+TABLE_DIVIDER = re.compile(r"^\|[\s:|-]+\|$")
+
+# Seções que vão sempre no prompt: as regras entram no núcleo, as visões gerais como trechos fixos
+CORE_HEADINGS = ("REGRAS",)
+PINNED_HEADINGS = ("Visão Geral",)
+
+# Siglas usadas na base (e pelos visitantes) expandidas para os nomes dos cursos
+ALIASES = {
+    "mkt": ["marketing"],
+    "gni": ["gestao", "negocios", "inovacao"],
+    "cdn": ["ciencia", "dados", "negocios"],
+    "ds": ["desenvolvimento", "sistemas"],
+    "ams": ["administracao"],
+}
+
+# Palavras de pergunta que aparecem em quase todo trecho de Q&A e não ajudam a busca
+QUERY_NOISE = {"onde", "fica", "ficam", "esta", "estao", "como", "quando", "quem", "lia", "evento",
+               "metaday", "meta", "day", "voce", "encontro", "posso"}
+
+# Radical simples: as primeiras letras bastam para juntar singular/plural e variações
+STEM_LENGTH = 7
+
+
+def tokenize(text, drop_noise=True):
+    """Tokens normalizados (sem acentos/stopwords), reduzidos ao radical e com as siglas expandidas."""
+    tokens = []
+    for token in normalize_question(text).split():
+        if token in STOPWORDS or (drop_noise and token in QUERY_NOISE):
+            continue
+        tokens.append(token[:STEM_LENGTH])
+        tokens.extend(alias[:STEM_LENGTH] for alias in ALIASES.get(token, ()))
+    return tokens
+
+
+def _table_row(line):
+    return [cell.strip().replace("<br>", " / ") for cell in line.strip().strip("|").split("|")]
+
+
+def split_instruction(text):
+    """
+    Divide o texto de instruções em (núcleo, trechos). Cada trecho é um dict
+    com "heading" (caminho de títulos), "text" e "pinned".
+    """
+    if CONTEXT_MARKER in text:
+        preamble, body = text.split(CONTEXT_MARKER, 1)
+    else:
+        preamble, body = "", text
+    core_parts = [preamble.strip()]
+    chunks = []
+    h2 = h3 = label = None
+    block = []
+    table_header = None
+
+    def heading_path():
+        return " › ".join(part for part in (h2, h3, label) if part)
+
+    def in_core():
+        return bool(h2) and any(name in h2 for name in CORE_HEADINGS)
+
+    def emit(content):
+        content = content.strip()
+        if not content:
+            return
+        if in_core():
+            core_parts.append(content)
+            return
+        chunks.append({
+            "heading": heading_path(),
+            "text": content,
+            "pinned": bool(h2) and any(name in h2 for name in PINNED_HEADINGS),
+        })
+
+    def flush():
+        nonlocal label
+        if not block:
+            return
+        lines = list(block)
+        block.clear()
+        # Um rótulo solto ("**Alimentação:**", "Projetos Feteps 2025") vira contexto dos itens seguintes
+        if len(lines) == 1 and not in_core():
+            match = BOLD_LABEL.match(lines[0].strip())
+            single = match.group(1) if match else lines[0].strip()
+            single = single.strip("'\"").strip()
+            if single.endswith(":") or (not match and len(single) < 40 and not single.endswith((".", "!", "?"))):
+                label = single.rstrip(":").strip()
+                return
+        emit("\n".join(lines))
+
+    for raw in body.splitlines():
+        line = raw.rstrip()
+        stripped = line.strip()
+        if stripped.startswith("## ") or stripped.startswith("### "):
+            flush()
+            title = stripped.lstrip("#").strip()
+            if stripped.startswith("## "):
+                h2, h3 = title, None
+                if in_core():
+                    core_parts.append(stripped)
+            else:
+                h3 = title
+            label, table_header = None, None
+            continue
+        if SEPARATOR.match(stripped):
+            flush()
+            h2 = h3 = label = table_header = None
+            continue
+        if stripped.startswith("|"):
+            flush()
+            if TABLE_DIVIDER.match(stripped):
+                continue
+            cells = _table_row(stripped)
+            if table_header is None:
+                table_header = cells
+            else:
+                emit("; ".join(f"{name}: {value}" for name, value in zip(table_header, cells) if value))
+            continue
+        if not stripped:
+            flush()
+            continue
+        if BULLET.match(line) and not in_core():
+            flush()
+            emit(stripped)
+            continue
+        if stripped in ("'", '"'):
+            # Fim de uma tabela citada: o rótulo dela não vale para o que vem depois
+            label = table_header = None
+            continue
+        block.append(stripped)
+    flush()
+    return "\n\n".join(part for part in core_parts if part), chunks
+
+
+class KnowledgeBase:
+    """
+    Índice BM25 em memória sobre os trechos da base. build_instruction(pergunta)
+    devolve o núcleo mais os trechos relevantes, na ordem em que aparecem no arquivo.
+    """
+
+    def __init__(self, text, top_k=12, min_relative_score=0.3, k1=1.5, b=0.75):
+        self.top_k = top_k
+        self.min_relative_score = min_relative_score
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.core = ""
+        self.chunks = []
+        self.full_chars = 0
+        self.stats = {"queries": 0, "rebuilds": 0, "empty_results": 0, "chunks_sent": 0,
+                      "prompt_chars_sent": 0}
+        self.load(text)
+
+    # ---------- índice ----------
+
+    def load(self, text):
+        """Refaz o índice a partir do texto das instruções (troca atômica)."""
+        core, chunks = split_instruction(text)
+
+        documents = [tokenize(f"{chunk['heading']} {chunk['text']}", drop_noise=False) for chunk in chunks]
+        frequencies = [Counter(tokens) for tokens in documents]
+        document_frequency = Counter(token for tokens in documents for token in set(tokens))
+        total = len(documents) or 1
+        idf = {token: math.log(1 + (total - df + 0.5) / (df + 0.5)) for token, df in document_frequency.items()}
+        average_length = sum(len(tokens) for tokens in documents) / total or 1.0
+
+        with self._lock:
+            self.core = core
+            self.chunks = chunks
+            self.full_chars = len(text)
+            self._frequencies = frequencies
+            self._lengths = [len(tokens) for tokens in documents]
+            self._idf = idf
+            self._average_length = average_length
+            self.stats["rebuilds"] += 1
+        print(f"📚 Base de conhecimento indexada: {len(chunks)} trecho(s), núcleo de {len(core)} caractere(s).")
+
+    # ---------- busca ----------
+
+    def search(self, query, top_k=None):
+        """Lista de (índice do trecho, score) dos trechos mais relevantes para a consulta."""
+        # "O que é o Metaday?" só tem palavras genéricas: nesse caso elas contam
+        terms = Counter(tokenize(query)) or Counter(tokenize(query, drop_noise=False))
+        with self._lock:
+            scores = []
+            for index, frequencies in enumerate(self._frequencies):
+                score = 0.0
+                length_norm = self.k1 * (1 - self.b + self.b * self._lengths[index] / self._average_length)
+                for term in terms:
+                    tf = frequencies.get(term)
+                    if tf:
+                        score += self._idf[term] * tf * (self.k1 + 1) / (tf + length_norm)
+                if score > 0:
+                    scores.append((index, score))
+        scores.sort(key=lambda item: -item[1])
+        if not scores:
+            return []
+        cutoff = scores[0][1] * self.min_relative_score
+        return [(index, score) for index, score in scores[:top_k or self.top_k] if score >= cutoff]
+
+    def build_instruction(self, query, top_k=None):
+        """Núcleo + trechos fixos + trechos relevantes, agrupados pelo título de origem."""
+        hits = self.search(query, top_k)
+        with self._lock:
+            selected = sorted({index for index, _ in hits} |
+                              {index for index, chunk in enumerate(self.chunks) if chunk["pinned"]})
+            chunks = [self.chunks[index] for index in selected]
+            core = self.core
+
+        lines = []
+        current_heading = None
+        for chunk in chunks:
+            if chunk["heading"] != current_heading:
+                current_heading = chunk["heading"]
+                lines.append(f"\n## {current_heading}" if current_heading else "")
+            lines.append(chunk["text"])
+        instruction = (
+            f"{core}\n\n--- INFORMAÇÕES DE CONTEXTO (trechos relevantes para a pergunta) ---\n"
+            + "\n".join(lines).strip()
+        )
+        with self._lock:
+            self.stats["queries"] += 1
+            self.stats["empty_results"] += 0 if hits else 1
+            self.stats["chunks_sent"] += len(chunks)
+            self.stats["prompt_chars_sent"] += len(instruction)
+        return instruction
+
+    def get_stats(self):
+        with self._lock:
+            stats = {**self.stats, "chunks": len(self.chunks), "core_chars": len(self.core),
+                     "full_chars": self.full_chars, "top_k": self.top_k}
+        queries = stats["queries"]
+        stats["avg_prompt_chars"] = round(stats["prompt_chars_sent"] / queries) if queries else 0
+        stats["avg_reduction"] = round(1 - stats["avg_prompt_chars"] / stats["full_chars"], 3) if queries else 0.0
+        return stats
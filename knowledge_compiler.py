@@ -0,0 +1,310 @@
+"""
+Compilador das instruções da LIA, com troca a quente.
+
+Junta o system_instruction.txt e, opcionalmente, a planilha
+"Base para a IA - MetaDay.xlsx" num único texto compacto: tabelas viram
+linhas "coluna: valor", a marcação redundante (negrito, divisórias, linhas em
+branco repetidas) sai, linhas repetidas aparecem uma vez só e, na planilha,
+valores de preenchimento ("NÃO INFORMOU NO FORMS", "N/A") e linhas duplicadas
+são descartados.
+
+Uma thread observa as fontes: quando uma delas muda, o texto é recompilado e
+trocado de uma vez (quem está no meio de uma requisição continua com o texto
+antigo) e os ouvintes registrados são avisados para trocar o modelo e esvaziar
+os caches que dependem das instruções. O tamanho antes/depois da compactação
+vai para o log e para o /stats.
+
+Uso avulso: python knowledge_compiler.py [--xlsx planilha.xlsx] [--output arquivo.txt]
+"""
+import os
+import re
+import time
+import hashlib
+import tempfile
+import argparse
+import threading
+
+from semantic_cache import normalize_question
+
+TABLE_DIVIDER = re.compile(r"^\|[\s:|-]+\|$")
+BARE_SEPARATOR = re.compile(r"^-{3,}$")
+BULLET = re.compile(r"^([*-]|\d+\.)\s+")
+BOLD = re.compile(r"\*\*(.+?)\*\*")
+
+# Valores de planilha que só marcam campo não preenchido
+PLACEHOLDERS = {"", "n a", "na", "a", "nao informou no forms", "sem sala definida"}
+
+# Cabeçalhos longos da planilha, repetidos em toda linha, trocados por nomes curtos
+COLUMN_ALIASES = {
+    "Nome Professor responsavel PI": "Professor",
+    "Horário Turma": "Turno",
+    "Trabalho que será apresentado": "Trabalho",
+}
+
+
+def _table_cells(line):
+    return [cell.strip().replace("<br>", " / ") for cell in line.strip().strip("|").split("|")]
+
+
+def compact_markdown(text):
+    """
+    Tabelas em linhas "coluna: valor", sem negrito/divisórias, sem brancos em série
+    e sem linhas repetidas dentro da mesma seção ou tabela (o mesmo "Horário: 10h00"
+    de duas oficinas diferentes fica nas duas).
+    """
+    output = []
+    seen = set()
+    table_header = None
+    for raw in text.splitlines():
+        line = " ".join(raw.split()) if raw.strip() else ""
+        if line.startswith("|"):
+            if TABLE_DIVIDER.match(line):
+                continue
+            cells = _table_cells(line)
+            if table_header is None:
+                table_header = cells
+                seen = set()
+                continue
+            line = "- " + "; ".join(f"{name}: {value}" for name, value in zip(table_header, cells) if value)
+        elif table_header is not None:
+            table_header = None
+            seen = set()
+        if BARE_SEPARATOR.match(line):
+            # Divisória: a seção seguinte tem as suas próprias repetições
+            line, seen = "", set()
+        elif line in ("'", '"'):
+            line = ""
+        line = BOLD.sub(r"\1", line)
+        line = BULLET.sub(lambda match: "- " if match.group(1) in "*-" else f"{match.group(1)} ", line)
+        line = line.rstrip(" '")
+
+        if not line:
+            if output and output[-1]:
+                output.append("")
+            continue
+        # Títulos e marcadores abrem uma seção nova; conteúdo repetido na mesma seção sai
+        if line.startswith("#") or line.startswith("---"):
+            seen = set()
+        else:
+            key = normalize_question(line)
+            if key in seen:
+                continue
+            seen.add(key)
+        output.append(line)
+    return "\n".join(output).strip() + "\n"
+
+
+def compile_spreadsheet(path):
+    """
+    Uma seção por aba da planilha: colunas com o mesmo valor em todas as linhas
+    viram uma linha de cabeçalho, e cada linha restante vira "- coluna: valor; ...".
+    Retorna (texto, tamanho da planilha escrita linha a linha sem compactar).
+    """
+    import openpyxl
+
+    sections = []
+    raw_chars = 0
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for sheet in workbook.worksheets:
+            header, rows = None, []
+            for row in sheet.iter_rows(values_only=True):
+                cells = [" ".join(str(value).split()) if value is not None else "" for value in row]
+                if not any(cells):
+                    continue
+                if header is None:
+                    header = cells
+                    continue
+                raw_chars += len("; ".join(f"{name}: {value}" for name, value in zip(header, cells) if name))
+                record = {COLUMN_ALIASES.get(name, name): value for name, value in zip(header, cells)
+                          if name and normalize_question(value) not in PLACEHOLDERS}
+                if record and record not in rows:
+                    rows.append(record)
+            if not rows:
+                continue
+            shared = {name: value for name, value in rows[0].items()
+                      if len(rows) > 1 and all(row.get(name) == value for row in rows)}
+            lines = [f"## 📊 PLANILHA: {sheet.title}"]
+            lines += [f"{name}: {value}" for name, value in shared.items()]
+            for row in rows:
+                pairs = [f"{name}: {value}" for name, value in row.items() if name not in shared]
+                if pairs:
+                    lines.append("- " + "; ".join(pairs))
+            sections.append("\n".join(lines))
+    finally:
+        workbook.close()
+    return "\n\n".join(sections), raw_chars
+
+
+def compile_instruction(instruction_path, xlsx_path=None):
+    """Retorna (texto compilado, relatório de tamanho por fonte)."""
+    with open(instruction_path, "r", encoding="utf-8") as f:
+        source = f.read()
+    report = {"instruction_chars": len(source)}
+    source_chars = len(source)
+    if xlsx_path:
+        spreadsheet, raw_chars = compile_spreadsheet(xlsx_path)
+        report["spreadsheet_raw_chars"] = raw_chars
+        report["spreadsheet_chars"] = len(spreadsheet)
+        source = f"{source.rstrip()}\n\n{spreadsheet}\n"
+        source_chars += raw_chars
+    compiled = compact_markdown(source)
+    report["source_chars"] = source_chars
+    report["compiled_chars"] = len(compiled)
+    report["reduction"] = round(1 - len(compiled) / source_chars, 3) if source_chars else 0.0
+    return compiled, report
+
+
+def _fingerprint(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(b"<ausente>")
+    return digest.hexdigest()
+
+
+class InstructionCompiler:
+    """
+    Mantém o texto compilado atual e recompila quando as fontes mudam.
+    Os ouvintes (add_listener) recebem o novo texto depois de cada troca.
+    """
+
+    def __init__(self, instruction_path, xlsx_path=None, output_path=None, poll_interval=5.0):
+        self.instruction_path = instruction_path
+        self.xlsx_path = xlsx_path
+        self.output_path = output_path
+        self.poll_interval = poll_interval
+        self._current = None   # (texto, fingerprint, relatório, hash do texto): trocado numa única atribuição
+        self._mtimes = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {"compiles": 0, "swaps": 0, "errors": 0, "version": 0}
+
+    @property
+    def sources(self):
+        return [path for path in (self.instruction_path, self.xlsx_path) if path]
+
+    @property
+    def text(self):
+        return self._current[0] if self._current else None
+
+    @property
+    def text_hash(self):
+        """Hash curto do texto compilado: identifica com quais instruções uma resposta foi gerada."""
+        return self._current[3] if self._current else None
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _source_mtimes(self):
+        mtimes = []
+        for path in self.sources:
+            try:
+                mtimes.append(os.path.getmtime(path))
+            except OSError:
+                mtimes.append(None)
+        return mtimes
+
+    def _write_output(self, text):
+        """Grava o artefato compilado (escrita atômica), para inspeção."""
+        directory = os.path.dirname(self.output_path) or "."
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, self.output_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def refresh(self):
+        """
+        Recompila se as fontes mudaram e troca o texto. Retorna True se houve troca.
+        Se a compilação falhar (ex.: planilha salva pela metade), o texto anterior continua valendo.
+        """
+        mtimes = self._source_mtimes()
+        if self._current is not None and mtimes == self._mtimes:
+            return False
+        fingerprint = _fingerprint(self.sources)
+        if self._current is not None and fingerprint == self._current[1]:
+            self._mtimes = mtimes
+            return False
+        try:
+            text, report = compile_instruction(self.instruction_path, self.xlsx_path)
+        except Exception as e:
+            with self._lock:
+                self.stats["errors"] += 1
+            print(f"❌ Erro ao compilar as instruções da LIA: {e}")
+            if self._current is None:
+                raise
+            return False
+
+        first = self._current is None
+        with self._lock:
+            self._current = (text, fingerprint, report, hashlib.sha256(text.encode("utf-8")).hexdigest()[:16])
+            self._mtimes = mtimes
+            self.stats["compiles"] += 1
+            self.stats["version"] += 1
+            if not first:
+                self.stats["swaps"] += 1
+        print(f"📝 Instruções compiladas: {report['source_chars']} → {report['compiled_chars']} caracteres "
+              f"({-report['reduction']:+.0%}).")
+        if self.output_path:
+            try:
+                self._write_output(text)
+            except OSError as e:
+                print(f"⚠️ Não foi possível gravar {self.output_path}: {e}")
+        if not first:
+            for listener in self._listeners:
+                try:
+                    listener(text)
+                except Exception as e:
+                    print(f"❌ Erro ao aplicar as novas instruções: {e}")
+            print("♻️ Instruções da LIA trocadas sem reiniciar.")
+        return True
+
+    def start(self):
+        """Inicia a thread que observa as fontes."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._watch, name="instruction-compiler", daemon=True)
+                self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Erro ao verificar as instruções da LIA: {e}")
+
+    def get_stats(self):
+        with self._lock:
+            report = dict(self._current[2]) if self._current else {}
+            return {**self.stats, **report, "sources": self.sources}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compila as instruções da LIA e mostra o tamanho antes/depois.")
+    parser.add_argument("--instruction", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                              "system_instruction.txt"))
+    parser.add_argument("--xlsx", default=None)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    text, report = compile_instruction(args.instruction, args.xlsx)
+    for name, value in report.items():
+        print(f"{name:>18}: {value}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"Artefato gravado em {args.output}")
+
+
+if __name__ == "__main__":
+    main()
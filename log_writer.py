@@ -0,0 +1,125 @@
+"""
+Gravação assíncrona e em lote dos logs no PostgreSQL.
+
+As rotas só colocam a linha numa fila em memória (limitada) e seguem em frente;
+uma thread em segundo plano junta as linhas e grava várias de uma vez com
+execute_values, quando o lote enche ou quando passa o intervalo máximo.
+No desligamento a fila é esvaziada antes de sair.
+"""
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from psycopg2.extras import execute_values
+
+_STOP = object()
+
+
+class LogWriter:
+    """Fila limitada + thread que grava em lote (tamanho ou tempo, o que vier primeiro)."""
+
+    def __init__(self, get_pool, max_queue=1000, batch_size=50, flush_interval=2.0):
+        self.get_pool = get_pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def enqueue(self, table, columns, values):
+        """Agenda uma linha para gravação. Nunca bloqueia; se a fila estiver cheia, descarta."""
+        try:
+            self._queue.put_nowait((table, tuple(columns), tuple(values)))
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+            print(f"⚠️ Fila de logs cheia. Linha de {table} descartada.")
+            return False
+        with self._lock:
+            self.stats["enqueued"] += 1
+        self.start()
+        return True
+
+    def _run(self):
+        batch = []
+        deadline = None
+        stopping = False
+        while not stopping:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if batch and (stopping or len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, batch):
+        pool = self.get_pool()
+        if not pool:
+            with self._lock:
+                self.stats["dropped"] += len(batch)
+            print(f"⚠️ Banco de dados não disponível. {len(batch)} linha(s) de log descartada(s).")
+            return
+
+        grouped = defaultdict(list)
+        for table, columns, values in batch:
+            grouped[(table, columns)].append(values)
+
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                for (table, columns), rows in grouped.items():
+                    execute_values(
+                        cursor,
+                        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+                        rows,
+                        page_size=self.batch_size,
+                    )
+            conn.commit()
+            with self._lock:
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+            print(f"💾 {len(batch)} linha(s) de log gravada(s) em lote.")
+        except Exception as e:
+            conn.rollback()
+            with self._lock:
+                self.stats["errors"] += 1
+                self.stats["dropped"] += len(batch)
+            print(f"❌ Erro ao gravar lote de logs: {e}")
+        finally:
+            pool.putconn(conn)
+
+    def shutdown(self, timeout=10):
+        """Esvazia a fila (grava o que faltar) e encerra a thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            print("⚠️ Fila de logs cheia no desligamento; algumas linhas podem ser perdidas.")
+            return
+        thread.join(timeout)
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "queued": self._queue.qsize()}
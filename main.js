@@ -159,10 +159,10 @@ startForm.addEventListener('submit', async (e) => { // <-- 1. Adicionado 'async'
 
         // --- 6. Mostra indicador e toca áudio ---
         showTypingIndicator();
-        const audioData = await fetchWelcomeAudio(welcomeMessageText);
+        const welcomeAudio = await fetchWelcomeAudio(welcomeMessageText);
         removeTypingIndicator();
         appendMessage('bot', welcomeMessageHTML);
-        playAudioFromData(audioData);
+        if (welcomeAudio) playAudioFromUrl(welcomeAudio.audioUrl, welcomeAudio.audioFormat);
 
         // --- 7. Continua lógica normal ---
         resetInactivityTimer();
@@ -230,8 +230,8 @@ async function fetchWelcomeAudio(text) {
 
         const data = await response.json();
         
-        // Retorna os dados do áudio (ou undefined se não vier)
-        return data.audioData; 
+        // Retorna a URL e o formato do áudio (a URL fica undefined se não vier)
+        return data; 
 
     } catch (error) {
         console.error('Erro ao buscar áudio de boas-vindas:', error);
@@ -334,20 +334,27 @@ async function fetchBotReply(payload) {
             // Adicionamos o objeto 'userProfile' ao corpo (body) da requisição.
             body.profile = userProfile;
 
+            // Pede a resposta em streaming (SSE); o servidor responde JSON quando não houver streaming
             requestOptions = { 
                 method: 'POST', 
-                headers: {'Content-Type': 'application/json'}, 
+                headers: {'Content-Type': 'application/json', 'Accept': 'text/event-stream, application/json'}, 
                 body: JSON.stringify(body) 
             };
         }
         
         const response = await fetch(backendUrl, requestOptions);
         if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+
+        if ((response.headers.get('Content-Type') || '').includes('text/event-stream')) {
+            await readBotReplyStream(response);
+            return;
+        }
+
         const data = await response.json();
         
         removeTypingIndicator();
         appendMessage('bot', data.reply);
-        playAudioFromData(data.audioData);
+        playAudioFromUrl(data.audioUrl, data.audioFormat);
 
     } catch (error) {
         handleFetchError(error);
@@ -360,6 +367,62 @@ async function fetchBotReply(payload) {
     }
 }
 
+// Lê a resposta SSE do /chat: mostra o texto conforme chega e toca o áudio no fim
+async function readBotReplyStream(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let replyText = '';
+    let bubble = null;
+
+    // Nova resposta: interrompe o que estiver tocando
+    clearAudioQueue();
+    if (currentAudio) currentAudio.pause();
+
+    const handleEvent = (event, data) => {
+        if (event === 'delta') {
+            replyText += data.text;
+            if (!bubble) {
+                removeTypingIndicator();
+                bubble = appendMessage('bot', replyText);
+            } else {
+                bubble.innerHTML = marked.parse(replyText);
+            }
+        } else if (event === 'audio') {
+            enqueueAudioSegment(data.audioUrl, data.audioFormat);
+        } else if (event === 'done') {
+            if (!bubble) {
+                removeTypingIndicator();
+                bubble = appendMessage('bot', data.reply);
+            }
+        } else if (event === 'error') {
+            throw new Error(data.error);
+        }
+    };
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Eventos SSE são separados por uma linha em branco
+        let separatorIndex;
+        while ((separatorIndex = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, separatorIndex);
+            buffer = buffer.slice(separatorIndex + 2);
+
+            let event = 'message';
+            let dataLines = [];
+            for (const line of rawEvent.split('\n')) {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) dataLines.push(line.slice(5).trim());
+            }
+            if (dataLines.length) handleEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+    }
+    removeTypingIndicator();
+}
+
 // --- LÓGICA: RESUMIR E SUGERIR ---
 summarizeButton.addEventListener('click', async () => {
     showTypingIndicator(); setUiDisabled(true);
@@ -447,6 +510,8 @@ function appendMessage(sender, message) {
     if (typeof MathJax !== "undefined" && sender === 'bot') {
         MathJax.typesetPromise([wrapper]).catch((err) => console.log('Erro MathJax:', err));
     }
+
+    return bubble;
 }
 
 // 🔁 Observa mudanças no chat e rola automaticamente até o final
@@ -470,12 +535,48 @@ const removeTypingIndicator=()=>{const t=document.getElementById('typing-indicat
 
 // --- Lógica de TTS ---
 let isTtsEnabled=true;let currentAudio=null;const iconSoundOn=`<svg xmlns="http://www.w3.org/2000/svg" width="28" height="28" viewBox="0 0 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><polygon points="11 5 6 9 2 9 2 15 6 15 11 19 11 5"/><path d="M15.54 8.46a5 5 0 0 1 0 7.07"/><path d="M19.07 4.93a10 10 0 0 1 0 14.14"/></svg>`;const iconSoundOff=`<svg xmlns="http://www.w3.org/2000/svg" width="28" height="28" viewBox="0 0 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round"><polygon points="11 5 6 9 2 9 2 15 6 15 11 19 11 5"/><line x1="22" x2="16" y1="9" y2="15"/><line x1="16" x2="22" y1="9" y2="15"/></svg>`;
-function base64ToArrayBuffer(b){const s=window.atob(b);const l=s.length;const B=new Uint8Array(l);for(let i=0;i<l;i++){B[i]=s.charCodeAt(i)}return B.buffer}
-function pcmToWavBlob(d){const r=24000;const p=base64ToArrayBuffer(d);const D=new Int16Array(p);const h=new ArrayBuffer(44);const v=new DataView(h);v.setUint32(0,1380533830,false);v.setUint32(4,36+D.byteLength,true);v.setUint32(8,1463899717,false);v.setUint32(12,1718449184,false);v.setUint32(16,16,true);v.setUint16(20,1,true);v.setUint16(22,1,true);v.setUint32(24,r,true);v.setUint32(28,r*2,true);v.setUint16(32,2,true);v.setUint16(34,16,true);v.setUint32(36,1684108385,false);v.setUint32(40,D.byteLength,true);return new Blob([h,D],{type:'audio/wav'})}
 
-const playAudioFromData=(d)=>{if(currentAudio){currentAudio.pause()}stopTalkingAnimation();if(!isTtsEnabled||!d)return;try{const b=pcmToWavBlob(d);const u=URL.createObjectURL(b);currentAudio=new Audio(u);currentAudio.addEventListener('play',startTalkingAnimation);currentAudio.addEventListener('ended',stopTalkingAnimation);currentAudio.addEventListener('pause',stopTalkingAnimation);currentAudio.addEventListener('error',stopTalkingAnimation);currentAudio.play()}catch(e){console.error("Erro ao tocar áudio:",e)}};
+// O servidor devolve só a URL (/audio/<id>) e o formato (Opus, MP3 ou WAV); o navegador baixa, faz streaming e guarda em cache
+const canPlayAudioFormat=(f)=>{if(!f)return true;const ok=new Audio().canPlayType(f)!=='';if(!ok)console.warn("Formato de áudio não suportado pelo navegador:",f);return ok};
+const playAudioFromUrl=(u,f)=>{clearAudioQueue();if(currentAudio){currentAudio.pause()}stopTalkingAnimation();if(!isTtsEnabled||!u||!canPlayAudioFormat(f))return;try{currentAudio=new Audio(u);currentAudio.addEventListener('play',startTalkingAnimation);currentAudio.addEventListener('ended',stopTalkingAnimation);currentAudio.addEventListener('pause',stopTalkingAnimation);currentAudio.addEventListener('error',stopTalkingAnimation);currentAudio.play()}catch(e){console.error("Erro ao tocar áudio:",e)}};
+
+// Fila de segmentos de áudio do streaming (uma frase por vez), tocados em ordem
+let audioQueue = [];
+let isPlayingQueue = false;
+
+function clearAudioQueue() {
+    audioQueue = [];
+    isPlayingQueue = false;
+}
+
+function playNextAudioSegment() {
+    const u = audioQueue.shift();
+    if (!u || !isTtsEnabled) {
+        clearAudioQueue();
+        stopTalkingAnimation();
+        return;
+    }
+    isPlayingQueue = true;
+    try {
+        currentAudio = new Audio(u);
+        currentAudio.addEventListener('play', startTalkingAnimation);
+        currentAudio.addEventListener('ended', playNextAudioSegment);
+        currentAudio.addEventListener('error', playNextAudioSegment);
+        currentAudio.play().catch((e) => { console.error("Erro ao tocar áudio:", e); playNextAudioSegment(); });
+    } catch (e) {
+        console.error("Erro ao tocar áudio:", e);
+        playNextAudioSegment();
+    }
+}
+
+function enqueueAudioSegment(u, f) {
+    if (!isTtsEnabled || !u || !canPlayAudioFormat(f)) return;
+    audioQueue.push(u);
+    if (!isPlayingQueue) playNextAudioSegment();
+}
+
 const updateTtsButtonIcon=()=>{ttsButton.innerHTML=isTtsEnabled?iconSoundOn:iconSoundOff};
-ttsButton.addEventListener('click',()=>{isTtsEnabled=!isTtsEnabled;updateTtsButtonIcon();if(!isTtsEnabled&&currentAudio){currentAudio.pause()}});
+ttsButton.addEventListener('click',()=>{isTtsEnabled=!isTtsEnabled;updateTtsButtonIcon();if(!isTtsEnabled){clearAudioQueue();if(currentAudio){currentAudio.pause();stopTalkingAnimation()}}});
 updateTtsButtonIcon();
 
 document.addEventListener('DOMContentLoaded', () => {
@@ -0,0 +1,212 @@
+"""
+Registro em memória dos áudios pré-gravados (EVENT_INFO).
+
+Carregado uma vez na inicialização: para cada preset guarda os bytes já
+codificados (o mesmo codec do TTS), o hash do conteúdo (que vira o id/ETag em
+/audio/<id>) e a duração. Assim uma resposta pré-gravada não custa leitura de
+disco nem codificação por requisição.
+
+Arquivos que faltam são sintetizados em segundo plano e gravados em
+respostas_pre_gravadas/ (PCM cru, como o create_audio.py), com a entrada no
+manifest.json que o create_audio.py usa para saber o que já está atualizado.
+Uma thread observa os arquivos e recarrega o preset quando um deles muda.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+from audio_store import PCM_SAMPLE_RATE, PCM_SAMPLE_WIDTH, PCM_CHANNELS, MIMETYPES
+from event_info import TTS_MODEL, TTS_VOICE, TTS_PROMPT
+
+MANIFEST_NAME = os.path.join("respostas_pre_gravadas", "manifest.json")
+
+
+def text_hash(text):
+    """Hash do áudio de um texto: muda quando o texto, o prompt, a voz ou o modelo mudam."""
+    return hashlib.sha256(f"{TTS_MODEL}\0{TTS_VOICE}\0{TTS_PROMPT}{text}".encode("utf-8")).hexdigest()
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_manifest(base_dir):
+    """{audio_path: {question, hash, bytes, voice, model}} dos áudios pré-gravados."""
+    try:
+        with open(os.path.join(base_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(base_dir, manifest):
+    write_atomic(os.path.join(base_dir, MANIFEST_NAME),
+                 json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+
+
+def manifest_entry(question, text, pcm):
+    return {"question": question, "hash": text_hash(text), "bytes": len(pcm), "voice": TTS_VOICE,
+            "model": TTS_MODEL}
+
+
+class PresetRegistry:
+    """
+    encode(pcm) -> (bytes, extensão) e synthesize_pcm(texto) -> bytes PCM são
+    injetados pelo app (pool de processos e TTS com as chaves Gemini).
+    """
+
+    def __init__(self, event_info, base_dir, encode, synthesize_pcm, poll_interval=5.0):
+        self.event_info = event_info
+        self.base_dir = base_dir
+        self.encode = encode
+        self.synthesize_pcm = synthesize_pcm
+        self.poll_interval = poll_interval
+        self._entries = {}   # pergunta -> entrada
+        self._by_id = {}     # audio_id -> entrada
+        self._mtimes = {}    # pergunta -> mtime do arquivo carregado (None = ausente)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {"loads": 0, "reloads": 0, "synthesized": 0, "missing": 0, "errors": 0}
+
+    def _path(self, question):
+        return os.path.join(self.base_dir, self.event_info[question]["audio_path"])
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _load(self, question):
+        """Lê e codifica o arquivo do preset e troca a entrada em memória."""
+        path = self._path(question)
+        mtime = self._mtime(path)
+        with open(path, "rb") as f:
+            pcm = f.read()
+        data, extension = self.encode(pcm)
+        digest = hashlib.sha256(data).hexdigest()
+        entry = {
+            "question": question,
+            "path": path,
+            "audio_id": f"{digest[:32]}.{extension}",
+            "sha256": digest,
+            "etag": digest[:32],
+            "mimetype": MIMETYPES[extension],
+            "duration_seconds": round(len(pcm) / (PCM_SAMPLE_RATE * PCM_SAMPLE_WIDTH * PCM_CHANNELS), 2),
+            "size_bytes": len(data),
+            "data": data,
+        }
+        entry["url"] = f"/audio/{entry['audio_id']}"
+        with self._lock:
+            old = self._entries.get(question)
+            if old:
+                self._by_id.pop(old["audio_id"], None)
+            self._entries[question] = entry
+            self._by_id[entry["audio_id"]] = entry
+            self._mtimes[question] = mtime
+        return entry
+
+    def _synthesize_missing(self, question):
+        """Gera o áudio de um preset sem arquivo, grava em disco e registra no manifest."""
+        info = self.event_info[question]
+        path = self._path(question)
+        pcm = self.synthesize_pcm(info["text"])
+        write_atomic(path, pcm)
+        with self._lock:
+            manifest = load_manifest(self.base_dir)
+            manifest[info["audio_path"]] = manifest_entry(question, info["text"], pcm)
+            save_manifest(self.base_dir, manifest)
+            self.stats["synthesized"] += 1
+        print(f"🎙️ Áudio do preset \"{question}\" sintetizado e salvo em {path}.")
+
+    def load_all(self):
+        """Carrega todos os presets cujo arquivo existe. Retorna os que estão faltando."""
+        missing = []
+        for question in self.event_info:
+            if not os.path.exists(self._path(question)):
+                missing.append(question)
+                continue
+            try:
+                self._load(question)
+                with self._lock:
+                    self.stats["loads"] += 1
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"❌ Erro ao carregar o áudio do preset \"{question}\": {e}")
+        with self._lock:
+            self.stats["missing"] = len(missing)
+        if missing:
+            print(f"⚠️ {len(missing)} preset(s) sem arquivo de áudio: serão sintetizados em segundo plano.")
+        return missing
+
+    def start(self):
+        """Carrega os presets e inicia a thread de síntese dos que faltam e de recarga."""
+        missing = self.load_all()
+        print(f"🎧 {len(self._entries)} áudio(s) pré-gravado(s) em memória.")
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._watch, args=(missing,), name="preset-registry", daemon=True
+                )
+                self._thread.start()
+
+    def _watch(self, missing):
+        for question in missing:
+            try:
+                self._synthesize_missing(question)
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"❌ Não foi possível sintetizar o preset \"{question}\": {e}")
+        while True:
+            self._reload_changed()
+            time.sleep(self.poll_interval)
+
+    def _reload_changed(self):
+        """Recarrega os presets cujo arquivo mudou (ou apareceu) desde a última carga."""
+        for question in self.event_info:
+            mtime = self._mtime(self._path(question))
+            with self._lock:
+                loaded_mtime = self._mtimes.get(question)
+            if mtime is None or mtime == loaded_mtime:
+                continue
+            try:
+                self._load(question)
+                with self._lock:
+                    self.stats["reloads"] += 1
+                print(f"♻️ Áudio do preset \"{question}\" recarregado.")
+            except Exception as e:
+                with self._lock:
+                    self.stats["errors"] += 1
+                print(f"❌ Erro ao recarregar o áudio do preset \"{question}\": {e}")
+
+    def get(self, question):
+        """Entrada do preset (com url, etag, duração...), ou None se ainda não estiver carregado."""
+        with self._lock:
+            return self._entries.get(question)
+
+    def get_by_id(self, audio_id):
+        with self._lock:
+            return self._by_id.get(audio_id)
+
+    def get_stats(self):
+        with self._lock:
+            presets = [
+                {key: entry[key] for key in ("question", "url", "duration_seconds", "size_bytes", "mimetype")}
+                for entry in self._entries.values()
+            ]
+            return {**self.stats, "loaded": len(presets), "presets": presets}
@@ -0,0 +1,110 @@
+"""
+Resumo incremental da conversa para o /summarize.
+
+Antes, cada clique em "resumir" reenviava a transcrição inteira ao modelo,
+mesmo sem nada novo desde o último resumo. Agora cada sessão guarda o último
+resumo, um cursor (hash das últimas mensagens já resumidas) e o hash do
+histórico: se o histórico não mudou, o resumo guardado é devolvido sem chamar
+o modelo; se mudou, só os turnos depois do cursor são enviados, junto com o
+resumo anterior. O custo passa a acompanhar o conteúdo novo, não o tamanho
+da sessão.
+"""
+import json
+import hashlib
+import threading
+
+from history_compaction import format_transcript
+
+# Quantas mensagens formam o cursor (o par pergunta/resposta mais recente)
+CURSOR_MESSAGES = 2
+
+
+def message_digest(messages):
+    """Hash curto de uma sequência de mensagens serializadas."""
+    encoded = json.dumps(messages, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def messages_after(history, cursor):
+    """
+    Mensagens posteriores ao cursor. Retorna None se o cursor não está mais no
+    histórico (a parte já resumida saiu pelo corte ou pela compactação).
+    """
+    if not cursor:
+        return None
+    for end in range(len(history), 0, -1):
+        if message_digest(history[max(0, end - CURSOR_MESSAGES):end]) == cursor:
+            return history[end:]
+    return None
+
+
+def build_rolling_prompt(previous_summary, messages, max_chars):
+    if not previous_summary:
+        return (
+            "Resuma a conversa em português, de forma breve e objetiva "
+            f"(no máximo {max_chars} caracteres):\n\n{format_transcript(messages)}"
+        )
+    return (
+        "Atualize o resumo de uma conversa com os turnos novos. Responda em português, "
+        f"de forma breve e objetiva, só com o resumo atualizado (no máximo {max_chars} caracteres).\n\n"
+        f"Resumo anterior:\n{previous_summary}\n\nNovos turnos:\n{format_transcript(messages)}"
+    )
+
+
+class RollingSummarizer:
+    """
+    summarize(prompt) -> texto é injetado pelo app. O estado de cada sessão fica
+    em session.state["rolling_summary"] (texto, cursor e hash do histórico).
+    """
+
+    def __init__(self, summarize, max_chars=1500):
+        self.summarize = summarize
+        self.max_chars = max_chars
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "cached": 0, "incremental": 0, "full": 0,
+                      "messages_sent": 0, "messages_skipped": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def update(self, history, rolling, compacted_summary=None):
+        """
+        Retorna (resumo, novo estado ou None se nada mudou).
+        `history` é o histórico salvo (serializado) e `compacted_summary` o resumo
+        da compactação, usado como ponto de partida no primeiro resumo.
+        """
+        self._count("requests")
+        rolling = rolling or {}
+        history_hash = message_digest(history)
+        if rolling.get("text") and rolling.get("history_hash") == history_hash:
+            self._count("cached")
+            return rolling["text"], None
+
+        new_messages = messages_after(history, rolling.get("cursor"))
+        if new_messages is None:
+            new_messages = history
+            previous = rolling.get("text") or compacted_summary
+            self._count("full")
+        else:
+            previous = rolling.get("text")
+            self._count("incremental")
+        self._count("messages_sent", len(new_messages))
+        self._count("messages_skipped", len(history) - len(new_messages))
+
+        if new_messages:
+            prompt = build_rolling_prompt(previous, new_messages, self.max_chars)
+            text = (self.summarize(prompt) or "").strip()[:self.max_chars] or previous
+        else:
+            # O histórico só perdeu mensagens antigas (corte/compactação): o resumo continua valendo
+            text = previous
+        state = {
+            "text": text,
+            "cursor": message_digest(history[-CURSOR_MESSAGES:]) if history else None,
+            "history_hash": history_hash,
+        }
+        return text, state
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
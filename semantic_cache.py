@@ -0,0 +1,187 @@
+"""
+Cache semântico de respostas.
+
+Perguntas parecidas ("onde fica a sala 307", "a sala 307 fica onde?") recebem a
+resposta já gerada, sem chamar o Gemini. A similaridade é calculada localmente
+com NumPy: cada pergunta vira um vetor TF-IDF de n-gramas de caracteres
+(com hashing num espaço de tamanho fixo) e a busca é um produto matricial
+contra todas as perguntas guardadas.
+
+O cache tem limite de entradas (sai a menos usada recentemente) e é esvaziado
+pelo app (invalidate) sempre que as instruções recompiladas são aplicadas. Perguntas com números
+diferentes ("sala 307" x "sala 308") nunca casam, por mais parecidas que sejam.
+Perguntas que só fazem sentido na conversa ("e onde fica?") ou com negação
+("o que não é...") ficam fora do cache, e o app só consulta/guarda o primeiro
+turno de cada sessão. O áudio não é guardado aqui:
+a resposta em cache tem o mesmo texto, então o TTSCache já devolve o áudio dela.
+"""
+import re
+import time
+import zlib
+import threading
+import unicodedata
+
+import numpy as np
+
+NON_WORD = re.compile(r"[^a-z0-9 ]+")
+SPACES = re.compile(r"\s+")
+NUMBER = re.compile(r"\d+")
+
+# Perguntas que dependem da conversa ("e onde fica?", "quem é ele?") ou que negam
+# ("o que não é...") não entram no cache: a mesma frase pede respostas diferentes
+NEGATIONS = {"nao", "nem", "nunca", "jamais", "nenhum", "nenhuma", "sem"}
+FOLLOW_UPS = {"ele", "ela", "eles", "elas", "dele", "dela", "deles", "delas", "isso", "isto", "disso",
+              "nisso", "esse", "essa", "esses", "essas", "nesse", "nessa", "desse", "dessa", "aquele",
+              "aquela", "la", "ali", "tambem", "outro", "outra", "mesmo", "mesma"}
+
+
+def normalize_question(text):
+    """Minúsculas, sem acentos, sem pontuação e com espaços simples."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return SPACES.sub(" ", NON_WORD.sub(" ", text)).strip()
+
+
+def is_self_contained(question):
+    """A pergunta se entende sozinha e não tem negação? (só essas podem usar o cache)"""
+    words = normalize_question(question).split()
+    if not words or words[0] == "e":
+        return False
+    return not any(word in NEGATIONS or word in FOLLOW_UPS for word in words)
+
+
+class SemanticAnswerCache:
+    """Índice vetorial em memória: matriz (max_entries x dim) de contagens de n-gramas."""
+
+    def __init__(self, threshold=0.8, max_entries=500, dim=4096, ngram_range=(3, 5),
+                 min_chars=8):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.min_chars = min_chars
+        self._lock = threading.Lock()
+        self._counts = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries = [None] * max_entries
+        self._by_question = {}
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0,
+                      "evictions": 0, "invalidations": 0, "skipped": 0}
+
+    # ---------- vetorização ----------
+
+    def _vectorize(self, normalized):
+        """
+        Contagens de n-gramas de caracteres de cada palavra (a ordem das palavras
+        não importa), com hashing (crc32) em `dim` posições.
+        """
+        vector = np.zeros(self.dim, dtype=np.float32)
+        low, high = self.ngram_range
+        indices = [
+            zlib.crc32(padded[i:i + n].encode("utf-8")) % self.dim
+            for padded in (f" {word} " for word in normalized.split())
+            for n in range(low, high + 1)
+            for i in range(max(1, len(padded) - n + 1))
+        ]
+        np.add.at(vector, indices, 1.0)
+        return vector
+
+    def _idf(self, used):
+        """IDF suavizado calculado sobre as perguntas guardadas no momento."""
+        doc_freq = np.count_nonzero(self._counts[used], axis=0)
+        total = len(used)
+        return np.log((1.0 + total) / (1.0 + doc_freq)) + 1.0
+
+    @staticmethod
+    def _weight(counts, idf):
+        weighted = np.log1p(counts) * idf
+        norms = np.linalg.norm(weighted, axis=-1, keepdims=True)
+        return weighted / np.maximum(norms, 1e-9)
+
+    # ---------- invalidação ----------
+
+    def _clear(self):
+        self._counts[:] = 0
+        self._entries = [None] * self.max_entries
+        self._by_question.clear()
+        self.stats["invalidations"] += 1
+
+    def invalidate(self):
+        """Esvazia o cache (o app chama quando aplica instruções novas)."""
+        with self._lock:
+            self._clear()
+
+    # ---------- API ----------
+
+    def lookup(self, question):
+        """
+        Retorna (entrada, similaridade) da pergunta guardada mais parecida, se
+        passar do limiar; senão (None, melhor similaridade).
+        A entrada é um dict com question e reply.
+        """
+        normalized = normalize_question(question)
+        with self._lock:
+            self.stats["lookups"] += 1
+            if not is_self_contained(question):
+                self.stats["skipped"] += 1
+                return None, 0.0
+            if len(normalized) < self.min_chars:
+                self.stats["misses"] += 1
+                return None, 0.0
+            used = [i for i, entry in enumerate(self._entries) if entry is not None]
+            if not used:
+                self.stats["misses"] += 1
+                return None, 0.0
+
+            idf = self._idf(used)
+            matrix = self._weight(self._counts[used], idf)
+            query = self._weight(self._vectorize(normalized), idf)
+            scores = matrix @ query
+            numbers = set(NUMBER.findall(normalized))
+            scores[[self._entries[i]["numbers"] != numbers for i in used]] = -1.0
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                self.stats["misses"] += 1
+                return None, score
+
+            entry = self._entries[used[best]]
+            entry["hits"] += 1
+            entry["last_used"] = time.monotonic()
+            self.stats["hits"] += 1
+            return dict(entry), score
+
+    def store(self, question, reply):
+        """Guarda (ou atualiza) a resposta de uma pergunta, despejando a menos usada se preciso."""
+        normalized = normalize_question(question)
+        if len(normalized) < self.min_chars or not reply or not is_self_contained(question):
+            return
+        with self._lock:
+            slot = self._by_question.get(normalized)
+            if slot is None:
+                free = [i for i, entry in enumerate(self._entries) if entry is None]
+                if free:
+                    slot = free[0]
+                else:
+                    slot = min(range(self.max_entries), key=lambda i: self._entries[i]["last_used"])
+                    del self._by_question[self._entries[slot]["normalized"]]
+                    self.stats["evictions"] += 1
+                self._counts[slot] = self._vectorize(normalized)
+                self._by_question[normalized] = slot
+            self._entries[slot] = {
+                "question": question,
+                "normalized": normalized,
+                "numbers": set(NUMBER.findall(normalized)),
+                "reply": reply,
+                "hits": 0,
+                "last_used": time.monotonic(),
+            }
+            self.stats["stores"] += 1
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._by_question),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+            }
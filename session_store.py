@@ -0,0 +1,435 @@
+"""
+Armazenamento das conversas (uma por sessionId do totem), fora da memória do processo.
+
+O estado de cada sessão (histórico serializado + campos extras) fica num backend
+plugável: memória (um único worker), SQLite (vários workers na mesma máquina) ou
+PostgreSQL (vários workers/instâncias). A cada requisição a ChatSession é
+reconstruída a partir do histórico salvo, então qualquer worker do gunicorn
+consegue atender qualquer sessão.
+
+Sessões ociosas além do TTL expiram, o total de sessões é limitado (as menos
+usadas saem primeiro) e o histórico é cortado nas N mensagens mais recentes.
+Com um HistoryCompactor, os turnos antigos são dobrados num resumo (state["summary"])
+antes de chegar nesse corte. Uma thread varre as sessões expiradas periodicamente.
+"""
+import json
+import time
+import base64
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from history_compaction import summary_messages
+
+
+# ============================================================
+# Serialização do histórico
+# ============================================================
+
+def serialize_history(history):
+    """Converte o histórico da ChatSession (protos.Content) em dicts JSON."""
+    serialized = []
+    for content in history:
+        parts = []
+        for part in content.parts:
+            if part.text:
+                parts.append({"text": part.text})
+            elif part.inline_data and part.inline_data.data:
+                parts.append({"inline_data": {
+                    "mime_type": part.inline_data.mime_type,
+                    "data": base64.b64encode(part.inline_data.data).decode("ascii"),
+                }})
+        if parts:
+            serialized.append({"role": content.role, "parts": parts})
+    return serialized
+
+
+def deserialize_history(serialized):
+    """Converte os dicts JSON de volta no formato aceito por model.start_chat(history=...)."""
+    history = []
+    for content in serialized or []:
+        parts = []
+        for part in content["parts"]:
+            if "text" in part:
+                parts.append({"text": part["text"]})
+            elif "inline_data" in part:
+                parts.append({"inline_data": {
+                    "mime_type": part["inline_data"]["mime_type"],
+                    "data": base64.b64decode(part["inline_data"]["data"]),
+                }})
+        history.append({"role": content["role"], "parts": parts})
+    return history
+
+
+def trim_history(serialized, max_messages):
+    """Mantém só as últimas mensagens, começando sempre num turno do usuário."""
+    if len(serialized) <= max_messages:
+        return serialized, False
+    trimmed = serialized[-max_messages:]
+    while trimmed and trimmed[0]["role"] != "user":
+        trimmed = trimmed[1:]
+    return trimmed, True
+
+
+# ============================================================
+# Backends
+# ============================================================
+
+class MemoryBackend:
+    """Estado em memória, em ordem de último acesso (LRU). Só serve para um worker."""
+
+    def __init__(self):
+        self._data = OrderedDict()  # sessionId -> (payload json, last_access)
+        self._lock = threading.Lock()
+
+    def load(self, session_id):
+        with self._lock:
+            entry = self._data.get(session_id)
+            return entry[0] if entry else None
+
+    def save(self, session_id, payload):
+        with self._lock:
+            self._data.pop(session_id, None)
+            self._data[session_id] = (payload, time.time())
+
+    def update(self, session_id, change):
+        """Lê, aplica change(payload) -> payload novo (ou None: nada a gravar) e grava, sem intercalar."""
+        with self._lock:
+            entry = self._data.get(session_id)
+            if entry is None:
+                return False
+            payload = change(entry[0])
+            if payload is None:
+                return False
+            self._data.pop(session_id)
+            self._data[session_id] = (payload, time.time())
+            return True
+
+    def delete(self, session_id):
+        with self._lock:
+            return self._data.pop(session_id, None) is not None
+
+    def expire(self, idle_ttl, max_sessions):
+        cutoff = time.time() - idle_ttl
+        expired = evicted = 0
+        with self._lock:
+            while self._data:
+                session_id, (_, last_access) = next(iter(self._data.items()))
+                if last_access >= cutoff:
+                    break
+                del self._data[session_id]
+                expired += 1
+            while len(self._data) > max_sessions:
+                self._data.popitem(last=False)
+                evicted += 1
+        return expired, evicted
+
+    def count_and_bytes(self):
+        with self._lock:
+            return len(self._data), sum(len(payload) for payload, _ in self._data.values())
+
+
+class SQLiteBackend:
+    """Estado num arquivo SQLite: compartilhado entre os workers da mesma máquina."""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions (updated_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def load(self, session_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT state FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def save(self, session_id, payload):
+        with self._connect() as conn:
+            conn.execute("""
+                INSERT INTO chat_sessions (session_id, state, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+            """, (session_id, payload, time.time()))
+
+    def update(self, session_id, change):
+        """Lê, aplica change(payload) e grava numa transação BEGIN IMMEDIATE (trava de escrita)."""
+        conn = self._connect()
+        conn.isolation_level = None  # transação controlada à mão
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT state FROM chat_sessions WHERE session_id = ?", (session_id,)).fetchone()
+            payload = change(row[0]) if row else None
+            if payload is None:
+                conn.execute("ROLLBACK")
+                return False
+            conn.execute("UPDATE chat_sessions SET state = ?, updated_at = ? WHERE session_id = ?",
+                         (payload, time.time(), session_id))
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def delete(self, session_id):
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def expire(self, idle_ttl, max_sessions):
+        with self._connect() as conn:
+            expired = conn.execute(
+                "DELETE FROM chat_sessions WHERE updated_at < ?", (time.time() - idle_ttl,)
+            ).rowcount
+            evicted = conn.execute("""
+                DELETE FROM chat_sessions WHERE session_id NOT IN (
+                    SELECT session_id FROM chat_sessions ORDER BY updated_at DESC LIMIT ?
+                )
+            """, (max_sessions,)).rowcount
+        return expired, evicted
+
+    def count_and_bytes(self):
+        with self._connect() as conn:
+            count, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM chat_sessions"
+            ).fetchone()
+        return count, size
+
+
+class PostgresBackend:
+    """Estado numa tabela do PostgreSQL: compartilhado entre workers e instâncias."""
+
+    def __init__(self, get_pool):
+        self.get_pool = get_pool
+        self._schema_ready = False
+
+    def _run(self, fn):
+        pool = self.get_pool()
+        if not pool:
+            raise RuntimeError("Banco de dados não disponível para as sessões.")
+        conn = pool.getconn()
+        try:
+            creating_schema = not self._schema_ready
+            with conn.cursor() as cursor:
+                if creating_schema:
+                    cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS chat_sessions (
+                            session_id VARCHAR(64) PRIMARY KEY,
+                            state TEXT NOT NULL,
+                            updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+                        );
+                    """)
+                result = fn(cursor)
+            conn.commit()
+            # Só depois do commit: se a transação voltar atrás, a tabela é criada na próxima
+            if creating_schema:
+                self._schema_ready = True
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+
+    def load(self, session_id):
+        def query(cursor):
+            cursor.execute("SELECT state FROM chat_sessions WHERE session_id = %s", (session_id,))
+            row = cursor.fetchone()
+            return row[0] if row else None
+        return self._run(query)
+
+    def save(self, session_id, payload):
+        self._run(lambda cursor: cursor.execute("""
+            INSERT INTO chat_sessions (session_id, state, updated_at) VALUES (%s, %s, now())
+            ON CONFLICT (session_id) DO UPDATE SET state = EXCLUDED.state, updated_at = now()
+        """, (session_id, payload)))
+
+    def update(self, session_id, change):
+        """Lê com SELECT ... FOR UPDATE (trava a linha), aplica change(payload) e grava na mesma transação."""
+        def query(cursor):
+            cursor.execute("SELECT state FROM chat_sessions WHERE session_id = %s FOR UPDATE", (session_id,))
+            row = cursor.fetchone()
+            payload = change(row[0]) if row else None
+            if payload is None:
+                return False
+            cursor.execute("UPDATE chat_sessions SET state = %s, updated_at = now() WHERE session_id = %s",
+                           (payload, session_id))
+            return True
+        return self._run(query)
+
+    def delete(self, session_id):
+        def query(cursor):
+            cursor.execute("DELETE FROM chat_sessions WHERE session_id = %s", (session_id,))
+            return cursor.rowcount > 0
+        return self._run(query)
+
+    def expire(self, idle_ttl, max_sessions):
+        def query(cursor):
+            cursor.execute(
+                "DELETE FROM chat_sessions WHERE updated_at < now() - make_interval(secs => %s)", (idle_ttl,)
+            )
+            expired = cursor.rowcount
+            cursor.execute("""
+                DELETE FROM chat_sessions WHERE session_id NOT IN (
+                    SELECT session_id FROM chat_sessions ORDER BY updated_at DESC LIMIT %s
+                )
+            """, (max_sessions,))
+            return expired, cursor.rowcount
+        return self._run(query)
+
+    def count_and_bytes(self):
+        def query(cursor):
+            cursor.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM chat_sessions")
+            return cursor.fetchone()
+        return self._run(query)
+
+
+# ============================================================
+# Store
+# ============================================================
+
+class Session:
+    """Uma sessão carregada para a requisição atual: a ChatSession reconstruída + estado extra."""
+
+    def __init__(self, session_id, convo, state, prefix_len=0):
+        self.id = session_id
+        self.convo = convo
+        self.state = state
+        # Mensagens injetadas no início do histórico (resumo) que não são salvas
+        self.prefix_len = prefix_len
+
+
+class SessionStore:
+    """Carrega/salva sessões no backend, reconstruindo a ChatSession a cada requisição."""
+
+    def __init__(self, backend, chat_factory, idle_ttl=900, max_sessions=500,
+                 max_history_messages=40, sweep_interval=60, compactor=None):
+        self.backend = backend
+        self.chat_factory = chat_factory
+        self.compactor = compactor
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_history_messages = max_history_messages
+        self.sweep_interval = sweep_interval
+        self._sweeper = None
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "loaded": 0, "saved": 0, "expired": 0,
+                      "evicted_lru": 0, "removed": 0, "history_trims": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _start_sweeper(self):
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                expired = self.sweep()
+            except Exception as e:
+                print(f"⚠️ Erro ao varrer sessões expiradas: {e}")
+                continue
+            if expired:
+                print(f"🧹 {expired} sessão(ões) ociosa(s) removida(s).")
+
+    def sweep(self):
+        """Remove as sessões ociosas e as que passaram do limite. Retorna quantas saíram."""
+        expired, evicted = self.backend.expire(self.idle_ttl, self.max_sessions)
+        self._count("expired", expired)
+        self._count("evicted_lru", evicted)
+        return expired + evicted
+
+    def load(self, session_id):
+        """Carrega a sessão (ou None se não existir), já com o histórico cortado."""
+        self._start_sweeper()
+        payload = self.backend.load(session_id)
+        if payload is None:
+            return None
+        state = json.loads(payload)
+        history, trimmed = trim_history(state.get("history", []), self.max_history_messages)
+        if trimmed:
+            self._count("history_trims")
+        state["history"] = history
+        self._count("loaded")
+        prefix = summary_messages(state.get("summary"))
+        convo = self.chat_factory(deserialize_history(prefix + history))
+        return Session(session_id, convo, state, prefix_len=len(prefix))
+
+    def get_or_create(self, session_id):
+        """Carrega a sessão ou cria uma nova (ainda não salva até o primeiro save)."""
+        session = self.load(session_id)
+        if session is None:
+            session = Session(session_id, self.chat_factory([]), {"history": []})
+            self._count("created")
+        return session
+
+    def save(self, session):
+        """Grava o histórico atual da ChatSession e o estado extra da sessão."""
+        history = serialize_history(session.convo.history)[session.prefix_len:]
+        session.state["history"] = history
+        self.backend.save(session.id, json.dumps(session.state, ensure_ascii=False))
+        self._count("saved")
+        if self.compactor:
+            self.compactor.maybe_schedule(session.id, history, session.state.get("summary"),
+                                          self._apply_compaction)
+
+    def _apply_compaction(self, session_id, folded, summary):
+        """
+        Troca as mensagens dobradas pelo novo resumo, numa leitura+escrita atômica no
+        backend. Se a sessão mudou no meio do caminho (reiniciada ou já compactada),
+        descarta o resultado.
+        """
+        def change(payload):
+            state = json.loads(payload)
+            history = state.get("history", [])
+            if history[:len(folded)] != folded:
+                return None
+            state["history"] = history[len(folded):]
+            state["summary"] = summary
+            return json.dumps(state, ensure_ascii=False)
+        return self.backend.update(session_id, change)
+
+    def update_state(self, session_id, key, value):
+        """
+        Grava só uma chave do estado extra, relendo a sessão dentro de uma transação
+        do backend para não sobrescrever um turno salvo por outra requisição.
+        """
+        def change(payload):
+            state = json.loads(payload)
+            state[key] = value
+            return json.dumps(state, ensure_ascii=False)
+        return self.backend.update(session_id, change)
+
+    def pop(self, session_id):
+        """Remove a sessão. Retorna True se ela existia."""
+        existed = self.backend.delete(session_id)
+        if existed:
+            self._count("removed")
+        return existed
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        try:
+            stats["live_sessions"], stats["approx_bytes"] = self.backend.count_and_bytes()
+        except Exception as e:
+            stats["backend_error"] = str(e)
+        stats["backend"] = type(self.backend).__name__
+        if self.compactor:
+            stats["compaction"] = self.compactor.get_stats()
+        return stats
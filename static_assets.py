@@ -0,0 +1,338 @@
+"""
+Arquivos estáticos com nome por hash, pré-comprimidos e cache imutável.
+
+O build copia o main.js, o styles.css, o favicon e os arquivos de assets/
+para dist/static/ com o hash do conteúdo no nome (main.3f2a9c1b7e.js), gera as
+variantes .gz e .br dos arquivos de texto e reescreve as referências no
+index.html (e no main.js) para os nomes com hash. Um manifest.json liga o nome
+original ao nome com hash e às variantes comprimidas.
+
+Como o nome muda junto com o conteúdo, o navegador pode guardar esses
+arquivos para sempre (Cache-Control: immutable) e uma recarga do totem não
+refaz nenhuma requisição por eles; o index.html é revalidado por ETag (304).
+
+Se o convert_images.py já rodou, as variantes otimizadas de assets/optimized/
+também são publicadas: as referências a uma imagem passam a apontar para a
+versão WebP na largura em que ela é exibida, o vídeo ganha a versão
+recodificada e um poster, e quem aceita AVIF (cabeçalho Accept) recebe a
+variante AVIF no lugar da WebP.
+
+O app refaz o build na inicialização se alguma fonte mudou desde o último.
+Uso avulso: python static_assets.py
+"""
+import os
+import re
+import json
+import gzip
+import hashlib
+import tempfile
+import mimetypes
+import threading
+
+try:
+    import brotli
+except ImportError:  # o build continua, só sem as variantes .br
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DIST_DIR = os.path.join(BASE_DIR, "dist")
+URL_PREFIX = "/dist/"
+
+# O mimetypes do Python 3.11 ainda não conhece o AVIF
+mimetypes.add_type("image/avif", ".avif")
+
+# Arquivos de entrada, relativos à raiz do projeto (além de tudo que está em assets/)
+ENTRY_FILES = ["main.js", "styles.css", "favicon-32x32.png"]
+PAGE = "index.html"
+
+TEXT_EXTENSIONS = {".js", ".css", ".html", ".svg", ".json", ".txt"}
+# Só os arquivos de texto ganham variantes comprimidas; imagens/vídeo já são comprimidos
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+# Manifest gerado pelo convert_images.py e largura (px) escolhida para as imagens:
+# o avatar aparece com até 20rem (320 px CSS), 640 px cobre telas 2x
+OPTIMIZED_MANIFEST = "assets/optimized/manifest.json"
+DISPLAY_WIDTH = 640
+# Delimitadores de uma referência: "main.js", './assets/avatar.webp', url(assets/x.png)
+DELIMITERS = [('"', '"'), ("'", "'"), ("(", ")")]
+UNSAFE_NAME = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def source_files(base_dir=BASE_DIR):
+    """Caminhos lógicos (relativos à raiz) de todos os arquivos publicados."""
+    files = [name for name in ENTRY_FILES if os.path.exists(os.path.join(base_dir, name))]
+    assets_dir = os.path.join(base_dir, "assets")
+    if os.path.isdir(assets_dir):
+        files += sorted(
+            f"assets/{entry.name}" for entry in os.scandir(assets_dir)
+            if entry.is_file() and not entry.name.startswith(".")
+        )
+    return files
+
+
+def load_optimized(base_dir=BASE_DIR):
+    """Manifest do convert_images.py ({} se ainda não rodou), só com as entradas cujos arquivos existem."""
+    try:
+        with open(os.path.join(base_dir, OPTIMIZED_MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    optimized = {}
+    for logical_path, entry in manifest.items():
+        outputs = entry.get("variants", []) + ([entry["poster"]] if entry.get("poster") else [])
+        if os.path.exists(os.path.join(base_dir, logical_path)) and \
+                all(os.path.exists(os.path.join(base_dir, output["path"])) for output in outputs):
+            optimized[logical_path] = entry
+    return optimized
+
+
+def preferred_variant(entry, image_format):
+    """Variante usada no lugar do original: a menor largura >= DISPLAY_WIDTH (ou a maior que houver)."""
+    variants = [variant for variant in entry["variants"] if variant["format"] == image_format]
+    if not variants:
+        return None
+    wide_enough = [variant for variant in variants if variant.get("width", DISPLAY_WIDTH) >= DISPLAY_WIDTH]
+    if wide_enough:
+        return min(wide_enough, key=lambda variant: variant.get("width", 0))["path"]
+    return max(variants, key=lambda variant: variant.get("width", 0))["path"]
+
+
+def substitutions(optimized):
+    """
+    Retorna (original -> variante que o substitui nas referências,
+    variante WebP -> variante AVIF da mesma largura, vídeo -> poster).
+    """
+    replaced, alternates, posters = {}, {}, {}
+    for logical_path, entry in optimized.items():
+        if entry["type"] == "image":
+            webp = preferred_variant(entry, "webp")
+            if webp:
+                replaced[logical_path] = webp
+            for variant in entry["variants"]:
+                if variant["format"] == "avif":
+                    alternates[variant["path"].rsplit(".", 1)[0] + ".webp"] = variant["path"]
+        else:
+            video = preferred_variant(entry, "mp4")
+            if video:
+                replaced[logical_path] = video
+            if entry.get("poster"):
+                posters[logical_path] = entry["poster"]["path"]
+    return replaced, alternates, posters
+
+
+def add_posters(page, posters, urls):
+    """Coloca poster="..." nas tags <video> (sem poster) que tocam um dos vídeos otimizados."""
+    for logical_path, poster in posters.items():
+        video_url = urls.get(logical_path)
+        if not video_url or poster not in urls:
+            continue
+        pattern = re.compile(r'<video\b(?![^>]*\bposter=)([^>]*>(?:(?!</video>).)*?src="'
+                             + re.escape(video_url) + '")', re.DOTALL)
+        page = pattern.sub(lambda match: f'<video poster="{urls[poster]}"{match.group(1)}', page)
+    return page
+
+
+def hashed_name(logical_path, data):
+    """assets/LIA - Splash.mp4 -> LIA-Splash.1a2b3c4d5e.mp4"""
+    stem, extension = os.path.splitext(os.path.basename(logical_path))
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    safe_stem = re.sub(r"-{2,}", "-", UNSAFE_NAME.sub("-", stem)).strip("-")
+    return f"{safe_stem}.{digest}{extension}"
+
+
+def rewrite_references(text, urls):
+    """Troca as referências exatas (entre aspas ou parênteses) a arquivos publicados pelas URLs com hash."""
+    for logical_path, url in urls.items():
+        for opening, closing in DELIMITERS:
+            for prefix in ("./", "/", ""):
+                text = text.replace(f"{opening}{prefix}{logical_path}{closing}", f"{opening}{url}{closing}")
+    return text
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _sources_fingerprint(base_dir, files):
+    digest = hashlib.sha256()
+    for name in files + [PAGE, OPTIMIZED_MANIFEST]:
+        path = os.path.join(base_dir, name)
+        if name == OPTIMIZED_MANIFEST and not os.path.exists(path):
+            continue
+        stat = os.stat(path)
+        digest.update(f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8"))
+    digest.update(f"brotli={bool(brotli)}".encode("ascii"))
+    return digest.hexdigest()
+
+
+def build(base_dir=BASE_DIR, dist_dir=DIST_DIR):
+    """Gera dist/ (arquivos com hash, variantes comprimidas, index.html reescrito e manifest.json)."""
+    static_dir = os.path.join(dist_dir, "static")
+    os.makedirs(static_dir, exist_ok=True)
+    optimized = load_optimized(base_dir)
+    replaced, alternates, posters = substitutions(optimized)
+    files = source_files(base_dir)
+    files += [output["path"] for entry in optimized.values()
+              for output in entry["variants"] + ([entry["poster"]] if entry.get("poster") else [])]
+    # Binários primeiro: os arquivos de texto (main.js, css) apontam para eles
+    files.sort(key=lambda name: os.path.splitext(name)[1] in TEXT_EXTENSIONS)
+
+    manifest = {"files": {}, "fingerprint": _sources_fingerprint(base_dir, source_files(base_dir))}
+    urls = {}
+
+    def references():
+        # Nas referências, cada original otimizado aponta para a variante que o substitui
+        return {**urls, **{original: urls[variant] for original, variant in replaced.items() if variant in urls}}
+
+    bytes_in = bytes_out = 0
+    for logical_path in files:
+        with open(os.path.join(base_dir, logical_path), "rb") as f:
+            data = f.read()
+        extension = os.path.splitext(logical_path)[1].lower()
+        if extension in TEXT_EXTENSIONS:
+            data = rewrite_references(data.decode("utf-8"), references()).encode("utf-8")
+        name = hashed_name(logical_path, data)
+        path = os.path.join(static_dir, name)
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+
+        entry = {"name": name, "size": len(data), "encodings": {}}
+        if extension in TEXT_EXTENSIONS:
+            for encoding, suffix in ENCODINGS:
+                if encoding == "br" and brotli is None:
+                    continue
+                compressed = compress(data, encoding)
+                if len(compressed) < len(data):
+                    if not os.path.exists(path + suffix):
+                        _write_atomic(path + suffix, compressed)
+                    entry["encodings"][encoding] = {"name": name + suffix, "size": len(compressed)}
+        manifest["files"][logical_path] = entry
+        urls[logical_path] = URL_PREFIX + name
+        if logical_path not in replaced and not logical_path.startswith("assets/optimized/"):
+            bytes_in += len(data)
+            bytes_out += min([len(data)] + [variant["size"] for variant in entry["encodings"].values()])
+
+    # Tamanho servido das imagens/vídeos otimizados: o da variante que substitui o original
+    for original, variant in replaced.items():
+        bytes_in += manifest["files"][original]["size"]
+        bytes_out += manifest["files"][variant]["size"]
+    for webp, avif in alternates.items():
+        if webp in manifest["files"] and avif in manifest["files"]:
+            manifest["files"][webp]["alternates"] = {"image/avif": manifest["files"][avif]["name"]}
+
+    with open(os.path.join(base_dir, PAGE), "r", encoding="utf-8") as f:
+        page = rewrite_references(f.read(), references())
+    page = add_posters(page, posters, references())
+    _write_atomic(os.path.join(dist_dir, PAGE), page.encode("utf-8"))
+    _write_atomic(os.path.join(dist_dir, "manifest.json"),
+                  json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    if brotli is None:
+        print("⚠️ Módulo brotli não instalado: só variantes gzip foram geradas.")
+    if optimized:
+        print(f"🖼️ {len(replaced)} imagem(ns)/vídeo(s) trocados pelas variantes de assets/optimized/.")
+    print(f"📦 {len(files)} arquivo(s) estático(s) publicados em {dist_dir} "
+          f"({bytes_in / 1024:.0f} KB → {bytes_out / 1024:.0f} KB com compressão e otimização).")
+    return manifest
+
+
+def accepted_encodings(header):
+    """Codificações aceitas no Accept-Encoding (q > 0)."""
+    accepted = set()
+    for item in (header or "").split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.lower())
+    if "*" in accepted:
+        accepted.update(encoding for encoding, _ in ENCODINGS)
+    return accepted
+
+
+class StaticAssets:
+    """Manifest carregado em memória e escolha da variante (br, gzip ou original) por requisição."""
+
+    def __init__(self, base_dir=BASE_DIR, dist_dir=DIST_DIR):
+        self.base_dir = base_dir
+        self.dist_dir = dist_dir
+        self._by_name = {}  # nome com hash -> entrada do manifest
+        self._lock = threading.Lock()
+        self.stats = {"builds": 0, "served": 0, "served_br": 0, "served_gzip": 0, "served_avif": 0,
+                      "not_found": 0}
+
+    @property
+    def ready(self):
+        return bool(self._by_name) and os.path.exists(os.path.join(self.dist_dir, PAGE))
+
+    def load_or_build(self):
+        """Usa o dist/ existente se as fontes não mudaram; senão refaz o build."""
+        manifest_path = os.path.join(self.dist_dir, "manifest.json")
+        manifest = None
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("fingerprint") != _sources_fingerprint(self.base_dir, source_files(self.base_dir)):
+                manifest = None
+        except (OSError, ValueError):
+            manifest = None
+        if manifest is None:
+            manifest = build(self.base_dir, self.dist_dir)
+            with self._lock:
+                self.stats["builds"] += 1
+        with self._lock:
+            self._by_name = {entry["name"]: entry for entry in manifest["files"].values()}
+
+    def page_path(self):
+        return os.path.join(self.dist_dir, PAGE)
+
+    def resolve(self, name, accept_encoding, accept=None):
+        """
+        Retorna (caminho do arquivo, codificação ou None, nome do arquivo servido) para o
+        nome com hash pedido, escolhendo a melhor variante aceita pelo cliente (AVIF no
+        lugar da WebP se o Accept permitir; br/gzip nos textos); None se não existir.
+        """
+        with self._lock:
+            entry = self._by_name.get(name)
+            if entry is None:
+                self.stats["not_found"] += 1
+                return None
+            avif = entry.get("alternates", {}).get("image/avif")
+            if avif and "image/avif" in (accept or ""):
+                self.stats["served"] += 1
+                self.stats["served_avif"] += 1
+                return os.path.join(self.dist_dir, "static", avif), None, avif
+            accepted = accepted_encodings(accept_encoding)
+            for encoding, _ in ENCODINGS:
+                variant = entry["encodings"].get(encoding)
+                if variant and encoding in accepted:
+                    self.stats["served"] += 1
+                    self.stats[f"served_{encoding}"] += 1
+                    return os.path.join(self.dist_dir, "static", variant["name"]), encoding, name
+            self.stats["served"] += 1
+            return os.path.join(self.dist_dir, "static", name), None, name
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "files": len(self._by_name), "brotli": brotli is not None}
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,142 @@
+"""
+Reserva de sugestões de tópico para o /suggest-topic.
+
+Em vez de uma chamada ao LLM por clique, as sugestões são geradas em lote
+por uma thread em segundo plano e guardadas em memória, sem repetidas. Quando
+a reserva cai abaixo do nível mínimo, um novo lote é pedido. As sugestões já
+mostradas entram num rodízio: só voltam depois que as outras passaram.
+"""
+import re
+import json
+import threading
+from collections import deque
+
+from semantic_cache import normalize_question
+
+LIST_ITEM = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def parse_suggestions(text):
+    """Lista de sugestões a partir da saída do modelo (JSON ou uma por linha)."""
+    try:
+        data = json.loads(text)
+        if isinstance(data, list):
+            return [str(item).strip() for item in data if str(item).strip()]
+    except (json.JSONDecodeError, TypeError):
+        pass
+    lines = (LIST_ITEM.sub("", line).strip().strip('"') for line in (text or "").splitlines())
+    return [line for line in lines if line and line not in ("[", "]")]
+
+
+class SuggestionPool:
+    """Reserva deduplicada com reposição em segundo plano abaixo do nível mínimo."""
+
+    def __init__(self, generate_batch, executor, low_water=5, max_size=30, recent_size=20, cold_wait=30.0):
+        self.generate_batch = generate_batch
+        self.executor = executor
+        self.low_water = low_water
+        self.max_size = max_size
+        self.cold_wait = cold_wait
+        self._fresh = deque()                     # ainda não mostradas
+        self._served = deque(maxlen=recent_size)  # já mostradas, em ordem (rodízio)
+        self._seen = set()                        # formas normalizadas de tudo que está no pool
+        self._refilling = False                   # só quem o ligou (_claim_refill) desliga
+        self._lock = threading.Lock()
+        self._refill_done = threading.Condition(self._lock)
+        self.stats = {"served": 0, "served_recycled": 0, "generated": 0, "duplicates": 0,
+                      "refills": 0, "refill_errors": 0, "cold_misses": 0}
+
+    def _add(self, suggestions):
+        added = 0
+        with self._lock:
+            for suggestion in suggestions:
+                key = normalize_question(suggestion)
+                if not key or key in self._seen:
+                    self.stats["duplicates"] += 1
+                    continue
+                if len(self._fresh) >= self.max_size:
+                    break
+                self._fresh.append(suggestion)
+                self._seen.add(key)
+                added += 1
+            self.stats["generated"] += added
+        return added
+
+    def _claim_refill(self, min_fresh):
+        """Liga _refilling se ninguém está repondo e há menos de min_fresh inéditas."""
+        with self._lock:
+            if self._refilling or len(self._fresh) >= min_fresh:
+                return False
+            self._refilling = True
+            return True
+
+    def _refill(self):
+        """Gera um lote. Só roda depois de _claim_refill ter dado True (e desliga o flag)."""
+        try:
+            added = self._add(self.generate_batch())
+            print(f"💡 Reserva de sugestões reposta: +{added}.")
+            with self._lock:
+                self.stats["refills"] += 1
+        except Exception as e:
+            with self._lock:
+                self.stats["refill_errors"] += 1
+            print(f"⚠️ Erro ao repor a reserva de sugestões: {e}")
+        finally:
+            with self._lock:
+                self._refilling = False
+                self._refill_done.notify_all()
+
+    def maybe_refill(self):
+        """Pede um novo lote em segundo plano se a reserva estiver abaixo do mínimo."""
+        if not self._claim_refill(self.low_water):
+            return False
+        try:
+            self.executor.submit(self._refill)
+        except Exception:
+            with self._lock:
+                self._refilling = False
+            raise
+        return True
+
+    def get(self):
+        """
+        Próxima sugestão, da memória. Se as inéditas acabaram, volta a mais antiga
+        já mostrada; só com a reserva vazia de tudo gera na hora (partida a frio),
+        ou espera o lote que já está sendo gerado.
+        """
+        with self._lock:
+            if self._fresh:
+                suggestion = self._fresh.popleft()
+                self.stats["served"] += 1
+            elif self._served:
+                suggestion = self._served.popleft()
+                self.stats["served_recycled"] += 1
+            else:
+                suggestion = None
+            if suggestion is not None:
+                if len(self._served) == self._served.maxlen:
+                    # A mais antiga sai do rodízio e pode voltar a ser gerada
+                    self._seen.discard(normalize_question(self._served[0]))
+                self._served.append(suggestion)
+
+        if suggestion is None:
+            with self._lock:
+                self.stats["cold_misses"] += 1
+            if self._claim_refill(1):
+                self._refill()
+            else:
+                # Já há um lote a caminho (em segundo plano): espera por ele em vez de pedir outro
+                with self._lock:
+                    self._refill_done.wait_for(lambda: not self._refilling, timeout=self.cold_wait)
+            with self._lock:
+                suggestion = self._fresh.popleft() if self._fresh else None
+                if suggestion is not None:
+                    self._served.append(suggestion)
+                    self.stats["served"] += 1
+        self.maybe_refill()
+        return suggestion
+
+    def get_stats(self):
+        with self._lock:
+            return {**self.stats, "fresh": len(self._fresh), "served_rotation": len(self._served),
+                    "refilling": self._refilling}
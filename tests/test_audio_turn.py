@@ -0,0 +1,35 @@
+import pytest
+
+from audio_turn import AUDIO_TURN_FALLBACK_REPLY, parse_audio_turn
+
+
+def test_parses_strict_json():
+    assert parse_audio_turn('{"transcricao": "oi", "resposta": "Olá!"}') == ("oi", "Olá!")
+
+
+def test_parses_fenced_json():
+    assert parse_audio_turn('```json\n{"transcricao": "oi", "resposta": "Olá!"}\n```') == ("oi", "Olá!")
+
+
+def test_recovers_fields_from_truncated_json():
+    assert parse_audio_turn('{"transcricao": "oi", "resposta": "Olá, tudo b') == ("oi", "Olá, tudo b")
+
+
+def test_plain_text_becomes_the_reply():
+    assert parse_audio_turn("Olá! Como posso ajudar?") == (None, "Olá! Como posso ajudar?")
+
+
+@pytest.mark.parametrize("output", [
+    '{"transcricao": "onde fica a cantina?"}',
+    '{"transcricao": "oi", "resposta": ""}',
+    '{"transcricao": "oi", "resposta": {"texto": "Olá"}}',
+    '["Olá"]',
+    "",
+])
+def test_json_without_reply_never_leaks(output):
+    _, reply = parse_audio_turn(output)
+    assert reply == AUDIO_TURN_FALLBACK_REPLY
+
+
+def test_keeps_the_transcript_when_the_reply_is_missing():
+    assert parse_audio_turn('{"transcricao": "onde fica a cantina?"}')[0] == "onde fica a cantina?"
@@ -0,0 +1,113 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytz
+
+from cache_warmer import CacheWarmer, parse_logged_question, top_questions
+
+TZ = pytz.timezone("America/Sao_Paulo")
+NOW = datetime.now(TZ)
+
+
+def row(question, reply="resposta", hours_ago=1, instruction_hash="v1"):
+    return (question, reply, NOW - timedelta(hours=hours_ago), instruction_hash)
+
+
+def test_parse_logged_question():
+    assert parse_logged_question("[PRESET ROTEADO]: onde fica a cantina?") == ("onde fica a cantina?", True)
+    assert parse_logged_question("[ÁUDIO ENVIADO]: onde fica a sala 307?") == ("onde fica a sala 307?", False)
+    assert parse_logged_question("onde fica a sala 307?") == ("onde fica a sala 307?", False)
+
+
+def test_top_questions_skips_presets_and_follow_ups():
+    rows = [
+        row("Onde fica a sala 307?"), row("onde fica a sala 307?"), row("onde fica a sala 307?"),
+        row("[PRESET ROTEADO]: onde posso comer?"), row("[PRESET ROTEADO]: onde posso comer?"),
+        row("e onde fica isso?"), row("e onde fica isso?"),
+        row("Quem organiza o evento?", reply="A FECAP.", instruction_hash="v2"),
+    ]
+    selected = top_questions(rows, top_n=5)
+    assert [item["normalized"] for item in selected] == ["onde fica a sala 307", "quem organiza o evento"]
+    assert selected[0]["question"] == "onde fica a sala 307?"
+    assert selected[0]["count"] == 3
+    assert selected[1]["reply"] == "A FECAP."
+    assert selected[1]["reply_hash"] == "v2"
+
+
+def make_warmer(rows, published, calls, current_hash="v1", exclusive=None):
+    @contextmanager
+    def no_lock():
+        yield True
+
+    stored = {}
+    warmer = CacheWarmer(
+        fetch_rows=lambda days: rows,
+        answer=lambda question: calls.append(question) or f"nova: {question}",
+        store_answer=stored.__setitem__,
+        warm_audio=lambda reply: False,
+        is_preset=lambda question: False,
+        is_busy=lambda: False,
+        instruction_hash=lambda: current_hash,
+        exclusive=exclusive or no_lock,
+        load_answers=lambda instruction_hash: dict(published.get(instruction_hash, {})),
+        publish_answer=lambda instruction_hash, normalized, reply:
+            published.setdefault(instruction_hash, {}).__setitem__(normalized, reply),
+        timezone=TZ,
+        item_interval=0,
+        retry_interval=3600,
+    )
+    return warmer, stored
+
+
+def test_reuses_only_replies_from_the_same_instructions():
+    rows = [row("Onde fica a sala 307?", reply="No 3º andar.", instruction_hash="v1"),
+            row("Quem organiza o evento?", reply="Antiga.", instruction_hash="v0")]
+    published, calls = {}, []
+    warmer, stored = make_warmer(rows, published, calls)
+    warmer.run()
+    assert stored["Onde fica a sala 307?"] == "No 3º andar."
+    assert stored["Quem organiza o evento?"] == "nova: Quem organiza o evento?"
+    assert calls == ["Quem organiza o evento?"]
+    assert published == {"v1": {"quem organiza o evento": "nova: Quem organiza o evento?"}}
+    stats = warmer.get_stats()
+    assert (stats["reused_replies"], stats["generated_replies"], stats["shared_replies"]) == (1, 1, 0)
+
+
+def test_second_process_copies_published_answers_without_calling_the_model():
+    rows = [row("Quem organiza o evento?", reply=None)]
+    published, calls = {}, []
+    lock = threading.Lock()
+
+    @contextmanager
+    def exclusive():
+        acquired = lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+
+    first, _ = make_warmer(rows, published, calls, exclusive=exclusive)
+    second, stored = make_warmer(rows, published, calls, exclusive=exclusive)
+    first.run()
+    second.run()
+    assert calls == ["Quem organiza o evento?"]
+    assert stored["Quem organiza o evento?"] == "nova: Quem organiza o evento?"
+    assert second.get_stats()["shared_replies"] == 1
+
+
+def test_skips_when_another_process_is_warming():
+    rows = [row("Quem organiza o evento?", reply=None)]
+    calls = []
+
+    @contextmanager
+    def taken():
+        yield False
+
+    warmer, stored = make_warmer(rows, {}, calls, exclusive=taken)
+    warmer.run()
+    assert calls == [] and stored == {}
+    stats = warmer.get_stats()
+    assert stats["skipped_not_leader"] == 1
+    assert stats["runs"] == 0
@@ -0,0 +1,77 @@
+import pytest
+
+from event_info import EVENT_INFO
+from intent_router import IntentRouter
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(EVENT_INFO)
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("O que é a LIA?", "O que é a LIA?"),
+    ("o que e a lia", "O que é a LIA?"),
+    ("quem criou a lia?", "O que é a LIA?"),
+    ("onde estão os projetos de marketing?", "E os trabalhos de Marketing, onde estão?"),
+    ("Onde ficam os trabalhos de mkt?", "E os trabalhos de Marketing, onde estão?"),
+    ("onde ver os projetos de ciencia de dados", "Onde posso ver os projetos de Ciência de Dados para Negócios?"),
+    ("projetos de GNI", "Onde encontro os projetos de GNI?"),
+    ("onde posso comer?", "Onde encontro comidas e doces?"),
+    ("tem lanche?", "Onde encontro comidas e doces?"),
+    ("quais empresas estão expondo?", "Quais empresas estão no evento?"),
+])
+def test_routes_preset_questions(router, question, expected):
+    intent, score, _ = router.route(question)
+    assert intent == expected
+    assert score >= router.min_score
+
+
+@pytest.mark.parametrize("question", [
+    # Palavras que o preset não explica
+    "lia, quem é o diretor?",
+    "tem comida vegana?",
+    "a comida é gratis?",
+    "quais empresas de drone estão no evento?",
+    "onde fica a Cantina das Bentas?",
+    # Negação
+    "não quero comida",
+    "nao tem projetos de marketing?",
+    # Vazia ou longa demais
+    "",
+    "eu queria saber onde ficam os projetos de marketing e também onde fica a comida e as empresas",
+])
+def test_does_not_route(router, question):
+    intent, score, _ = router.route(question)
+    assert intent is None
+    assert score == 0.0
+
+
+@pytest.mark.parametrize("question", [
+    # Só palavras genéricas ("onde", "ver", "sala") no lugar de um dos grupos
+    "onde ficam os dados?",
+    "onde ver marketing?",
+    "qual a sala do gni?",
+])
+def test_generic_words_do_not_complete_a_preset(router, question):
+    assert router.route(question)[0] is None
+
+
+def test_typo_still_routes(router):
+    intent, _, _ = router.route("onde estao os projetos de marketng?")
+    assert intent == "E os trabalhos de Marketing, onde estão?"
+
+
+def test_stats_count_routed_and_not_routed(router):
+    router.route("onde posso comer?")
+    router.route("tem comida vegana?")
+    stats = router.get_stats()
+    assert stats["routed"] == 1
+    assert stats["not_routed"] == 1
+
+
+def test_classify_does_not_count(router):
+    assert router.classify("onde posso comer?")[0] == "Onde encontro comidas e doces?"
+    stats = router.get_stats()
+    assert stats["routed"] == 0
+    assert stats["not_routed"] == 0
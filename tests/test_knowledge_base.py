@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from knowledge_base import KnowledgeBase, split_instruction, tokenize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+INSTRUCTION = """Você é LIA, a assistente virtual do evento.
+
+--- REGRAS GERAIS ---
+- Seja breve.
+
+--- INFORMAÇÕES DE CONTEXTO ---
+
+## Visão Geral sobre o Metaday
+O Meta Day é um evento gratuito com projetos dos alunos.
+
+## MAPA
+
+### SEGUNDO ANDAR
+* **MKT 1º Sem (Manhã):** Salas 209 e 206.
+* **GNI 3º Sem (Noite):** Sala 207.
+
+### TERCEIRO ANDAR
+* **CDN 2º Sem (Tarde):** Sala 307.
+
+## ALIMENTAÇÃO
+* **ZAP Burger:** hambúrgueres artesanais.
+* **Sorveteria Cris Bom:** sorvetes e picolés.
+"""
+
+
+@pytest.fixture
+def knowledge_base():
+    return KnowledgeBase(INSTRUCTION, top_k=2)
+
+
+def test_tokenize_drops_stopwords_and_expands_aliases():
+    assert tokenize("Onde ficam os projetos de MKT?") == ["projeto", "mkt", "marketi"]
+    assert tokenize("onde fica", drop_noise=False) == ["onde", "fica"]
+
+
+def test_split_keeps_rules_in_the_core():
+    core, chunks = split_instruction(INSTRUCTION)
+    assert "Seja breve." in core
+    assert "Sala 307" not in core
+    assert any(chunk["pinned"] for chunk in chunks)
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("onde fica o CDN?", "Sala 307"),
+    ("onde fica o marketing?", "Salas 209 e 206"),
+    ("tem sorvete?", "Sorveteria Cris Bom"),
+])
+def test_search_finds_the_relevant_chunk(knowledge_base, question, expected):
+    hits = knowledge_base.search(question)
+    assert hits
+    assert expected in knowledge_base.chunks[hits[0][0]]["text"]
+
+
+def test_build_instruction_sends_core_pinned_and_relevant_chunks_only(knowledge_base):
+    instruction = knowledge_base.build_instruction("tem sorvete?")
+    assert "Seja breve." in instruction
+    assert "evento gratuito" in instruction   # visão geral fixa
+    assert "Sorveteria Cris Bom" in instruction
+    assert "Sala 207" not in instruction
+    assert knowledge_base.get_stats()["queries"] == 1
+
+
+def test_load_rebuilds_the_index(knowledge_base):
+    knowledge_base.load(INSTRUCTION.replace("Sala 307", "Sala 401"))
+    hits = knowledge_base.search("onde fica o CDN?")
+    assert "Sala 401" in knowledge_base.chunks[hits[0][0]]["text"]
+    assert knowledge_base.get_stats()["rebuilds"] == 2
+
+
+def test_real_instructions_answer_room_questions():
+    with open(os.path.join(ROOT, "system_instruction.txt"), encoding="utf-8") as f:
+        knowledge_base = KnowledgeBase(f.read())
+    assert "Sala 307" in knowledge_base.build_instruction("onde ficam os projetos de ciência de dados?")
@@ -0,0 +1,27 @@
+from knowledge_compiler import compact_markdown
+
+
+def test_drops_repeated_lines_within_a_section():
+    text = "## Oficina A\nHorário: 10h00\nHorário: 10h00\n"
+    assert compact_markdown(text).count("Horário: 10h00") == 1
+
+
+def test_keeps_repeated_lines_in_different_sections():
+    text = "## Oficina A\nHorário: 10h00\n\n## Oficina B\nHorário: 10h00\n"
+    assert compact_markdown(text).count("Horário: 10h00") == 2
+
+
+def test_keeps_repeated_lines_across_separators():
+    text = "Oficina A\nHorário: 10h00\n---\nOficina B\nHorário: 10h00\n"
+    assert compact_markdown(text).count("Horário: 10h00") == 2
+
+
+def test_keeps_repeated_rows_in_different_tables():
+    table = "| Sala | Horário |\n|---|---|\n| 101 | 10h00 |\n"
+    text = f"Oficinas da manhã\n{table}\nOficinas da tarde\n{table}"
+    assert compact_markdown(text).count("- Sala: 101; Horário: 10h00") == 2
+
+
+def test_flattens_tables_into_column_value_lines():
+    text = "| Sala | Horário |\n|---|---|\n| 101 | 10h00 |\n| 102 | |\n"
+    assert compact_markdown(text) == "- Sala: 101; Horário: 10h00\n- Sala: 102\n"
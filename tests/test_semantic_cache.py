@@ -0,0 +1,76 @@
+import pytest
+
+from semantic_cache import SemanticAnswerCache, is_self_contained, normalize_question
+
+REPLY = "A sala 307 fica no 3º andar."
+
+
+@pytest.fixture
+def cache():
+    cache = SemanticAnswerCache(threshold=0.8, max_entries=3)
+    cache.store("Onde fica a sala 307?", REPLY)
+    return cache
+
+
+def test_normalize_question():
+    assert normalize_question("  Onde  É a Sala 307?! ") == "onde e a sala 307"
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("onde fica a sala 307?", True),
+    ("quais empresas estão no evento?", True),
+    ("e onde fica?", False),
+    ("quem é ele?", False),
+    ("o que não é permitido?", False),
+    ("tem comida sem glúten?", False),
+    ("", False),
+])
+def test_is_self_contained(question, expected):
+    assert is_self_contained(question) is expected
+
+
+@pytest.mark.parametrize("question", [
+    "onde fica a sala 307",
+    "A sala 307 fica onde?",
+])
+def test_similar_question_hits(cache, question):
+    entry, score = cache.lookup(question)
+    assert entry is not None
+    assert entry["reply"] == REPLY
+    assert score >= cache.threshold
+
+
+@pytest.mark.parametrize("question", [
+    "onde fica a sala 308?",        # número diferente
+    "onde não fica a sala 307?",    # negação
+    "e a sala 307?",                # continuação da conversa
+    "quais empresas estão no evento?",
+])
+def test_different_question_misses(cache, question):
+    entry, _ = cache.lookup(question)
+    assert entry is None
+
+
+def test_store_refuses_follow_ups_and_short_questions():
+    cache = SemanticAnswerCache()
+    cache.store("e onde fica isso?", "no térreo")
+    cache.store("oi", "olá")
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_evicts_least_recently_used(cache):
+    cache.store("Onde encontro comidas e doces?", "No térreo.")
+    cache.store("Quais empresas estão no evento?", "Várias.")
+    cache.lookup("onde fica a sala 307")  # a da sala 307 passa a ser a mais recente
+    cache.store("Onde ficam os projetos de marketing?", "No 2º andar.")
+    assert cache.lookup("onde fica a sala 307")[0] is not None
+    assert cache.lookup("onde encontro comidas e doces")[0] is None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_invalidate_empties_the_cache(cache):
+    cache.invalidate()
+    assert cache.lookup("onde fica a sala 307")[0] is None
+    stats = cache.get_stats()
+    assert stats["entries"] == 0
+    assert stats["invalidations"] == 1
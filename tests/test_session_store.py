@@ -0,0 +1,116 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from session_store import SessionStore, MemoryBackend, SQLiteBackend, trim_history
+
+
+def content(role, text):
+    return SimpleNamespace(role=role, parts=[SimpleNamespace(text=text, inline_data=None)])
+
+
+class FakeChat:
+    """Imita a ChatSession: guarda o histórico no formato protos (role + parts)."""
+
+    def __init__(self, history):
+        self.history = [content(m["role"], m["parts"][0]["text"]) for m in history]
+
+    def send(self, question, answer):
+        self.history += [content("user", question), content("model", answer)]
+
+
+def message(role, text):
+    return {"role": role, "parts": [{"text": text}]}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    backend = MemoryBackend() if request.param == "memory" else SQLiteBackend(str(tmp_path / "sessions.sqlite3"))
+    return SessionStore(backend, FakeChat, max_history_messages=6, sweep_interval=3600)
+
+
+def new_session(store, session_id="s1", turns=1):
+    session = store.get_or_create(session_id)
+    for i in range(turns):
+        session.convo.send(f"pergunta {i}", f"resposta {i}")
+    store.save(session)
+    return session
+
+
+def test_trim_history_starts_on_a_user_turn():
+    history = [message("user", "1"), message("model", "1"), message("user", "2"), message("model", "2")]
+    assert trim_history(history, 4) == (history, False)
+    assert trim_history(history, 3) == (history[2:], True)
+
+
+def test_save_and_load_round_trip(store):
+    session = new_session(store)
+    session.state["profile"] = {"name": "Ana"}
+    store.save(session)
+
+    loaded = store.load("s1")
+    assert [part.parts[0].text for part in loaded.convo.history] == ["pergunta 0", "resposta 0"]
+    assert loaded.state["profile"] == {"name": "Ana"}
+    assert store.load("outra") is None
+
+
+def test_load_trims_long_history(store):
+    new_session(store, turns=5)
+    loaded = store.load("s1")
+    assert len(loaded.state["history"]) == 6
+    assert loaded.state["history"][0] == message("user", "pergunta 2")
+    assert store.get_stats()["history_trims"] == 1
+
+
+def test_update_state_keeps_a_turn_saved_by_another_request(store):
+    stale = new_session(store)
+    other = store.load("s1")
+    other.convo.send("pergunta nova", "resposta nova")
+    store.save(other)
+
+    assert store.update_state(stale.id, "suggestions", ["a", "b"])
+    state = json.loads(store.backend.load("s1"))
+    assert state["suggestions"] == ["a", "b"]
+    assert state["history"][-1] == message("model", "resposta nova")
+
+
+def test_update_state_of_missing_session(store):
+    assert store.update_state("nao-existe", "suggestions", []) is False
+
+
+def test_apply_compaction_folds_old_turns_into_the_summary(store):
+    new_session(store, turns=2)
+    folded = [message("user", "pergunta 0"), message("model", "resposta 0")]
+
+    assert store._apply_compaction("s1", folded, "- Usuário perguntou 0")
+    loaded = store.load("s1")
+    assert loaded.state["summary"] == "- Usuário perguntou 0"
+    assert loaded.state["history"] == [message("user", "pergunta 1"), message("model", "resposta 1")]
+    # O resumo volta como um par de mensagens no início, que não é salvo
+    assert loaded.prefix_len == 2
+    assert len(loaded.convo.history) == 4
+
+
+def test_apply_compaction_is_discarded_if_the_session_changed(store):
+    new_session(store, turns=2)
+    folded = [message("user", "pergunta 0"), message("model", "resposta 0")]
+    # Reiniciada enquanto o resumo era gerado
+    store.pop("s1")
+    session = store.get_or_create("s1")
+    session.convo.send("outra conversa", "outra resposta")
+    store.save(session)
+
+    assert store._apply_compaction("s1", folded, "resumo") is False
+    assert "summary" not in json.loads(store.backend.load("s1"))
+
+
+def test_pop_and_sweep(store):
+    new_session(store, "s1")
+    new_session(store, "s2")
+    assert store.pop("s1") is True
+    assert store.pop("s1") is False
+
+    store.idle_ttl = -1
+    assert store.sweep() == 1
+    assert store.load("s2") is None
@@ -0,0 +1,40 @@
+import json
+import os
+
+from tts_cache import TTSCache
+
+
+def test_workers_keep_separate_stats_and_get_stats_sums_them(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "getpid", lambda: 1001)
+    first = TTSCache(str(tmp_path))
+    first.put("Olá", "voz", "modelo", b"audio")
+    first.get("Olá", "voz", "modelo")
+
+    monkeypatch.setattr(os, "getpid", lambda: 1002)
+    second = TTSCache(str(tmp_path))
+    second.get("Tchau", "voz", "modelo")
+    second.save_stats()
+
+    monkeypatch.setattr(os, "getpid", lambda: 1001)
+    first.save_stats()
+
+    assert json.loads((tmp_path / "stats.1001.json").read_text())["memory_hits"] == 1
+    assert json.loads((tmp_path / "stats.1002.json").read_text())["misses"] == 1
+    stats = first.get_stats()
+    assert (stats["memory_hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
+    assert stats["hit_rate"] == 0.5
+
+
+def test_unsaved_counts_of_this_worker_are_included(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "getpid", lambda: 1001)
+    (tmp_path / "stats.json").write_text(json.dumps({"misses": 3}))
+    cache = TTSCache(str(tmp_path))
+    cache.get("Olá", "voz", "modelo")
+    assert cache.get_stats()["misses"] == 4
+
+
+def test_restarted_worker_with_the_same_pid_continues_its_counts(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "getpid", lambda: 1001)
+    (tmp_path / "stats.1001.json").write_text(json.dumps({"misses": 2}))
+    cache = TTSCache(str(tmp_path))
+    assert cache.get_stats()["misses"] == 2
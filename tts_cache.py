@@ -0,0 +1,230 @@
+"""
+Cache de áudio TTS em dois níveis: memória (LRU limitado por bytes) e disco.
+
+A chave é um hash do texto normalizado + voz + modelo, então a mesma frase
+sintetizada com a mesma voz nunca passa pela API Gemini duas vezes, mesmo
+depois de reiniciar o servidor. Passando do limite de espaço em disco, os
+áudios menos usados são apagados (como no AudioStore).
+
+Uma consulta pode procurar várias variantes do mesmo texto (o áudio já
+comprimido e o PCM cru): ela conta como um único acerto ou erro.
+
+Cada worker do gunicorn grava os seus contadores em stats.<pid>.json (nenhum
+sobrescreve o do outro) e get_stats soma os arquivos de todos.
+"""
+import os
+import re
+import glob
+import json
+import hashlib
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_tts_text(text):
+    """Normaliza o texto para a chave do cache (Unicode NFC e espaços colapsados)."""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class TTSCache:
+    """Cache LRU em memória com orçamento de bytes, apoiado por um diretório em disco."""
+
+    # Os contadores vão para o disco a cada tantas consultas (e no desligamento, via save_stats)
+    STATS_SAVE_EVERY = 20
+
+    def __init__(self, cache_dir, max_memory_bytes=32 * 1024 * 1024, max_disk_bytes=512 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "pruned": 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        # PID reaproveitado depois de um reinício: continua a contagem daquele arquivo
+        self.stats.update(self._read_stats_file(self._stats_path()))
+        self._disk_bytes = sum(entry.stat().st_size for entry in self._disk_entries())
+
+    def _stats_path(self):
+        """Arquivo de contadores deste processo (um por worker do gunicorn)."""
+        return os.path.join(self.cache_dir, f"stats.{os.getpid()}.json")
+
+    @staticmethod
+    def _read_stats_file(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {name: value for name, value in data.items() if isinstance(value, int)}
+
+    @staticmethod
+    def make_key(text, voice, model):
+        raw = "\x1f".join([normalize_tts_text(text), voice, model])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.bin")
+
+    def _disk_entries(self):
+        for shard in os.scandir(self.cache_dir):
+            if shard.is_dir():
+                yield from (entry for entry in os.scandir(shard.path) if entry.name.endswith(".bin"))
+
+    def _remember(self, key, audio_bytes):
+        """Insere no LRU de memória, despejando os itens mais antigos se passar do orçamento."""
+        if len(audio_bytes) > self.max_memory_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = audio_bytes
+        self._memory_bytes += len(audio_bytes)
+        while self._memory_bytes > self.max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _read(self, key):
+        """(bytes, nível) de uma chave, sem mexer nos contadores; (None, None) se não estiver em cache."""
+        with self._lock:
+            audio_bytes = self._memory.get(key)
+            if audio_bytes is not None:
+                self._memory.move_to_end(key)
+                return audio_bytes, "memory"
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                audio_bytes = f.read()
+        except FileNotFoundError:
+            return None, None
+        if not audio_bytes:
+            return None, None
+        try:
+            # Marca como usado recentemente (a limpeza apaga os mais antigos)
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self._remember(key, audio_bytes)
+        return audio_bytes, "disk"
+
+    def lookup(self, text, voice, models):
+        """
+        Procura o texto nas variantes `models`, em ordem, e retorna (modelo, bytes) da
+        primeira encontrada ou (None, None). Conta um único acerto/erro por chamada.
+        """
+        found = (None, None)
+        level = None
+        for model in models:
+            audio_bytes, level = self._read(self.make_key(text, voice, model))
+            if audio_bytes is not None:
+                found = (model, audio_bytes)
+                break
+        with self._lock:
+            self.stats[f"{level}_hits" if level else "misses"] += 1
+            self._unsaved += 1
+            save = self._unsaved >= self.STATS_SAVE_EVERY
+        if save:
+            self.save_stats()
+        return found
+
+    def get(self, text, voice, model):
+        """Retorna os bytes do áudio em cache ou None."""
+        return self.lookup(text, voice, [model])[1]
+
+    def contains(self, text, voice, model):
+        """O áudio está em cache? (não conta como consulta nas estatísticas)"""
+        key = self.make_key(text, voice, model)
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self._disk_path(key))
+
+    def put(self, text, voice, model, audio_bytes):
+        """Grava o áudio na memória e, de forma atômica, no disco."""
+        if not audio_bytes:
+            return
+        key = self.make_key(text, voice, model)
+        path = self._disk_path(key)
+        written = 0
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            existed = os.path.exists(path)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(audio_bytes)
+            os.replace(tmp_path, path)
+            written = 0 if existed else len(audio_bytes)
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar o áudio no cache em disco: {e}")
+
+        with self._lock:
+            self._remember(key, audio_bytes)
+            self.stats["stores"] += 1
+            self._disk_bytes += written
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._prune()
+        self.save_stats()
+
+    def _prune(self):
+        """Apaga os áudios em disco menos usados até ficar abaixo de 90% do limite."""
+        entries = sorted(self._disk_entries(), key=lambda entry: entry.stat().st_mtime)
+        total = sum(entry.stat().st_size for entry in entries)
+        pruned = 0
+        for entry in entries:
+            if total <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except OSError:
+                continue
+            total -= size
+            pruned += 1
+        with self._lock:
+            self._disk_bytes = total
+            self.stats["pruned"] += pruned
+
+    def save_stats(self):
+        """Persiste os contadores de hit/miss para sobreviverem a reinícios."""
+        with self._lock:
+            snapshot = dict(self.stats)
+            self._unsaved = 0
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self._stats_path())
+        except OSError as e:
+            print(f"⚠️ Não foi possível salvar as estatísticas do cache TTS: {e}")
+
+    def get_stats(self):
+        """Contadores somados de todos os workers (os deste processo direto da memória)."""
+        own_path = self._stats_path()
+        # stats.json: arquivo único de versões anteriores, ainda somado ao total
+        paths = glob.glob(os.path.join(self.cache_dir, "stats.*.json")) + [os.path.join(self.cache_dir, "stats.json")]
+        others = [self._read_stats_file(path) for path in paths if path != own_path]
+        with self._lock:
+            totals = dict(self.stats)
+            for data in others:
+                for name in totals:
+                    totals[name] += data.get(name, 0)
+            lookups = totals["memory_hits"] + totals["disk_hits"] + totals["misses"]
+            hits = totals["memory_hits"] + totals["disk_hits"]
+            return {
+                **totals,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+            }
@@ -0,0 +1,143 @@
+"""
+Pipeline de TTS por frases.
+
+Divide a resposta em frases/orações e sintetiza os trechos em paralelo num pool
+limitado de threads, entregando os segmentos de áudio sempre na ordem original.
+Assim a primeira frase pode começar a tocar enquanto as seguintes ainda estão
+sendo geradas (ou, no streaming, enquanto o LLM ainda está escrevendo).
+"""
+import re
+
+# Fim de frase: pontuação forte seguida de espaço/quebra de linha
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+# Fim de oração, usado só para quebrar frases longas demais
+CLAUSE_BOUNDARY = re.compile(r"(?<=[,;:])\s+")
+# Abreviações comuns nas respostas ("profs. Rômulo"), que não encerram a frase
+ABBREVIATION = re.compile(r"\b(?:profs?|profas?|sra?|dra?|av|n)\.$", re.IGNORECASE)
+# Trechos sem nenhuma letra/dígito (ex.: só emojis) não valem uma chamada de TTS
+SPEAKABLE = re.compile(r"\w")
+
+MIN_CHUNK_CHARS = 40
+MAX_CHUNK_CHARS = 250
+
+
+def _sentences(text):
+    """Separa o texto em frases, sem cortar depois de abreviações."""
+    sentences = []
+    for sentence in SENTENCE_BOUNDARY.split(text or ""):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if sentences and ABBREVIATION.search(sentences[-1]):
+            sentences[-1] = f"{sentences[-1]} {sentence}"
+        else:
+            sentences.append(sentence)
+    return sentences
+
+
+def _split_long(sentence, max_chars):
+    """Quebra uma frase longa em orações, agrupando-as até max_chars."""
+    if len(sentence) <= max_chars:
+        return [sentence]
+    pieces, current = [], ""
+    for clause in CLAUSE_BOUNDARY.split(sentence):
+        if current and len(current) + 1 + len(clause) > max_chars:
+            pieces.append(current)
+            current = clause
+        else:
+            current = f"{current} {clause}".strip()
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_speech_chunks(text, min_chars=MIN_CHUNK_CHARS, max_chars=MAX_CHUNK_CHARS):
+    """
+    Divide o texto em trechos para síntese: frases curtas são agrupadas (menos
+    chamadas e prosódia mais natural) e frases longas são quebradas em orações.
+    """
+    chunks, current = [], ""
+    for sentence in _sentences(text):
+        for piece in _split_long(sentence, max_chars):
+            current = f"{current} {piece}".strip()
+            if len(current) >= min_chars:
+                chunks.append(current)
+                current = ""
+    if current:
+        if chunks and len(current) < min_chars and len(chunks[-1]) + len(current) < max_chars:
+            chunks[-1] = f"{chunks[-1]} {current}"
+        else:
+            chunks.append(current)
+    return [c for c in chunks if SPEAKABLE.search(c)]
+
+
+class SpeechPipeline:
+    """
+    Recebe texto (de uma vez ou em deltas do streaming), dispara a síntese de cada
+    trecho completo no executor e devolve os segmentos prontos em ordem.
+    """
+
+    def __init__(self, synthesize, executor, min_chars=MIN_CHUNK_CHARS, max_chars=MAX_CHUNK_CHARS):
+        self.synthesize = synthesize
+        self.executor = executor
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self._buffer = ""
+        self._futures = []
+        self._next_index = 0
+
+    def _submit(self, chunk):
+        self._futures.append((chunk, self.executor.submit(self.synthesize, chunk)))
+
+    def feed(self, text):
+        """Acrescenta texto; trechos já fechados por fim de frase vão para a síntese."""
+        self._buffer += text
+        boundaries = [
+            m for m in SENTENCE_BOUNDARY.finditer(self._buffer)
+            if not ABBREVIATION.search(self._buffer[:m.start()])
+        ]
+        if not boundaries:
+            return
+        # Só consome até o último fim de frase; o resto pode continuar no próximo delta
+        cut = boundaries[-1].end()
+        ready, self._buffer = self._buffer[:cut], self._buffer[cut:]
+        chunks = split_into_speech_chunks(ready, self.min_chars, self.max_chars)
+        if chunks and len(chunks[-1]) < self.min_chars:
+            # Trecho curto demais: segura e junta com o que vier depois
+            self._buffer = f"{chunks.pop()} {self._buffer}"
+        for chunk in chunks:
+            self._submit(chunk)
+
+    def finish(self):
+        """Envia o texto restante para a síntese."""
+        for chunk in split_into_speech_chunks(self._buffer, self.min_chars, self.max_chars):
+            self._submit(chunk)
+        self._buffer = ""
+
+    def ready_segments(self):
+        """Segmentos já sintetizados, em ordem, sem bloquear (para no primeiro pendente)."""
+        while self._next_index < len(self._futures):
+            chunk, future = self._futures[self._next_index]
+            if not future.done():
+                return
+            yield self._pop_segment(chunk, future)
+
+    def remaining_segments(self):
+        """Todos os segmentos restantes, em ordem, bloqueando até cada um ficar pronto."""
+        while self._next_index < len(self._futures):
+            chunk, future = self._futures[self._next_index]
+            yield self._pop_segment(chunk, future)
+
+    def _pop_segment(self, chunk, future):
+        index = self._next_index
+        self._next_index += 1
+        try:
+            audio_url = future.result()
+        except Exception as e:
+            print(f"⚠️ Falha ao sintetizar o trecho {index}: {e}")
+            audio_url = None
+        return {"index": index, "text": chunk, "audioUrl": audio_url}
+
+    @property
+    def total(self):
+        return len(self._futures)